@@ -0,0 +1,110 @@
+"""
+Ограничение одновременных тяжелых запросов (admission control)
+
+Выгрузки Excel, генерация скриптов и страницы с анализом исключений держат
+соединение с БД и много памяти десятки секунд. Для каждого класса таких
+запросов есть свой предел одновременных выполнений (EXPORT_CONCURRENCY,
+SCRIPTS_CONCURRENCY, ANALYSIS_CONCURRENCY) и общий предел HEAVY_CONCURRENCY -
+по умолчанию на одно меньше пула соединений, чтобы обычным страницам всегда
+оставалось соединение. Сверх предела запрос ждет в очереди до
+ADMISSION_QUEUE_TIMEOUT секунд; если очередь класса заполнена
+(ADMISSION_QUEUE_SIZE) или время вышло - 503 с Retry-After. Пределы действуют
+в пределах процесса; 0 - без ограничения
+"""
+import threading
+import time
+from typing import Dict, List
+
+from config import config
+import metrics
+
+
+class Rejected(Exception):
+    """Запрос не допущен: очередь заполнена (queue_full) или истекло ожидание (timeout)"""
+
+    def __init__(self, gate: str, reason: str):
+        super().__init__(f"{gate}: {reason}")
+        self.gate = gate
+        self.reason = reason
+
+
+class Gate:
+    """Не более limit одновременных запросов, еще до queue_size ждут освобождения"""
+
+    def __init__(self, name: str, limit: int, queue_size: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, deadline: float):
+        """Занять место до момента deadline (time.monotonic); Rejected - не удалось"""
+        if not self.limit:
+            return
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size:
+                raise Rejected(self.name, 'queue_full')
+            self.waiting += 1
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Rejected(self.name, 'timeout')
+                    self._condition.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        if not self.limit:
+            return
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+def _create_gates() -> Dict[str, Gate]:
+    settings = config.performance
+    queue_size = settings.admission_queue_size
+    return {
+        'export': Gate('export', settings.export_concurrency, queue_size),
+        'scripts': Gate('scripts', settings.scripts_concurrency, queue_size),
+        'analysis': Gate('analysis', settings.analysis_concurrency, queue_size),
+        # Общий предел всех тяжелых запросов; ждущие в нем уже учтены очередью своего класса
+        'heavy': Gate('heavy', settings.heavy_concurrency, queue_size * 3),
+    }
+
+
+GATES = _create_gates()
+
+
+def admit(heavy_class: str) -> List[Gate]:
+    """
+    Допуск запроса класса heavy_class (export, scripts, analysis): занимает место
+    класса и общее; возвращает занятые Gate для release(). Rejected - отказ
+    """
+    deadline = time.monotonic() + config.performance.admission_queue_timeout
+    started = time.monotonic()
+    acquired: List[Gate] = []
+    try:
+        for gate in (GATES[heavy_class], GATES['heavy']):
+            gate.acquire(deadline)
+            acquired.append(gate)
+    except Rejected as e:
+        release(acquired)
+        metrics.ADMISSION_REQUESTS.inc(heavy_class, f"rejected_{e.reason}")
+        raise
+    waited = time.monotonic() - started
+    metrics.ADMISSION_WAIT_SECONDS.observe(waited, heavy_class)
+    metrics.ADMISSION_REQUESTS.inc(heavy_class, 'admitted')
+    return acquired
+
+
+def release(gates: List[Gate]):
+    for gate in reversed(gates):
+        gate.release()
@@ -2,20 +2,45 @@
 Flask приложение для анализа классов SiTex
 """
 import os
+import time
+import logging
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, make_response
-from data_service import DataService
+from flask import (Flask, render_template, request, jsonify, send_file, make_response, Response, g,
+                   get_template_attribute, url_for)
+from data_service import DataService, ATTRIBUTE_LISTS, SELECTION_FILTERS
+from database_manager import is_jvm_started
+import admission
+import columnar
+import compression
+import http_cache
+import instrumentation
+import json_provider
+import metrics
+import profiler
+import query_budget
 from config import config
+from logging_setup import setup_logging, SampledLog
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from io import BytesIO
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Отладка построения WHERE вызывается для каждого атрибута при генерации скриптов;
+# выборка сообщений своя на каждый HTTP запрос
+def _where_log() -> SampledLog:
+    if 'where_log' not in g:
+        g.where_log = SampledLog(logger)
+    return g.where_log
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
 
 # Увеличиваем лимиты для больших JSON ответов
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
-app.config['JSON_AS_ASCII'] = False
+# Сериализация JSON: orjson при наличии, без сортировки ключей (json_provider.py)
+app.json = json_provider.create_provider(app)
 
 # Добавляем фильтр для форматирования даты
 @app.template_filter('strftime')
@@ -30,10 +55,209 @@ def strftime_filter(date_str, format='%d.%m.%Y %H:%M'):
             return date_str.replace('T', ' ')[:16]
     return '-'
 
-print(os.environ.get('JAVA_HOME'))
-# Инициализация сервиса данных
+logger.info("JAVA_HOME: %s", os.environ.get('JAVA_HOME'))
+# Инициализация сервиса данных (без обращения к БД - JVM и пул поднимаются при первом запросе)
 data_service = DataService()
 
+@app.before_request
+def start_instrumentation():
+    """Счетчики SQL запросов текущего HTTP запроса (instrumentation.py)"""
+    instrumentation.start_request()
+
+# Зарегистрирован первым, поэтому выполняется последним из after_request: сжимается окончательный ответ
+@app.after_request
+def compress_response(response):
+    """Сжатие ответов JSON/HTML: brotli или gzip по Accept-Encoding (compression.py)"""
+    return compression.compress_response(response, request.accept_encodings)
+
+@app.after_request
+def add_server_timing(response):
+    """Время SQL (по фазам) и обработки запроса в заголовке Server-Timing"""
+    stats = instrumentation.current_request()
+    if stats is not None and config.logging.server_timing:
+        response.headers.add('Server-Timing', stats.server_timing())
+    return response
+
+@app.after_request
+def observe_request(response):
+    """Гистограмма времени ответа по маршрутам; выгрузки Excel учитываются и как задания"""
+    stats = instrumentation.current_request()
+    if stats is not None and request.endpoint != 'metrics_endpoint':
+        elapsed = time.perf_counter() - stats.started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(elapsed, route, request.method, response.status_code)
+        if request.endpoint and request.endpoint.startswith('export_'):
+            metrics.JOB_SECONDS.observe(elapsed, request.endpoint)
+    return response
+
+@app.before_request
+def start_profiler():
+    """Профилирование запроса администратором: ?__profile=1 и заголовок X-Profile-Token"""
+    mode = request.args.get('__profile') or request.headers.get('X-Profile')
+    if mode and profiler.is_requested(mode, request.headers.get('X-Profile-Token')):
+        g.profiler = profiler.SamplingProfiler().start()
+
+@app.after_request
+def finish_profiler(response):
+    """Сохранение профиля; фазы профиля добавляются в Server-Timing"""
+    active = g.pop('profiler', None)
+    if active is None:
+        return response
+    active.stop()
+    
+    stats = instrumentation.current_request()
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{request.endpoint or 'unmatched'}-{os.getpid()}"
+    details = {
+        'path': request.path,
+        'args': {key: value for key, value in request.args.items() if not key.startswith('__')},
+        'status': response.status_code,
+    }
+    if stats is not None:
+        details['sql'] = {'queries': stats.queries, 'rows': stats.rows,
+                          'total_ms': round(stats.total * 1000, 1),
+                          'phases_ms': {phase: round(value * 1000, 1) for phase, value in stats.phases.items()},
+                          'slowest': stats.slowest}
+    path = active.save(name, details)
+    logger.info("Профиль запроса %s: %s (%s выборок)", request.path, path, active.samples)
+    
+    if (request.args.get('__profile') or request.headers.get('X-Profile')) == 'folded':
+        return Response(active.folded(), mimetype='text/plain; charset=utf-8',
+                        headers={'Content-Disposition': f'attachment; filename={name}.folded'})
+    response.headers.add('Server-Timing', active.server_timing())
+    response.headers['X-Profile'] = os.path.basename(path)
+    return response
+
+@app.before_request
+def lazy_bootstrap():
+    """Подготовка БД при первом запросе, если включен AUTO_BOOTSTRAP"""
+    if request.endpoint not in ('health', 'ready', 'metrics_endpoint', 'static'):
+        data_service.ensure_bootstrapped()
+
+# GET страницы и API, ответы которых зависят только от параметров запроса и данных в БД
+CACHEABLE_ENDPOINTS = {
+    'index', 'groups', 'attributes', 'classes', 'class_detail', 'exceptions',
+    'api_classes', 'api_groups', 'api_attributes', 'api_classes_with_exceptions',
+    'api_class_detail', 'api_class_attribute_rows', 'api_statistics',
+    'api_exceptions', 'api_get_exception',
+    'export_classes_xlsx', 'export_attributes_xlsx',
+    'generate_sql_scripts', 'generate_sql_scripts_page', 'generate_data_update_scripts',
+}
+
+@app.before_request
+def check_not_modified():
+    """ETag по версии данных: неизменившиеся страницы и API - 304 без запросов к данным (http_cache.py)"""
+    if (not config.performance.http_cache or request.method not in ('GET', 'HEAD')
+            or request.endpoint not in CACHEABLE_ENDPOINTS or 'profiler' in g):
+        return None
+    version = data_service.data_version()
+    if version is None:
+        return None
+    g.etag = http_cache.compute_etag(version, request.full_path)
+    if http_cache.is_not_modified(g.etag, request.if_none_match):
+        return http_cache.add_cache_headers(Response(status=304), g.etag)
+    return None
+
+# Тяжелые запросы по классам admission.py; analysis - только с analyze_exceptions=true
+HEAVY_ENDPOINTS = {
+    'export_classes_xlsx': 'export',
+    'export_attributes_xlsx': 'export',
+    'generate_sql_scripts': 'scripts',
+    'generate_sql_scripts_page': 'scripts',
+    'generate_data_update_scripts': 'scripts',
+    'attributes': 'analysis',
+    'classes': 'analysis',
+    'api_attributes': 'analysis',
+    'api_classes_with_exceptions': 'analysis',
+    'api_create_selection': 'analysis',
+}
+
+def _heavy_class():
+    heavy_class = HEAVY_ENDPOINTS.get(request.endpoint)
+    if heavy_class == 'analysis':
+        # Фильтры выборки передаются в JSON; страница виртуальной таблицы - шаблон без данных
+        params = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+        if (str(params.get('analyze_exceptions', 'false')).lower() != 'true'
+                or params.get('view') == 'virtual'):
+            return None
+    return heavy_class
+
+@app.before_request
+def admit_heavy_request():
+    """Пределы одновременных тяжелых запросов: очередь, затем 503 с Retry-After (admission.py)"""
+    heavy_class = _heavy_class()
+    if heavy_class is None:
+        return None
+    started = time.perf_counter()
+    try:
+        g.admission = admission.admit(heavy_class)
+    except admission.Rejected as e:
+        logger.warning("⚠️ Тяжелый запрос отклонен (%s): %s", e, request.full_path)
+        message = "Сервер занят другими тяжелыми операциями, повторите запрос позже"
+        if request.path.startswith(('/api/', '/export/')):
+            response = jsonify({"error": message})
+        else:
+            response = make_response(render_template('error.html', error=message))
+        response.status_code = 503
+        response.headers['Retry-After'] = str(config.performance.admission_retry_after)
+        return response
+    stats = instrumentation.current_request()
+    if stats is not None:
+        stats.queued = time.perf_counter() - started
+    return None
+
+@app.before_request
+def start_query_budget():
+    """Бюджет времени по классу маршрута: SQL отменяется по его истечении или уходу клиента (query_budget.py)"""
+    if request.endpoint in ('static', 'health', 'ready', 'metrics_endpoint'):
+        return None
+    stats = instrumentation.current_request()
+    # Ожидание в очереди допуска тоже расходует время до proxy_read_timeout nginx
+    elapsed = time.perf_counter() - stats.started if stats is not None else 0.0
+    query_budget.start(_heavy_class() or 'interactive', request.full_path,
+                       query_budget.client_socket(request.environ), elapsed)
+    return None
+
+@app.teardown_request
+def finish_query_budget(exc):
+    query_budget.finish()
+
+@app.teardown_request
+def release_heavy_request(exc):
+    """Освобождение места тяжелого запроса (и при исключении в обработчике)"""
+    gates = g.pop('admission', None)
+    if gates:
+        admission.release(gates)
+
+@app.after_request
+def add_cache_headers(response):
+    """ETag и Cache-Control для успешных ответов; запись данных сбрасывает кэш версии"""
+    if request.method not in ('GET', 'HEAD'):
+        # Версию увеличивают триггеры БД; здесь только сбрасывается ее кэш в процессе
+        data_service.data_version_changed()
+        return response
+    etag = g.pop('etag', None)
+    stats = instrumentation.current_request()
+    # Страницы показывают ошибки БД и с кодом 200 - такие ответы не кэшируются
+    if etag is not None and response.status_code == 200 and not (stats and stats.errors):
+        http_cache.add_cache_headers(response, etag)
+    return response
+
+@app.route('/health')
+def health():
+    """Liveness: процесс отвечает; БД и JVM не трогаются"""
+    return jsonify({'status': 'ok', 'jvm': is_jvm_started()})
+
+@app.route('/ready')
+def ready():
+    """Готовность к обслуживанию: JVM запущена, БД доступна, bootstrap выполнен"""
+    status = data_service.readiness()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Метрики процесса в формате Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/')
 def index():
     """Главная страница со списком классов"""
@@ -132,6 +356,10 @@ def groups():
 def attributes():
     """Страница со списком атрибутов"""
     
+    # Виртуальная таблица: страница без строк, данные - JSON из /api/attributes
+    if request.args.get('view') == 'virtual':
+        return _render_virtual_table('attributes')
+    
     # Получаем параметры из запроса
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -179,7 +407,8 @@ def attributes():
         analyze_exceptions=analyze_exceptions,
         source_target_filter=source_target_filter,
         property_filter=property_filter,
-        show_update_actions=show_update_actions
+        show_update_actions=show_update_actions,
+        attributes_per_class=config.performance.attributes_per_class
     )
     
     # Получаем статистику
@@ -206,6 +435,10 @@ def attributes():
 def classes():
     """Страница с анализом классов по исключениям"""
     
+    # Виртуальная таблица: страница без строк, данные - JSON из /api/classes_with_exceptions
+    if request.args.get('view') == 'virtual':
+        return _render_virtual_table('classes')
+    
     # Получаем параметры из запроса
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -312,6 +545,53 @@ def class_detail(class_ouid):
     
     return render_template('class_detail.html', data=result)
 
+# ===== Компактные ответы списков (format=columnar) и виртуальные таблицы (view=virtual) =====
+
+# Колонки ответов format=columnar; list - список действия в режиме анализа,
+# target_ouid - OUID назначения для ссылки в админку (ссылки собираются в браузере)
+COLUMNAR_ATTRIBUTE_COLUMNS = ('ouid', 'name', 'title', 'datatype_name', 'ouidsxclass', 'class_name',
+                              'a_status_variance', 'a_event', 'a_priznak', 'property_name', 'source', 'target',
+                              'list', 'target_ouid')
+COLUMNAR_CLASS_COLUMNS = ('ouid', 'name', 'description', 'a_status_variance', 'a_event', 'a_priznak',
+                          'property_name', 'source', 'target', 'list', 'target_ouid')
+# Колонки с повторяющимися строками - передаются номерами в словаре
+COLUMNAR_DICTIONARY_COLUMNS = ('datatype_name', 'class_name', 'property_name', 'list')
+
+def _columnar_response(result: dict, rows: list, columns, object_type: str,
+                       base_url: str = None, source_base_url: str = None) -> dict:
+    """Ответ списка в формате columnar.encode с параметрами пагинации и шаблонами ссылок"""
+    response = columnar.encode(rows, columns, COLUMNAR_DICTIONARY_COLUMNS)
+    response.update({key: result.get(key) for key in ('total_count', 'total_pages', 'current_page', 'per_page',
+                                                      'has_next', 'statistics', 'analyze_exceptions')})
+    response['url_templates'] = {
+        'admin_url': columnar.url_template(data_service.admin_url_template(object_type, base_url),
+                                           'target_ouid', 'ouid'),
+        'source_admin_url': columnar.url_template(data_service.admin_url_template(object_type, source_base_url),
+                                                  'ouid'),
+    }
+    return response
+
+def _json_list_response(result: dict, rows: int):
+    """
+    Ответ списка: jsonify или, от JSON_STREAM_MIN_ROWS строк, потоковое кодирование
+    (json_provider.stream_json) - без полной строки JSON в памяти; такие ответы
+    сжимает только nginx
+    """
+    if rows < config.performance.json_stream_min_rows:
+        return jsonify(result)
+    return Response(json_provider.stream_json(result, app.json.dumps_bytes), mimetype='application/json')
+
+def _render_virtual_table(screen: str):
+    """Страница виртуальной таблицы: шаблон без данных, строки загружаются из API частями"""
+    api_endpoint = 'api_attributes' if screen == 'attributes' else 'api_classes_with_exceptions'
+    return render_template('virtual_table.html',
+                           screen=screen,
+                           api_url=url_for(api_endpoint),
+                           page_size=config.performance.virtual_page_size,
+                           # nginx отдает /static/ с Cache-Control: immutable - версия по времени изменения файла
+                           script_version=int(os.path.getmtime(os.path.join(app.static_folder, 'js', 'virtual_table.js'))),
+                           analyze_exceptions=request.args.get('analyze_exceptions', 'false').lower() == 'true')
+
 @app.route('/api/classes')
 def api_classes():
     """API для получения списка классов (для AJAX)"""
@@ -374,15 +654,16 @@ def api_groups():
 
 @app.route('/api/attributes')
 def api_attributes():
-    """API для получения списка атрибутов (для AJAX)"""
+    """
+    API для получения списка атрибутов (для AJAX)
+    Фильтры - те же параметры, что у /attributes; format=columnar - ответ колонками
+    (виртуальная таблица), в режиме анализа - плоский список атрибутов классов страницы
+    """
     
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
-    search = request.args.get('search', '')
-    status_variance = request.args.get('status_variance', type=int)
-    event = request.args.get('event', type=int)
-    a_priznak = request.args.get('a_priznak', type=int)
-    base_url = request.args.get('base_url', '')
+    filters = _parse_filters_from_args()
+    compact = request.args.get('format') == 'columnar'
     
     # Проверяем корректность значений
     if page < 1:
@@ -393,14 +674,38 @@ def api_attributes():
     result = data_service.get_attributes(
         page=page,
         per_page=per_page,
-        search=search if search else None,
-        status_variance=status_variance,
-        event=event,
-        a_priznak=a_priznak,
-        base_url=base_url if base_url else None
+        search=filters['search'],
+        status_variance=filters['status_variance'],
+        event=filters['event'],
+        a_priznak=filters['a_priznak'],
+        base_url=filters['base_url'],
+        source_base_url=filters['source_base_url'],
+        exception_action_filter=filters['exception_action_filter'],
+        analyze_exceptions=filters['analyze_exceptions'],
+        source_target_filter=filters['source_target_filter'],
+        property_filter=filters['property_filter'],
+        show_update_actions=filters['show_update_actions'],
+        # Виртуальной таблице нужны списки классов целиком
+        attributes_per_class=None if compact else config.performance.attributes_per_class
     )
     
-    return jsonify(result)
+    if 'error' in result:
+        return jsonify(result)
+    
+    # Списки строк ответа: (действие, атрибуты) по классам страницы или один список быстрого режима
+    if result.get('analyze_exceptions'):
+        lists = [(list_name, class_data['attributes'][list_name])
+                 for class_data in result['classes'].values()
+                 for list_name in ATTRIBUTE_LISTS]
+    else:
+        lists = [(None, result['attributes']['fast_mode'])]
+    
+    if compact:
+        rows = [dict(attr, list=list_name) if list_name else attr for list_name, items in lists for attr in items]
+        return jsonify(_columnar_response(result, rows, COLUMNAR_ATTRIBUTE_COLUMNS, 'SXAttr',
+                                          filters['base_url'], filters['source_base_url']))
+    
+    return _json_list_response(result, sum(len(items) for _, items in lists))
 
 @app.route('/api/classes_with_exceptions')
 def api_classes_with_exceptions():
@@ -446,7 +751,20 @@ def api_classes_with_exceptions():
         show_update_actions=show_update_actions
     )
     
-    return jsonify(result)
+    if 'error' in result:
+        return jsonify(result)
+    
+    if result.get('analyze_exceptions'):
+        lists = list(result['classes_by_action'].items())
+    else:
+        lists = [(None, result['classes']['fast_mode'])]
+    
+    if request.args.get('format') == 'columnar':
+        rows = [dict(cls, list=list_name) if list_name else cls for list_name, items in lists for cls in items]
+        return jsonify(_columnar_response(result, rows, COLUMNAR_CLASS_COLUMNS, 'SXClass',
+                                          base_url or None, source_base_url or None))
+    
+    return _json_list_response(result, sum(len(items) for _, items in lists))
 
 @app.route('/api/class/<int:class_ouid>')
 def api_class_detail(class_ouid):
@@ -468,6 +786,37 @@ def api_class_detail(class_ouid):
     )
     return jsonify(result)
 
+@app.route('/api/class/<int:class_ouid>/attributes')
+def api_class_attribute_rows(class_ouid):
+    """
+    Следующая часть списка атрибутов класса для страницы анализа ("Показать ещё")
+    Фильтры - те же параметры, что у /attributes; list, offset, limit - какая часть
+    """
+    filters = _parse_filters_from_args()
+    limit = request.args.get('limit', config.performance.attributes_per_class, type=int)
+    result = data_service.get_class_attribute_rows(
+        class_ouid,
+        request.args.get('list', ''),
+        offset=request.args.get('offset', 0, type=int),
+        limit=min(max(limit, 1), 1000),
+        search=filters['search'],
+        status_variance=filters['status_variance'],
+        event=filters['event'],
+        a_priznak=filters['a_priznak'],
+        base_url=filters['base_url'],
+        source_base_url=filters['source_base_url'],
+        source_target_filter=filters['source_target_filter'],
+        property_filter=filters['property_filter'],
+        show_update_actions=filters['show_update_actions']
+    )
+    if 'error' in result:
+        return jsonify(result), 400
+    
+    # Строки таблицы - тем же макросом, что и на странице
+    attribute_rows = get_template_attribute('_attribute_rows.html', 'attribute_rows')
+    result['html'] = str(attribute_rows(result.pop('attributes'), result['list']))
+    return jsonify(result)
+
 @app.route('/api/statistics')
 def api_statistics():
     """API для получения статистики"""
@@ -669,16 +1018,23 @@ def api_reload_exceptions():
     """API для принудительной перезагрузки данных исключений из файлов"""
     
     try:
-        # Принудительно перезагружаем данные исключений
-        result = data_service.db_manager.init_exceptions_data(force_reload=True)
+        # Принудительно перезагружаем данные исключений (атомарно, в одной транзакции)
+        with metrics.track_job('exceptions_reload'):
+            report = data_service.db_manager.init_exceptions_data(force_reload=True)
         
-        if result:
+        if report.get('success'):
             return jsonify({
                 "success": True,
-                "message": "Данные исключений успешно перезагружены из файлов"
+                "message": (f"Данные исключений перезагружены из файлов: "
+                            f"добавлено {report['inserted']}, дубликатов {report['duplicates']}, "
+                            f"пропущено строк {report['skipped_lines']}"),
+                "report": report
             })
         else:
-            return jsonify({"error": "Ошибка перезагрузки данных исключений"}), 500
+            return jsonify({
+                "error": f"Ошибка перезагрузки данных исключений: {report.get('error', '')}",
+                "report": report
+            }), 500
             
     except Exception as e:
         return jsonify({"error": f"Ошибка перезагрузки исключений: {e}"}), 500
@@ -881,6 +1237,16 @@ def export_attributes_xlsx():
         property_filter = None  
         show_update_actions = True
     
+    # Выборка (selection_id): атрибуты, результат анализа и фильтры, сохраненные при ее создании
+    selection_id = request.args.get('selection_id') or None
+    if selection_id:
+        selection, error = _selection_or_error(selection_id)
+        if error:
+            return error
+        (search, status_variance, event, a_priznak, base_url, source_base_url, exception_action_filter,
+         analyze_exceptions, source_target_filter, property_filter,
+         show_update_actions) = _selection_filter_values(selection)
+    
     try:
         # Получаем данные без пагинации (устанавливаем per_page = 100000)
         result = data_service.get_attributes(
@@ -896,7 +1262,8 @@ def export_attributes_xlsx():
             analyze_exceptions=analyze_exceptions,
             source_target_filter=source_target_filter,
             property_filter=property_filter,
-            show_update_actions=show_update_actions
+            show_update_actions=show_update_actions,
+            selection_id=selection_id
         )
         
         if 'error' in result:
@@ -1057,6 +1424,16 @@ def generate_sql_scripts():
         property_filter = None  
         show_update_actions = True
     
+    # Выборка (selection_id): атрибуты, результат анализа и фильтры, сохраненные при ее создании
+    selection_id = request.args.get('selection_id') or None
+    if selection_id:
+        selection, error = _selection_or_error(selection_id)
+        if error:
+            return error
+        (search, status_variance, event, a_priznak, base_url, source_base_url, exception_action_filter,
+         analyze_exceptions, source_target_filter, property_filter,
+         show_update_actions) = _selection_filter_values(selection)
+    
     try:
         # Получаем данные без пагинации (все записи)
         result = data_service.get_attributes(
@@ -1072,7 +1449,8 @@ def generate_sql_scripts():
             analyze_exceptions=analyze_exceptions,
             source_target_filter=source_target_filter,
             property_filter=property_filter,
-            show_update_actions=show_update_actions
+            show_update_actions=show_update_actions,
+            selection_id=selection_id
         )
         
         if 'error' in result:
@@ -1261,6 +1639,16 @@ def generate_data_update_scripts():
         property_filter = None  
         show_update_actions = True
     
+    # Выборка (selection_id): атрибуты, результат анализа и фильтры, сохраненные при ее создании
+    selection_id = request.args.get('selection_id') or None
+    if selection_id:
+        selection, error = _selection_or_error(selection_id)
+        if error:
+            return error
+        (search, status_variance, event, a_priznak, base_url, source_base_url, exception_action_filter,
+         analyze_exceptions, source_target_filter, property_filter,
+         show_update_actions) = _selection_filter_values(selection)
+    
     # Проверяем что работаем только с source_to_null
     if source_target_filter != 'source_to_null':
         return jsonify({"error": "Скрипты обновления данных работают только с фильтром 'source_to_null'"}), 400
@@ -1283,7 +1671,8 @@ def generate_data_update_scripts():
             analyze_exceptions=True,  # Принудительно включаем анализ для получения данных исключений
             source_target_filter=source_target_filter,
             property_filter=property_filter,
-            show_update_actions=show_update_actions
+            show_update_actions=show_update_actions,
+            selection_id=selection_id
         )
         
         if 'error' in result:
@@ -1337,7 +1726,7 @@ def generate_data_update_scripts():
         all_scripts = '\n\n'.join(sql_scripts)
         
         # Отладочная информация о размере результата
-        print(f"[DEBUG] Сгенерировано {len(sql_scripts)} скриптов, общий размер: {len(all_scripts)} символов")
+        logger.debug("Сгенерировано %s скриптов, общий размер: %s символов", len(sql_scripts), len(all_scripts))
         
         return jsonify({
             "success": True,
@@ -1350,6 +1739,49 @@ def generate_data_update_scripts():
     except Exception as e:
         return jsonify({"error": f"Ошибка генерации скриптов обновления: {str(e)}"}), 500
 
+# ===== Эндпоинты: Выборки атрибутов =====
+
+@app.route('/api/selections', methods=['POST'])
+def api_create_selection():
+    """
+    Выборка атрибутов по фильтрам страницы (JSON как у set_event_bulk): атрибуты
+    и результат анализа исключений сохраняются на SELECTION_TTL секунд;
+    selection_id принимают выгрузка, генерация скриптов и массовое обновление A_EVENT
+    """
+    try:
+        payload = request.get_json(force=True, silent=True) or {}
+        result = data_service.create_selection(_parse_filters_from_json(payload))
+        if 'error' in result:
+            return jsonify(result), 500
+        return jsonify(result), 201
+    except Exception as e:
+        return jsonify({"error": f"Ошибка создания выборки: {e}"}), 500
+
+@app.route('/api/selections/<selection_id>')
+def api_get_selection(selection_id):
+    selection, error = _selection_or_error(selection_id)
+    if error:
+        return error
+    return jsonify(selection)
+
+@app.route('/api/selections/<selection_id>', methods=['DELETE'])
+def api_delete_selection(selection_id):
+    if not data_service.delete_selection(selection_id):
+        return jsonify({"error": "Выборка не найдена"}), 404
+    return jsonify({"success": True})
+
+def _selection_or_error(selection_id):
+    """Действующая выборка: (выборка, None) или (None, ответ 404 - нет или истекла)"""
+    selection = data_service.get_selection(selection_id)
+    if selection is None:
+        return None, (jsonify({"error": "Выборка не найдена или устарела, создайте ее заново",
+                               "selection_id": selection_id}), 404)
+    return selection, None
+
+def _selection_filter_values(selection):
+    """Фильтры выборки в порядке SELECTION_FILTERS (для распаковки в переменные обработчика)"""
+    return tuple(selection['filters'].get(key) for key in SELECTION_FILTERS)
+
 # ===== Эндпоинты: Установка A_EVENT=2 в SXATTR_SOURCE =====
 
 @app.route('/api/attribute/<int:attr_ouid>/set_event', methods=['POST'])
@@ -1364,6 +1796,14 @@ def api_set_attribute_event(attr_ouid):
         return jsonify({"error": f"Ошибка обновления атрибута: {e}"}), 500
 
 
+def _parse_filters_from_args():
+    """Фильтры страницы атрибутов из параметров GET запроса (как в /attributes)"""
+    payload = request.args.to_dict()
+    payload['property_filter'] = request.args.getlist('property_filter')
+    # Без отмеченного чекбокса "Показывать обновить" браузер параметр не передает
+    payload['show_update_actions'] = 'true' if 'true' in request.args.getlist('show_update_actions') else 'false'
+    return _parse_filters_from_json(payload)
+
 def _parse_filters_from_json(payload: dict):
     """Вспомогательная: привести фильтры из JSON к нужным типам"""
     search = payload.get('search') or None
@@ -1408,9 +1848,15 @@ def _parse_filters_from_json(payload: dict):
 
 @app.route('/api/class/<int:class_ouid>/attributes/set_event', methods=['POST'])
 def api_set_event_for_class_attributes(class_ouid):
-    """Установить A_EVENT=2 для всех атрибутов класса согласно текущим фильтрам"""
+    """Установить A_EVENT=2 для всех атрибутов класса согласно текущим фильтрам (или выборке selection_id)"""
     try:
         payload = request.get_json(force=True, silent=True) or {}
+        if payload.get('selection_id'):
+            _selection, error = _selection_or_error(payload['selection_id'])
+            if error:
+                return error
+            result = data_service.update_attributes_event_by_selection(payload['selection_id'], class_ouid)
+            return jsonify(result), 400 if 'error' in result else 200
         filters = _parse_filters_from_json(payload)
         result = data_service.update_attributes_event_by_class(
             class_ouid=class_ouid,
@@ -1437,9 +1883,15 @@ def api_set_event_for_class_attributes(class_ouid):
 
 @app.route('/api/attributes/set_event_bulk', methods=['POST'])
 def api_set_event_for_all_filtered():
-    """Установить A_EVENT=2 для всех отфильтрованных атрибутов всех классов"""
+    """Установить A_EVENT=2 для всех отфильтрованных атрибутов всех классов (или выборки selection_id)"""
     try:
         payload = request.get_json(force=True, silent=True) or {}
+        if payload.get('selection_id'):
+            _selection, error = _selection_or_error(payload['selection_id'])
+            if error:
+                return error
+            result = data_service.update_attributes_event_by_selection(payload['selection_id'])
+            return jsonify(result), 400 if 'error' in result else 200
         filters = _parse_filters_from_json(payload)
         result = data_service.update_attributes_event_by_filters(
             page=1,
@@ -1477,17 +1929,15 @@ def _get_field_mapping(property_name):
         if not data_service.db_manager.connect():
             return None
         
-        # Экранируем кавычки отдельно от f-string
-        safe_property_name = property_name.replace("'", "''")
-        query = f"SELECT map FROM sxattr WHERE name = '{safe_property_name}' LIMIT 1"
-        result = data_service.db_manager.execute_query(query)
+        query = "SELECT map FROM sxattr WHERE name = ? LIMIT 1"
+        result = data_service.db_manager.execute_query(query, [property_name])
         
         if result and len(result) > 0:
             return result[0][0] 
         
         return None
     except Exception as e:
-        print(f"[ERROR] Ошибка получения маппинга для {property_name}: {e}")
+        logger.error("Ошибка получения маппинга для %s: %s", property_name, e)
         return None
     finally:
         data_service.db_manager.disconnect()
@@ -1521,7 +1971,7 @@ WHERE ouid = (
         
         return script
     except Exception as e:
-        print(f"[ERROR] Ошибка генерации скрипта для {attr_ouid}: {e}")
+        logger.error("Ошибка генерации скрипта для %s: %s", attr_ouid, e)
         return None
 
 def _build_where_conditions_for_update(attr, search, a_priznak, event, status_variance, property_filter, source_target_filter):
@@ -1531,9 +1981,10 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
     # DEBUG: Отладочная информация
     attr_name = attr.get('name', '')
     exception_actions = attr.get('exception_actions', [])
-    print(f"[DEBUG] Building WHERE for attr '{attr_name}': property_filter={property_filter}, source_target_filter={source_target_filter}, exception_actions={len(exception_actions)} actions")
+    _where_log().debug("Building WHERE for attr '%s': property_filter=%s, source_target_filter=%s, exception_actions=%s actions",
+                    attr_name, property_filter, source_target_filter, len(exception_actions))
     if exception_actions:
-        print(f"[DEBUG] Exception actions sample: {exception_actions[0]}")
+        _where_log().debug("Exception actions sample: %s", exception_actions[0])
     
     # Обязательное условие по имени атрибута
     if attr_name:
@@ -1559,7 +2010,7 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
     exception_actions = attr.get('exception_actions', [])
     
     if not exception_actions:
-        print(f"[DEBUG] No exception_actions found for '{attr_name}', will use A_LOG based filtering")
+        _where_log().debug("No exception_actions found for '%s', will use A_LOG based filtering", attr_name)
     
     # Фильтр по свойствам атрибутов
     # СЛУЧАЙ 1: Есть exception_actions - используем их
@@ -1571,10 +2022,10 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
             if prop_name and prop_name in property_filter:
                 filtered_property_names.add(prop_name)
         
-        print(f"[DEBUG] Property filter check for '{attr_name}': looking for {property_filter}, found {filtered_property_names}")
+        _where_log().debug("Property filter check for '%s': looking for %s, found %s", attr_name, property_filter, filtered_property_names)
         
         if filtered_property_names:
-            print(f"[DEBUG] Adding property filter for '{attr_name}': {filtered_property_names}")
+            _where_log().debug("Adding property filter for '%s': %s", attr_name, filtered_property_names)
             # Добавляем EXISTS условие для проверки наличия нужных свойств в A_LOG
             property_names_list = list(filtered_property_names)
             if len(property_names_list) == 1:
@@ -1591,7 +2042,7 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
     
     # СЛУЧАЙ 2: Нет exception_actions, но есть фильтры - используем прямой поиск по A_LOG
     elif property_filter and not exception_actions:
-        print(f"[DEBUG] Using direct A_LOG filtering for property_filter: {property_filter}")
+        _where_log().debug("Using direct A_LOG filtering for property_filter: %s", property_filter)
         # Добавляем условие поиска по свойствам напрямую в A_LOG
         prop_conditions = []
         for prop_name in property_filter:
@@ -1658,7 +2109,7 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
                 source_target_conditions.append(log_condition)
         
         if source_target_conditions:
-            print(f"[DEBUG] Adding source_target filter for '{attr_name}': {len(source_target_conditions)} conditions")
+            _where_log().debug("Adding source_target filter for '%s': %s conditions", attr_name, len(source_target_conditions))
             # Объединяем условия через OR (любое из найденных сочетаний)
             if len(source_target_conditions) == 1:
                 conditions.append(f"{source_target_conditions[0]} /* Фильтр {source_target_filter} */")
@@ -1667,7 +2118,7 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
     
     # СЛУЧАЙ 2 для source_target_filter: Нет exception_actions, но есть фильтры - используем прямой поиск по A_LOG
     elif source_target_filter and not exception_actions:
-        print(f"[DEBUG] Using direct A_LOG filtering for source_target_filter: {source_target_filter}")
+        _where_log().debug("Using direct A_LOG filtering for source_target_filter: %s", source_target_filter)
         
         # Создаем условие для source_target_filter с учетом property_filter
         if property_filter:
@@ -1706,10 +2157,10 @@ def _build_where_conditions_for_update(attr, search, a_priznak, event, status_va
                 conditions.append(f"({' OR '.join(combined_conditions)}) /* Прямой фильтр {source_target_filter} для свойств {', '.join(property_filter)} */")
         else:
             # Только source_target_filter без привязки к конкретным свойствам - сложнее реализовать
-            print(f"[DEBUG] Warning: source_target_filter without property_filter is not supported for direct A_LOG filtering")
+            _where_log().debug("Warning: source_target_filter without property_filter is not supported for direct A_LOG filtering")
     
     final_where = " AND ".join(conditions)
-    print(f"[DEBUG] Final WHERE condition for '{attr_name}': {final_where}")
+    _where_log().debug("Final WHERE condition for '%s': %s", attr_name, final_where)
     return final_where
 
 @app.errorhandler(404)
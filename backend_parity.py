@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Сравнение backend'ов БД (JDBC и psycopg) на типовых сценариях DataService
+
+Каждый сценарий (см. manage._canonical_scenarios) выполняется через оба backend'а,
+результаты сравниваются после нормализации, время выводится для сравнения путей
+
+    python backend_parity.py [--repeat N]
+"""
+import argparse
+import json
+import sys
+import time
+
+from config import config
+from logging_setup import setup_logging
+from database_manager import PostgreSQLManager
+from data_service import DataService
+from manage import _canonical_scenarios
+
+BACKENDS = ('jdbc', 'psycopg')
+# Поля результата, которые меняются от запуска к запуску (замеры времени)
+VOLATILE_KEYS = frozenset({'optimization_info', 'query_time', 'processing_time', 'total_time'})
+
+
+def _strip_volatile(value):
+    """Копия результата без изменчивых полей на любом уровне вложенности"""
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def _normalize(result) -> str:
+    """Результат сценария в виде, не зависящем от порядка ключей и замеров времени"""
+    return json.dumps(_strip_volatile(result), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def run_backend(backend: str, repeat: int) -> dict:
+    """Результаты и лучшее время каждого сценария для backend'а"""
+    data_service = DataService(PostgreSQLManager(backend=backend))
+    results = {}
+    for scenario, call in _canonical_scenarios(data_service):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            started = time.time()
+            result = call()
+            timings.append(time.time() - started)
+        results[scenario] = {'result': _normalize(result), 'best': min(timings)}
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Сравнение backend\'ов JDBC и psycopg')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов каждого сценария (берется лучшее время)')
+    args = parser.parse_args()
+    setup_logging()
+
+    print("🔍 Сравнение backend'ов БД")
+    print(f"📍 Подключение к: {config.postgres.host}:{config.postgres.port}/{config.postgres.database}")
+    print("=" * 70)
+
+    runs = {}
+    for backend in BACKENDS:
+        started = time.time()
+        try:
+            runs[backend] = run_backend(backend, args.repeat)
+        except Exception as e:
+            print(f"❌ {backend}: {e}")
+            return 1
+        print(f"✅ {backend}: сценарии выполнены за {time.time() - started:.2f} сек (включая запуск)")
+
+    jdbc, native = (runs[backend] for backend in BACKENDS)
+    mismatches = 0
+    print(f"\n{'Сценарий':<22} {'jdbc, мс':>10} {'psycopg, мс':>12}  Результат")
+    for scenario in jdbc:
+        same = jdbc[scenario]['result'] == native[scenario]['result']
+        mismatches += not same
+        print(f"{scenario:<22} {jdbc[scenario]['best'] * 1000:>10.1f} {native[scenario]['best'] * 1000:>12.1f}  "
+              f"{'✅ совпадает' if same else '❌ различается'}")
+
+    print(f"\nСценариев: {len(jdbc)}, расхождений: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Сериализация больших JSON ответов: прежний jsonify против json_provider
+
+Ответ берется целиком как есть - из сохраненного файла или запросом к
+приложению через тестовый клиент (нужна БД, например из generate_data.py):
+
+    python benchmarks/bench_json.py [--path "/api/attributes?analyze_exceptions=true&per_page=1000"]
+    python benchmarks/bench_json.py --input attributes.json [--repeat 10]
+
+Варианты: Flask 2.3 по умолчанию (json, sort_keys - так кодировались ответы до
+json_provider), json без сортировки ключей (json_provider без orjson), orjson
+(если установлен), потоковое кодирование stream_json. Для каждого - медиана и
+минимум времени, размер ответа в байтах
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+
+DEFAULT_PATH = '/api/attributes?analyze_exceptions=true&status_variance=2&per_page=1000'
+
+# Провайдеры держат слабую ссылку на приложение
+bench_app = Flask('bench_json')
+
+
+def load_payload(args) -> Any:
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            return json.load(f)
+    from app import app
+    response = app.test_client().get(args.path)
+    if response.status_code != 200:
+        raise RuntimeError(f"{args.path}: HTTP {response.status_code}")
+    return json.loads(response.get_data())
+
+
+def serializers() -> Dict[str, Callable[[Any], bytes]]:
+    """Имя -> функция obj -> байты ответа"""
+    default = DefaultJSONProvider(bench_app)
+    stdlib = json_provider.FastJSONProvider(bench_app, use_orjson=False)
+    variants = {
+        'jsonify Flask 2.3 (было)': lambda obj: default.response(obj).get_data(),
+        'json без сортировки': lambda obj: stdlib.response(obj).get_data(),
+        'stream_json (json)': lambda obj: b''.join(json_provider.stream_json(obj, stdlib.dumps_bytes)),
+    }
+    if json_provider.orjson is not None:
+        fast = json_provider.FastJSONProvider(bench_app)
+        variants['orjson'] = lambda obj: fast.response(obj).get_data()
+        variants['stream_json (orjson)'] = lambda obj: b''.join(json_provider.stream_json(obj, fast.dumps_bytes))
+    else:
+        print("⚠️ orjson не установлен: pip install orjson", file=sys.stderr)
+    return variants
+
+
+def measure(func: Callable[[Any], bytes], payload: Any, repeat: int) -> Dict[str, Any]:
+    func(payload)  # прогрев
+    runs, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(func(payload))
+        runs.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': statistics.median(runs), 'min_ms': min(runs), 'bytes': size}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Сравнение сериализаторов JSON на реальном ответе')
+    parser.add_argument('--path', default=DEFAULT_PATH, help='Запрос к приложению (тестовый клиент)')
+    parser.add_argument('--input', help='Сохраненный JSON ответ вместо запроса')
+    parser.add_argument('--repeat', type=int, default=5, help='Замеров на вариант')
+    args = parser.parse_args()
+
+    payload = load_payload(args)
+    print(f"Ответ: {args.input or args.path}", file=sys.stderr)
+
+    results = {name: measure(func, payload, args.repeat) for name, func in serializers().items()}
+    baseline = results['jsonify Flask 2.3 (было)']
+    print(f"\n{'Вариант':<30} {'медиана, мс':>12} {'мин, мс':>10} {'байт':>12} {'ускорение':>10}", file=sys.stderr)
+    for name, result in results.items():
+        print(f"{name:<30} {result['median_ms']:>12.1f} {result['min_ms']:>10.1f} {result['bytes']:>12} "
+              f"{baseline['median_ms'] / max(result['median_ms'], 1e-9):>9.1f}x", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Стоимость построчной отладки при выгрузке: print() против ленивого logging
+
+Имитирует цикл выгрузки на N строк (по умолчанию 100000, как в /export/*.xlsx):
+на каждую строку - сообщение с OUID, действием и словарем действий исключения.
+
+    python benchmarks/bench_logging.py [--rows N] [--stdout]
+
+--stdout пишет print() в настоящий stdout (как в контейнере), иначе в /dev/null
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logging_setup import SampledLog  # noqa: E402
+
+
+def make_rows(count: int):
+    return [{
+        'attr_ouid': 100000 + i,
+        'name': f"attribute_{i}",
+        'exception_action': i % 3,
+        'exception_actions': [{'property_name': 'readOnly', 'source_value': 'true',
+                               'target_value': 'false', 'exception_action': i % 3}],
+    } for i in range(count)]
+
+
+def run_print(rows, out):
+    """Прежний вариант: безусловный print() с f-строкой на каждую строку"""
+    for i, row in enumerate(rows):
+        print(f"[DEBUG] Атрибут {i}, OUID: {row['attr_ouid']}, действие: {row['exception_action']}", file=out)
+        print(f"[DEBUG] Exception actions sample: {row['exception_actions'][0]}", file=out)
+
+
+def run_logger(rows, logger):
+    """logger.debug с ленивыми аргументами"""
+    for i, row in enumerate(rows):
+        logger.debug("Атрибут %s, OUID: %s, действие: %s", i, row['attr_ouid'], row['exception_action'])
+        logger.debug("Exception actions sample: %s", row['exception_actions'][0])
+
+
+def run_sampled(rows, logger):
+    """SampledLog: первые 10 сообщений и каждое 1000-е"""
+    row_log = SampledLog(logger)
+    for i, row in enumerate(rows):
+        row_log.debug("Атрибут %s, OUID: %s, действие: %s", i, row['attr_ouid'], row['exception_action'])
+        row_log.debug("Exception actions sample: %s", row['exception_actions'][0])
+
+
+def measure(name, func, *args):
+    started = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<42} {elapsed * 1000:>10.1f} мс", file=sys.stderr)
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Сравнение print() и логирования в построчных циклах')
+    parser.add_argument('--rows', type=int, default=100000, help='Число строк выгрузки')
+    parser.add_argument('--stdout', action='store_true', help='print() в настоящий stdout вместо /dev/null')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+
+    logger = logging.getLogger('bench_logging')
+    logger.propagate = False
+    handler = logging.StreamHandler(io.TextIOWrapper(open(os.devnull, 'wb'), encoding='utf-8'))
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(name)s: %(message)s'))
+    logger.addHandler(handler)
+
+    print(f"Строк: {args.rows}", file=sys.stderr)
+    baseline = measure('print() (было)', run_print, rows, sys.stdout if args.stdout else devnull)
+
+    logger.setLevel(logging.INFO)
+    results = {
+        'logger.debug, уровень INFO': measure('logger.debug, уровень INFO (отладка выкл.)', run_logger, rows, logger),
+        'SampledLog, уровень INFO': measure('SampledLog, уровень INFO', run_sampled, rows, logger),
+    }
+    logger.setLevel(logging.DEBUG)
+    results['SampledLog, уровень DEBUG'] = measure('SampledLog, уровень DEBUG', run_sampled, rows, logger)
+    results['logger.debug, уровень DEBUG'] = measure('logger.debug, уровень DEBUG (все строки)',
+                                                      run_logger, rows, logger)
+
+    print("", file=sys.stderr)
+    for name, elapsed in results.items():
+        print(f"Ускорение ({name}): x{baseline / max(elapsed, 1e-9):.1f}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Синтетические метаданные для замеров производительности без рабочей БД
+
+Создает в PostgreSQL из конфигурации (POSTGRES_*) таблицы источника
+sxclass_source / sxattr_grp_source / sxattr_source по схеме из "структура классов.sql",
+таблицы назначения sxclass / sxattr_grp / sxattr, справочник типов sxdatatype и заполняет их:
+  - a_log с блоками различий "свойство / source = / target =" по свойствам из
+    файлов исключени*.md, в том числе с многострочными target;
+  - ссылочные значения вида "11008462@SXAttrGrpSource" для скриптов обновления данных;
+  - __meta_statistic с исключениями из тех же файлов (как manage.py bootstrap)
+
+    python benchmarks/generate_data.py [--scale small|medium|large] [--seed 42]
+    python benchmarks/generate_data.py --classes 500 --attributes-per-class 80
+
+Таблицы пересоздаются. Чтобы не затереть настоящие метаданные, генератор работает
+только с пустой БД или с БД, созданной им ранее (есть таблица __bench_dataset)
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from config import config  # noqa: E402
+from database_manager import DatabaseManager, PostgreSQLManager  # noqa: E402
+
+SCHEMA_FILE = os.path.join(ROOT, 'структура классов.sql')
+
+# Размеры наборов данных: классов, групп и атрибутов на класс
+SCALES = {
+    'small': {'classes': 200, 'groups_per_class': 5, 'attributes_per_class': 40},
+    'medium': {'classes': 1000, 'groups_per_class': 8, 'attributes_per_class': 100},
+    'large': {'classes': 3000, 'groups_per_class': 10, 'attributes_per_class': 150},
+}
+
+SOURCE_TABLES = ('sxclass_source', 'sxattr_grp_source', 'sxattr_source')
+# Таблица назначения -> таблица источника, чью структуру она повторяет
+TARGET_TABLES = {'sxclass': 'sxclass_source', 'sxattr_grp': 'sxattr_grp_source', 'sxattr': 'sxattr_source'}
+# Колонки состояния миграции есть только у таблиц источника
+SOURCE_ONLY_COLUMNS = ('a_log', 'a_event', 'a_status_variance', 'a_priznak')
+
+DATASET_TABLE = '__bench_dataset'
+# Исходные a_event атрибутов: run_benchmarks.py восстанавливает их после массовых обновлений
+ATTR_EVENT_TABLE = '__bench_attr_event'
+
+# Справочник типов данных (sxattr_source.ouiddatatype, LEFT JOIN в DataService)
+DATATYPES = ('String', 'Integer', 'Long', 'Double', 'Boolean', 'Date', 'DateTime',
+             'Text', 'Reference', 'Collection', 'Binary', 'Money')
+
+# OUID назначения = OUID источника + смещение; метаклассы свойств - отдельный диапазон
+CLASS_OUID_START = 1000
+GROUP_OUID_START = 1_000_000
+ATTRIBUTE_OUID_START = 10_000_000
+TARGET_OUID_OFFSET = 100_000_000
+META_OUID_START = 900_000_000
+
+# Метаклассы назначения, атрибуты которых описывают свойства (SELECT map FROM sxattr WHERE name = ?)
+META_CLASSES = {'class': 'SXClass', 'group': 'SXAttrGrp', 'attribute': 'SXAttr'}
+
+# Ссылочные свойства: значение source - OUID объекта источника
+REFERENCE_PROPERTIES = {
+    'grp': 'SXAttrGrpSource',
+    'refClass': 'SXClassSource',
+    'refAttr': 'SXAttrSource',
+    'cls': 'SXClassSource',
+    'parent': 'SXAttrGrpSource',
+}
+
+WORDS = ('doc', 'person', 'address', 'payment', 'order', 'contract', 'region', 'employee',
+         'service', 'request', 'benefit', 'family', 'income', 'document', 'decision')
+TITLES = ('Документ', 'Гражданин', 'Адрес', 'Выплата', 'Заявление', 'Договор', 'Регион',
+          'Сотрудник', 'Услуга', 'Обращение', 'Льгота', 'Семья', 'Доход', 'Документ-основание', 'Решение')
+
+BATCH_ROWS = 5000
+
+
+def read_properties() -> Dict[str, List[Tuple[str, str, str]]]:
+    """Свойства из файлов исключени*.md: тип сущности -> [(title, name, map)]"""
+    properties: Dict[str, List[Tuple[str, str, str]]] = {}
+    for filename in sorted(glob.glob(os.path.join(ROOT, 'исключени*.md'))):
+        name = os.path.basename(filename).lower()
+        entity_type = next((entity for keyword, entity in DatabaseManager.EXCEPTION_FILE_TYPES
+                            if keyword in name), None)
+        if entity_type is None:
+            continue
+        with open(filename, 'r', encoding='utf-8') as f:
+            lines = f.readlines()[1:]
+        for line in lines:
+            parts = [part.strip() for part in line.strip().split('\t')]
+            if len(parts) >= 3 and parts[1]:
+                properties.setdefault(entity_type, []).append((parts[0], parts[1], parts[2]))
+    return properties
+
+
+def source_table_ddl() -> Dict[str, str]:
+    """CREATE TABLE таблиц источника из "структура классов.sql" (+ a_priznak)"""
+    with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+        schema = f.read()
+    ddl = {}
+    for match in re.finditer(r'create table (\w+)\s*\((.*?)\n\);', schema, re.S | re.I):
+        table, body = match.group(1).lower(), match.group(2)
+        if table in SOURCE_TABLES:
+            if not re.search(r'\ba_priznak\b', body):
+                body += ',\n    a_priznak integer'
+            ddl[table] = f"CREATE TABLE {table}\n({body}\n)"
+    missing = set(SOURCE_TABLES) - set(ddl)
+    if missing:
+        raise RuntimeError(f"В {SCHEMA_FILE} нет таблиц: {', '.join(sorted(missing))}")
+    return ddl
+
+
+class DatasetGenerator:
+    """Генерация данных в памяти и пакетная вставка через DatabaseManager"""
+
+    def __init__(self, db_manager: DatabaseManager, classes: int, groups_per_class: int,
+                 attributes_per_class: int, variance_ratio: float, multiline_ratio: float,
+                 target_ratio: float, seed: int):
+        self.db_manager = db_manager
+        self.classes = classes
+        self.groups_per_class = groups_per_class
+        self.attributes_per_class = attributes_per_class
+        self.variance_ratio = variance_ratio
+        self.multiline_ratio = multiline_ratio
+        self.target_ratio = target_ratio
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.properties = read_properties()
+        self.counts: Dict[str, int] = {}
+
+    # ===== Значения =====
+
+    def _status(self) -> Tuple[int, int, int]:
+        """a_status_variance, a_event, a_priznak"""
+        variance = 2 if self.rng.random() < self.variance_ratio else 0
+        event = self.rng.choices((0, 2, 4), weights=(80, 10, 10))[0]
+        priznak = self.rng.choices((1, 2, 3), weights=(70, 20, 10))[0]
+        return variance, event, priznak
+
+    def _value(self, property_name: str, ouids: Dict[str, List[int]]) -> str:
+        """Значение свойства: ссылка, число, флаг или текст"""
+        reference = REFERENCE_PROPERTIES.get(property_name)
+        if reference:
+            pool = ouids.get(reference) or [0]
+            return f"{self.rng.choice(pool)}@{reference}"
+        kind = self.rng.random()
+        if kind < 0.4:
+            return self.rng.choice(('0', '1', 'true', 'false'))
+        if kind < 0.7:
+            return str(self.rng.randint(1, 4000))
+        word = self.rng.choice(WORDS)
+        return f"{word}_{self.rng.randint(1, 999)}"
+
+    def _multiline(self) -> str:
+        """Многострочное значение target (SQL политики выбора): строки продолжения с отступом"""
+        table = self.rng.choice(WORDS)
+        return (f"SELECT ouid, name FROM {table}\n"
+                f"        WHERE a_status = {self.rng.randint(1, 9)}\n"
+                f"        ORDER BY name")
+
+    def make_log(self, entity_type: str, ouids: Dict[str, List[int]]) -> str:
+        """a_log с различиями по 1-8 свойствам сущности"""
+        properties = self.properties.get(entity_type) or []
+        if not properties:
+            return ''
+        count = min(len(properties), self.rng.randint(1, 8))
+        blocks = []
+        for _, name, _ in self.rng.sample(properties, count):
+            source = self._value(name, ouids)
+            if self.rng.random() < self.multiline_ratio:
+                target = self._multiline()
+            elif self.rng.random() < 0.1:
+                target = ''
+            else:
+                target = self._value(name, ouids)
+            blocks.append(f"{name}\n    source = {source}\n    target = {target}")
+        return '\n'.join(blocks)
+
+    # ===== Таблицы =====
+
+    def create_tables(self):
+        """Пересоздание таблиц источника, назначения и служебных таблиц набора"""
+        ddl = source_table_ddl()
+        tables = list(TARGET_TABLES) + list(SOURCE_TABLES) + ['sxdatatype', DATASET_TABLE, ATTR_EVENT_TABLE,
+                                                            '__meta_statistic']
+        for table in tables:
+            self.db_manager.execute_update(f"DROP TABLE IF EXISTS {table}")
+        for table in SOURCE_TABLES:
+            self.db_manager.execute_update(ddl[table])
+        for target, source in TARGET_TABLES.items():
+            self.db_manager.execute_update(f"CREATE TABLE {target} (LIKE {source})")
+            drops = ', '.join(f"DROP COLUMN {column}" for column in SOURCE_ONLY_COLUMNS)
+            self.db_manager.execute_update(f"ALTER TABLE {target} {drops}, ADD PRIMARY KEY (ouid)")
+        self.db_manager.execute_update("CREATE TABLE sxdatatype (ouid INTEGER PRIMARY KEY, description VARCHAR(255))")
+        self.db_manager.execute_update(f"CREATE TABLE {DATASET_TABLE} (generated_at TIMESTAMP, params TEXT)")
+        self.db_manager.execute_update(
+            f"CREATE TABLE {ATTR_EVENT_TABLE} (ouid INTEGER PRIMARY KEY, a_event INTEGER)")
+
+    def _insert(self, table: str, columns: List[str], rows: List[List]):
+        """Пакетная вставка; ts и a_createdate заполняются на сервере"""
+        if not rows:
+            return
+        values = ', '.join('?' for _ in columns)
+        extra = ''
+        if table in SOURCE_TABLES or table in TARGET_TABLES:
+            extra = ', ts, a_createdate'
+            values += ', now(), now()'
+        query = f"INSERT INTO {table} ({', '.join(columns)}{extra}) VALUES ({values})"
+        for start in range(0, len(rows), BATCH_ROWS):
+            with self.db_manager.transaction():
+                self.db_manager.execute_batch(query, rows[start:start + BATCH_ROWS])
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+
+    def generate(self):
+        """Классы, группы и атрибуты источника и соответствующие объекты назначения"""
+        class_ouids = [CLASS_OUID_START + i for i in range(self.classes)]
+        group_ouids: Dict[int, List[int]] = {}
+        attribute_ouids: Dict[int, List[int]] = {}
+        next_group, next_attribute = GROUP_OUID_START, ATTRIBUTE_OUID_START
+        for class_ouid in class_ouids:
+            group_ouids[class_ouid] = list(range(next_group, next_group + self.groups_per_class))
+            attribute_ouids[class_ouid] = list(range(next_attribute, next_attribute + self.attributes_per_class))
+            next_group += self.groups_per_class
+            next_attribute += self.attributes_per_class
+        ouids = {
+            'SXClassSource': class_ouids,
+            'SXAttrGrpSource': [ouid for group in group_ouids.values() for ouid in group],
+            'SXAttrSource': [ouid for attrs in attribute_ouids.values() for ouid in attrs],
+        }
+
+        classes, groups, attributes = [], [], []
+        target_classes, target_groups, target_attributes = [], [], []
+        for number, class_ouid in enumerate(class_ouids):
+            word = WORDS[number % len(WORDS)]
+            class_name = f"{word}{number}"
+            description = f"{TITLES[number % len(TITLES)]} {number}"
+            variance, event, priznak = self._status()
+            log = self.make_log('class', ouids) if variance == 2 else None
+            parent = self.rng.choice(class_ouids[:number]) if number and self.rng.random() < 0.3 else None
+            classes.append([class_ouid, class_name, description, f"{class_name.upper()}_TAB",
+                            0, 1, parent, log, event, variance, priznak])
+            in_target = self.rng.random() < self.target_ratio
+            if in_target:
+                target_classes.append([class_ouid + TARGET_OUID_OFFSET, class_name, description,
+                                       f"{class_name.upper()}_TAB", 0])
+
+            for index, group_ouid in enumerate(group_ouids[class_ouid]):
+                group_name = f"{class_name}_grp{index}"
+                variance, event, priznak = self._status()
+                log = self.make_log('group', ouids) if variance == 2 else None
+                groups.append([group_ouid, group_name, f"Группа {index} ({description})", class_ouid,
+                               index, 0, log, event, variance, priznak])
+                if in_target and self.rng.random() < self.target_ratio:
+                    target_groups.append([group_ouid + TARGET_OUID_OFFSET, group_name, f"Группа {index}",
+                                          class_ouid + TARGET_OUID_OFFSET, index])
+
+            for index, attribute_ouid in enumerate(attribute_ouids[class_ouid]):
+                attr_word = self.rng.choice(WORDS)
+                attr_name = f"{attr_word}_{index}"
+                title = f"{self.rng.choice(TITLES)} ({index})"
+                variance, event, priznak = self._status()
+                log = self.make_log('attribute', ouids) if variance == 2 else None
+                group = self.rng.choice(group_ouids[class_ouid]) if group_ouids[class_ouid] else None
+                attributes.append([attribute_ouid, attr_name, title, f"Описание {attr_word} {index}",
+                                   attr_name.upper(), class_ouid, group, index, self.rng.randint(1, len(DATATYPES)),
+                                   0, log, event, variance, priznak])
+                if in_target and self.rng.random() < self.target_ratio:
+                    target_attributes.append([attribute_ouid + TARGET_OUID_OFFSET, attr_name, title,
+                                              attr_name.upper(), class_ouid + TARGET_OUID_OFFSET])
+
+        # Метаклассы назначения: атрибуты с map для поиска поля по имени свойства
+        for number, (entity_type, class_name) in enumerate(META_CLASSES.items()):
+            meta_ouid = META_OUID_START + number * 1000
+            target_classes.append([meta_ouid, class_name, f"Метакласс {class_name}", class_name.upper(), 1])
+            for index, (title, name, field) in enumerate(self.properties.get(entity_type, []), 1):
+                target_attributes.append([meta_ouid + index, name, title, field, meta_ouid])
+
+        self._insert('sxdatatype', ['ouid', 'description'],
+                     [[ouid, description] for ouid, description in enumerate(DATATYPES, 1)])
+        common = ['a_log', 'a_event', 'a_status_variance', 'a_priznak']
+        self._insert('sxclass_source', ['ouid', 'name', 'description', 'map', 'a_issystem', 'a_editor',
+                                        'parent_ouid'] + common, classes)
+        self._insert('sxattr_grp_source', ['ouid', 'name', 'title', 'cls', 'num', 'a_issystem'] + common, groups)
+        self._insert('sxattr_source', ['ouid', 'name', 'title', 'description', 'map', 'ouidsxclass', 'agrp',
+                                       'num', 'ouiddatatype', 'a_issystem'] + common, attributes)
+        self._insert('sxclass', ['ouid', 'name', 'description', 'map', 'a_issystem'], target_classes)
+        self._insert('sxattr_grp', ['ouid', 'name', 'title', 'cls', 'num'], target_groups)
+        self._insert('sxattr', ['ouid', 'name', 'title', 'map', 'ouidsxclass'], target_attributes)
+
+        self.db_manager.execute_update(
+            f"INSERT INTO {ATTR_EVENT_TABLE} (ouid, a_event) SELECT ouid, a_event FROM sxattr_source")
+
+    def params(self) -> Dict:
+        return {'classes': self.classes, 'groups_per_class': self.groups_per_class,
+                'attributes_per_class': self.attributes_per_class, 'variance_ratio': self.variance_ratio,
+                'multiline_ratio': self.multiline_ratio, 'target_ratio': self.target_ratio,
+                'seed': self.seed, 'rows': self.counts}
+
+    def save_params(self):
+        self.db_manager.execute_update(f"INSERT INTO {DATASET_TABLE} (generated_at, params) VALUES (now(), ?)",
+                                       [json.dumps(self.params(), ensure_ascii=False)])
+
+
+def is_benchmark_database(db_manager: DatabaseManager) -> bool:
+    """БД пустая или заполнена генератором ранее"""
+    result = db_manager.execute_query(
+        f"SELECT to_regclass('sxclass_source') IS NULL OR to_regclass('{DATASET_TABLE}') IS NOT NULL", [])
+    return bool(result) and result[0][0] in ('t', 'true')
+
+
+def main(argv: List[str] = None) -> int:
+    from logging_setup import setup_logging
+    from schema import ensure_indexes
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Генерация синтетических метаданных для замеров')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Размер набора данных')
+    parser.add_argument('--classes', type=int, help='Число классов (вместо значения --scale)')
+    parser.add_argument('--groups-per-class', type=int, help='Групп атрибутов на класс')
+    parser.add_argument('--attributes-per-class', type=int, help='Атрибутов на класс')
+    parser.add_argument('--variance-ratio', type=float, default=0.3,
+                        help='Доля объектов с различиями (a_status_variance = 2 и непустой a_log)')
+    parser.add_argument('--multiline-ratio', type=float, default=0.15,
+                        help='Доля различий с многострочным target')
+    parser.add_argument('--target-ratio', type=float, default=0.95,
+                        help='Доля объектов, найденных в таблицах назначения')
+    parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора (воспроизводимость)')
+    parser.add_argument('--no-indexes', action='store_true',
+                        help='Не создавать рекомендуемые индексы (замер без них)')
+    args = parser.parse_args(argv)
+
+    sizes = dict(SCALES[args.scale])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    db_manager = PostgreSQLManager()
+    if not db_manager.connect():
+        print("❌ Ошибка подключения к БД")
+        return 1
+
+    started = time.time()
+    try:
+        if not is_benchmark_database(db_manager):
+            print(f"❌ В {config.postgres.host}/{config.postgres.database} уже есть sxclass_source, "
+                  f"не созданная генератором. Укажите отдельную БД для замеров (POSTGRES_DB)")
+            return 1
+
+        generator = DatasetGenerator(db_manager, variance_ratio=args.variance_ratio,
+                                     multiline_ratio=args.multiline_ratio, target_ratio=args.target_ratio,
+                                     seed=args.seed, **sizes)
+        if not generator.properties:
+            print("❌ Не найдены файлы исключени*.md со списками свойств")
+            return 1
+
+        print(f"🧱 Таблицы: {config.postgres.host}/{config.postgres.database}")
+        generator.create_tables()
+        generator.generate()
+        generator.save_params()
+        for table, count in generator.counts.items():
+            print(f"   {table:<20} {count:>10} строк")
+    finally:
+        db_manager.disconnect()
+
+    # Исключения из файлов и индексы поиска - так же, как в manage.py bootstrap
+    from data_service import DataService
+    report = DataService(db_manager).bootstrap(force_reload=True)
+    if not report.get('success'):
+        print(f"❌ Ошибка загрузки исключений: {report.get('error') or report.get('exceptions')}")
+        return 1
+    print(f"📥 Исключений: {report['exceptions'].get('inserted', 0)}")
+
+    if not args.no_indexes and db_manager.connect():
+        try:
+            report = ensure_indexes(db_manager, create=True, concurrently=False)
+            print(f"🗂️ Рекомендуемых индексов: {sum(entry['status'] in ('ok', 'created') for entry in report)}"
+                  f" из {len(report)}")
+            for table in list(SOURCE_TABLES) + list(TARGET_TABLES) + ['sxdatatype', '__meta_statistic']:
+                db_manager.execute_update(f"ANALYZE {table}")
+        finally:
+            db_manager.disconnect()
+
+    print(f"⏱️ Набор данных создан за {time.time() - started:.1f} сек (seed={args.seed})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
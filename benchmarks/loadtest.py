@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест запущенного приложения: сессии навигации пользователя
+с возрастающим числом одновременных пользователей
+
+Сессия повторяет типовую работу: список классов -> фильтр -> анализ исключений ->
+детали класса -> атрибуты с анализом -> выгрузка (с вероятностью --export-ratio).
+Для каждого уровня параллельности считаются пропускная способность, p50/p95/p99
+задержки и доля ошибок по каждому маршруту, а также время SQL из Server-Timing
+
+    python benchmarks/loadtest.py --url http://localhost:5000 --concurrency 1,4,8,16 --duration 30
+    python benchmarks/loadtest.py --url https://metarep.local --insecure --think-ms 500
+
+Зависимостей нет (http.client); у каждого пользователя свое keep-alive соединение.
+Результаты пишутся в JSON (по умолчанию benchmarks/results/loadtest-<дата>.json)
+"""
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import random
+import re
+import ssl
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SEARCH_TERMS = ('doc', 'person', 'payment', 'order', 'region', 'service')
+
+_SERVER_TIMING_DB = re.compile(r'(?:^|,)\s*db;dur=([0-9.]+)')
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Перцентиль по ближайшему рангу (values отсортированы)"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+class RouteStats:
+    """Задержки и ошибки одного маршрута на одном уровне параллельности"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.db_ms: List[float] = []
+        self.errors = 0
+        self.bytes = 0
+        self.error_samples: List[str] = []
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        requests = len(latencies) + self.errors
+        return {
+            'requests': requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / requests, 4) if requests else 0.0,
+            'rps': round(len(latencies) / duration, 2) if duration else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            'db_avg_ms': round(sum(self.db_ms) / len(self.db_ms), 1) if self.db_ms else None,
+            'avg_kb': round(self.bytes / len(latencies) / 1024, 1) if latencies else 0.0,
+            'error_samples': self.error_samples,
+        }
+
+
+class LoadRun:
+    """Общие счетчики уровня параллельности (маршрут -> RouteStats)"""
+
+    def __init__(self):
+        self.routes: Dict[str, RouteStats] = {}
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def record(self, route: str, elapsed: float, ok: bool, size: int = 0,
+               db_ms: Optional[float] = None, error: str = None):
+        with self._lock:
+            stats = self.routes.setdefault(route, RouteStats())
+            if ok:
+                stats.latencies.append(elapsed)
+                stats.bytes += size
+                if db_ms is not None:
+                    stats.db_ms.append(db_ms)
+            else:
+                stats.errors += 1
+                if error and len(stats.error_samples) < 5:
+                    stats.error_samples.append(error)
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+
+class VirtualUser(threading.Thread):
+    """Пользователь: сессии навигации подряд до окончания времени уровня"""
+
+    def __init__(self, number: int, args, run: LoadRun, deadline: float):
+        super().__init__(name=f"user-{number}", daemon=True)
+        self.args = args
+        self.run_stats = run
+        self.deadline = deadline
+        self.rng = random.Random(args.seed + number)
+        self.target = urlsplit(args.url)
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        host, port = self.target.hostname, self.target.port
+        timeout = self.args.timeout
+        if self.target.scheme == 'https':
+            context = ssl._create_unverified_context() if self.args.insecure else ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, route: str, path: str, params: List[Tuple[str, Any]] = ()) -> Optional[bytes]:
+        """GET с учетом в статистике маршрута; None при ошибке"""
+        url = self.target.path.rstrip('/') + path + ('?' + urlencode(params) if params else '')
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = self._connect()
+            self.connection.request('GET', url, headers={'Accept-Encoding': 'identity'})
+            response = self.connection.getresponse()
+            body = response.read()
+            elapsed = time.perf_counter() - started
+        except (OSError, http.client.HTTPException) as e:
+            # Соединение после ошибки не переиспользуется
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            self.run_stats.record(route, time.perf_counter() - started, False, error=f"{type(e).__name__}: {e}")
+            return None
+
+        if response.status >= 400:
+            self.run_stats.record(route, elapsed, False, error=f"HTTP {response.status}")
+            return None
+        timing = _SERVER_TIMING_DB.search(response.getheader('Server-Timing') or '')
+        self.run_stats.record(route, elapsed, True, len(body), float(timing.group(1)) if timing else None)
+        return body
+
+    def think(self):
+        if self.args.think_ms:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.args.think_ms / 1000)
+
+    def session(self):
+        """Одна сессия навигации"""
+        search = self.rng.choice(SEARCH_TERMS)
+        self.request('/classes', '/classes')
+        self.think()
+        self.request('/api/classes_with_exceptions (filter)', '/api/classes_with_exceptions',
+                     [('status_variance', 2), ('search', search)])
+        self.think()
+        body = self.request('/api/classes_with_exceptions (analyze)', '/api/classes_with_exceptions',
+                            [('status_variance', 2), ('analyze_exceptions', 'true')])
+        self.think()
+        class_ouids = self._class_ouids(body)
+        if class_ouids:
+            self.request('/class/<ouid>', f"/class/{self.rng.choice(class_ouids)}")
+            self.think()
+        self.request('/attributes (analyze)', '/attributes',
+                     [('status_variance', 2), ('analyze_exceptions', 'true'),
+                      ('page', self.rng.randint(1, self.args.max_page))])
+        self.think()
+        if self.rng.random() < self.args.export_ratio:
+            self.request('/export/attributes.xlsx', '/export/attributes.xlsx',
+                         [('status_variance', 2), ('search', search), ('analyze_exceptions', 'true')])
+        self.run_stats.session_done()
+
+    @staticmethod
+    def _class_ouids(body: Optional[bytes]) -> List[int]:
+        """OUID классов из ответа /api/classes_with_exceptions (классы сгруппированы по действиям)"""
+        if not body:
+            return []
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return []
+        ouids = []
+        groups = data.get('classes') or {}
+        for items in (groups.values() if isinstance(groups, dict) else [groups]):
+            ouids.extend(int(item['ouid']) for item in items if isinstance(item, dict) and item.get('ouid'))
+        return ouids
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                self.session()
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+
+def run_level(args, concurrency: int) -> Dict[str, Any]:
+    """Один уровень параллельности: concurrency пользователей в течение args.duration"""
+    run = LoadRun()
+    started = time.monotonic()
+    deadline = started + args.duration
+    users = [VirtualUser(number, args, run, deadline) for number in range(concurrency)]
+    for user in users:
+        user.start()
+        # Пользователи подключаются постепенно, а не одним залпом
+        if args.ramp_up:
+            time.sleep(args.ramp_up / concurrency)
+    for user in users:
+        user.join()
+    duration = time.monotonic() - started
+
+    routes = {route: stats.summary(duration) for route, stats in run.routes.items()}
+    total = sum(route['requests'] for route in routes.values())
+    errors = sum(route['errors'] for route in routes.values())
+    latencies = sorted(latency for stats in run.routes.values() for latency in stats.latencies)
+    return {
+        'concurrency': concurrency,
+        'duration_sec': round(duration, 1),
+        'sessions': run.sessions,
+        'requests': total,
+        'rps': round((total - errors) / duration, 2),
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'routes': routes,
+    }
+
+
+def print_level(level: Dict[str, Any]):
+    print(f"\n👥 {level['concurrency']} пользователей: {level['sessions']} сессий, "
+          f"{level['rps']} запр/сек, ошибок {level['error_rate'] * 100:.1f}%, "
+          f"p50 {level['p50_ms']} / p95 {level['p95_ms']} / p99 {level['p99_ms']} мс")
+    print(f"  {'Маршрут':<40} {'запр.':>6} {'ош.':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>7}")
+    for route, stats in sorted(level['routes'].items()):
+        db = stats['db_avg_ms'] if stats['db_avg_ms'] is not None else '-'
+        print(f"  {route:<40} {stats['requests']:>6} {stats['errors']:>5} {stats['rps']:>7} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {db:>7}")
+        for sample in stats['error_samples']:
+            print(f"      ❌ {sample}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест маршрутов приложения')
+    parser.add_argument('--url', default='http://localhost:5000', help='Адрес запущенного приложения')
+    parser.add_argument('--concurrency', default='1,2,4,8,16',
+                        help='Уровни числа одновременных пользователей через запятую')
+    parser.add_argument('--duration', type=float, default=30.0, help='Длительность каждого уровня, сек')
+    parser.add_argument('--ramp-up', type=float, default=2.0, help='Время подключения всех пользователей, сек')
+    parser.add_argument('--think-ms', type=float, default=0.0,
+                        help='Пауза пользователя между действиями, мс (0 - максимальная нагрузка)')
+    parser.add_argument('--export-ratio', type=float, default=0.1,
+                        help='Доля сессий, завершающихся выгрузкой в Excel')
+    parser.add_argument('--max-page', type=int, default=5, help='Страницы атрибутов выбираются из 1..N')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Таймаут запроса, сек')
+    parser.add_argument('--insecure', action='store_true', help='Не проверять сертификат HTTPS')
+    parser.add_argument('--seed', type=int, default=42, help='Начальное значение выбора классов и страниц')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Код возврата 1, если доля ошибок на каком-либо уровне выше')
+    parser.add_argument('--output', help='Файл результатов JSON')
+    args = parser.parse_args(argv)
+
+    levels = [int(value) for value in args.concurrency.split(',') if value.strip()]
+    report = {
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'url': args.url,
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output',)},
+        'levels': [],
+    }
+
+    print(f"🎯 {args.url}: уровни {levels}, по {args.duration:g} сек")
+    for concurrency in levels:
+        level = run_level(args, concurrency)
+        report['levels'].append(level)
+        print_level(level)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"loadtest-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'Пользователей':>13} {'запр/сек':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'ошибки':>7}")
+    for level in report['levels']:
+        print(f"{level['concurrency']:>13} {level['rps']:>9} {level['p50_ms']:>8} {level['p95_ms']:>8} "
+              f"{level['p99_ms']:>8} {level['error_rate'] * 100:>6.1f}%")
+    print(f"\n💾 Результаты: {output}")
+
+    return 1 if any(level['error_rate'] > args.max_error_rate for level in report['levels']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
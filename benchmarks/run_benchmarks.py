@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Замеры основных операций DataService на наборе данных из generate_data.py
+
+Каждый сценарий выполняется --warmup раз без учета и --repeat раз с замером;
+для каждого сохраняются время выполнения, число и суммарное время SQL запросов
+(instrumentation.RequestStats). Выгрузки и генерация скриптов вызываются через
+тестовый клиент Flask, т.к. их логика находится в обработчиках app.py
+
+    python benchmarks/run_benchmarks.py [--repeat 5] [--only attributes_fast,exports_classes]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<предыдущий>.json
+
+Результаты пишутся в JSON (по умолчанию benchmarks/results/<дата>-<backend>.json)
+для сравнения между запусками
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from config import config  # noqa: E402
+from generate_data import ATTR_EVENT_TABLE, DATASET_TABLE  # noqa: E402
+from instrumentation import current_request, start_request  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class BenchmarkContext:
+    """Объекты, общие для всех сценариев"""
+
+    def __init__(self, data_service, client):
+        self.data_service = data_service
+        self.client = client
+        self.class_ouid = self._sample_class()
+
+    def _sample_class(self) -> Optional[int]:
+        """Класс с наибольшим числом атрибутов с различиями"""
+        db_manager = self.data_service.db_manager
+        if not db_manager.connect():
+            return None
+        try:
+            result = db_manager.execute_query("""
+                SELECT ouidsxclass FROM sxattr_source
+                WHERE a_status_variance = 2
+                GROUP BY ouidsxclass
+                ORDER BY COUNT(*) DESC, ouidsxclass
+                LIMIT 1
+            """, [])
+            return int(result[0][0]) if result else None
+        finally:
+            db_manager.disconnect()
+
+    def get(self, url: str) -> int:
+        """GET через тестовый клиент; размер ответа в байтах"""
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url}: HTTP {response.status_code}")
+        return len(response.get_data())
+
+    def restore_events(self):
+        """Исходные a_event атрибутов после сценариев массового обновления"""
+        db_manager = self.data_service.db_manager
+        if db_manager.connect():
+            try:
+                db_manager.execute_update(f"""
+                    UPDATE sxattr_source s SET a_event = b.a_event
+                    FROM {ATTR_EVENT_TABLE} b
+                    WHERE b.ouid = s.ouid AND s.a_event IS DISTINCT FROM b.a_event
+                """)
+            finally:
+                db_manager.disconnect()
+
+
+# Сценарий: имя, вызов, изменяет ли данные (после такого восстанавливаются a_event)
+Scenario = Tuple[str, Callable[[BenchmarkContext], Any], bool]
+
+SCENARIOS: List[Scenario] = [
+    ('attributes_fast', lambda ctx: ctx.data_service.get_attributes(
+        page=1, per_page=50, analyze_exceptions=False), False),
+    ('attributes_fast_search', lambda ctx: ctx.data_service.get_attributes(
+        page=1, per_page=50, search='doc', analyze_exceptions=False), False),
+    ('attributes_analysis', lambda ctx: ctx.data_service.get_attributes(
+        page=1, per_page=50, status_variance=2, analyze_exceptions=True), False),
+    ('classes_fast', lambda ctx: ctx.data_service.get_classes_with_exceptions(
+        page=1, per_page=20, analyze_exceptions=False), False),
+    ('classes_with_exceptions', lambda ctx: ctx.data_service.get_classes_with_exceptions(
+        page=1, per_page=20, status_variance=2, analyze_exceptions=True), False),
+    ('groups', lambda ctx: ctx.data_service.get_groups(page=1, per_page=20, search='doc'), False),
+    ('class_details', lambda ctx: ctx.data_service.get_class_details(ctx.class_ouid), False),
+    ('statistics', lambda ctx: ctx.data_service.get_statistics(), False),
+    ('exports_classes', lambda ctx: ctx.get('/export/classes.xlsx?status_variance=2'), False),
+    ('exports_attributes', lambda ctx: ctx.get(
+        '/export/attributes.xlsx?status_variance=2&analyze_exceptions=true'), False),
+    ('sql_scripts', lambda ctx: ctx.get(
+        '/api/generate_sql_scripts?status_variance=2&analyze_exceptions=true'), False),
+    ('data_update_scripts', lambda ctx: ctx.get(
+        '/api/generate_data_update_scripts?status_variance=2&analyze_exceptions=true'
+        '&property_filter=grp&property_filter=refClass'), False),
+    ('bulk_update_class', lambda ctx: ctx.data_service.update_attributes_event_by_class(
+        ctx.class_ouid, status_variance=2), True),
+    ('bulk_update_filters', lambda ctx: ctx.data_service.update_attributes_event_by_filters(
+        status_variance=2, search='doc'), True),
+]
+
+
+def run_scenario(ctx: BenchmarkContext, call: Callable, mutates: bool,
+                 warmup: int, repeat: int) -> Dict[str, Any]:
+    """Прогрев и замеры одного сценария"""
+    runs, queries, sql_ms, rows = [], [], [], []
+    for attempt in range(warmup + repeat):
+        start_request()
+        started = time.perf_counter()
+        result = call(ctx)
+        elapsed = time.perf_counter() - started
+        # Обработчики Flask начинают свои счетчики; берем последние
+        stats = current_request()
+        if mutates:
+            ctx.restore_events()
+        if isinstance(result, dict) and result.get('error'):
+            raise RuntimeError(result['error'])
+        if attempt < warmup:
+            continue
+        runs.append(round(elapsed * 1000, 1))
+        queries.append(stats.queries)
+        sql_ms.append(round(stats.total * 1000, 1))
+        rows.append(stats.rows)
+
+    return {
+        'runs_ms': runs,
+        'min_ms': min(runs),
+        'median_ms': round(statistics.median(runs), 1),
+        'max_ms': max(runs),
+        'queries': max(queries),
+        'sql_ms': round(statistics.median(sql_ms), 1),
+        'rows': max(rows),
+    }
+
+
+def dataset_params(data_service) -> Dict[str, Any]:
+    """Параметры набора данных из __bench_dataset"""
+    db_manager = data_service.db_manager
+    if not db_manager.connect():
+        raise RuntimeError("Ошибка подключения к БД")
+    try:
+        result = db_manager.execute_query(
+            f"SELECT generated_at, params FROM {DATASET_TABLE} ORDER BY generated_at DESC LIMIT 1", [])
+    except Exception:
+        result = []
+    finally:
+        db_manager.disconnect()
+    if not result:
+        raise RuntimeError("Нет набора данных: сначала запустите benchmarks/generate_data.py")
+    params = json.loads(result[0][1])
+    params['generated_at'] = result[0][0]
+    return params
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any], threshold: float) -> int:
+    """Сравнение медиан с предыдущим запуском; число замедлившихся сценариев"""
+    if current['dataset'].get('rows') != previous.get('dataset', {}).get('rows'):
+        print("⚠️ Наборы данных различаются, сравнение приблизительное")
+    print(f"\n{'Сценарий':<26} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    slower = 0
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before or 'median_ms' not in before or 'median_ms' not in result:
+            continue
+        change = result['median_ms'] / before['median_ms'] if before['median_ms'] else 1.0
+        flag = ''
+        if change >= threshold:
+            flag = ' ⚠️'
+            slower += 1
+        elif change <= 1 / threshold:
+            flag = ' 🚀'
+        print(f"{name:<26} {before['median_ms']:>10} {result['median_ms']:>10} {(change - 1) * 100:>+9.0f}%{flag}")
+    return slower
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Замеры основных операций DataService')
+    parser.add_argument('--repeat', type=int, default=3, help='Замеров на сценарий')
+    parser.add_argument('--warmup', type=int, default=1, help='Прогонов без учета (JIT, кэши, пул)')
+    parser.add_argument('--only', help='Сценарии через запятую (по умолчанию все)')
+    parser.add_argument('--output', help='Файл результатов JSON')
+    parser.add_argument('--compare', help='Предыдущие результаты для сравнения')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Во сколько раз медиана должна вырасти, чтобы считаться замедлением')
+    parser.add_argument('--list', action='store_true', help='Показать сценарии и выйти')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _, mutates in SCENARIOS:
+            print(f"{name}{' (изменяет a_event, восстанавливается)' if mutates else ''}")
+        return 0
+
+    selected = set(args.only.split(',')) if args.only else None
+    unknown = (selected or set()) - {name for name, _, _ in SCENARIOS}
+    if unknown:
+        print(f"❌ Неизвестные сценарии: {', '.join(sorted(unknown))}")
+        return 1
+
+    # Приложение целиком: те же DataService и обработчики, что обслуживают запросы
+    from app import app, data_service
+
+    report = {
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'backend': config.postgres.backend,
+        'jvm_profile': config.jvm.profile,
+        'warmup': args.warmup,
+        'repeat': args.repeat,
+        'dataset': dataset_params(data_service),
+        'scenarios': {},
+    }
+    ctx = BenchmarkContext(data_service, app.test_client())
+    print(f"📊 Набор данных: {report['dataset'].get('rows')}, backend {report['backend']}")
+
+    failed = 0
+    for name, call, mutates in SCENARIOS:
+        if selected and name not in selected:
+            continue
+        try:
+            result = run_scenario(ctx, call, mutates, args.warmup, args.repeat)
+            print(f"  ✅ {name:<26} {result['median_ms']:>9} мс (min {result['min_ms']}, max {result['max_ms']}), "
+                  f"SQL x{result['queries']} {result['sql_ms']} мс")
+        except Exception as e:
+            result = {'error': str(e)}
+            failed += 1
+            print(f"  ❌ {name:<26} {e}")
+        report['scenarios'][name] = result
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{report['backend']}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Результаты: {output}")
+
+    slower = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            slower = compare(report, json.load(f), args.threshold)
+    return 1 if failed or slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
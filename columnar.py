@@ -0,0 +1,53 @@
+"""
+Компактный JSON для списков API (format=columnar)
+
+    {
+      "columns": ["ouid", "name", "class_name", ...],
+      "values": [[...], [...], [0, 0, 1, ...]],        # массив значений на колонку
+      "dictionaries": {"class_name": ["Doc", "Person"]}, # номера вместо повторяющихся строк
+      "url_templates": {"admin_url": {"template": ".../edit.htm?id={}@SXAttr",
+                                      "columns": ["target_ouid", "ouid"]}}
+    }
+
+Имена полей передаются один раз на ответ, а не в каждой строке. Колонки из
+dictionary_columns (класс, тип, свойства, действие) кодируются номерами в
+словаре колонки. Ссылки в админку не передаются: браузер подставляет в шаблон
+первое непустое значение из перечисленных колонок (static/js/virtual_table.js)
+"""
+from typing import Any, Dict, Iterable, List, Sequence
+
+
+def encode(rows: List[Dict[str, Any]], columns: Sequence[str],
+           dictionary_columns: Iterable[str] = ()) -> Dict[str, Any]:
+    """Строки-словари -> колонки; None остается None и в закодированных колонках"""
+    dictionary_columns = set(dictionary_columns)
+    values = []
+    dictionaries = {}
+    for column in columns:
+        column_values = [row.get(column) for row in rows]
+        if column in dictionary_columns:
+            codes = {}
+            encoded = []
+            for value in column_values:
+                if value is None:
+                    encoded.append(None)
+                    continue
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(codes)
+                encoded.append(code)
+            dictionaries[column] = list(codes)
+            column_values = encoded
+        values.append(column_values)
+    return {
+        'format': 'columnar',
+        'columns': list(columns),
+        'values': values,
+        'dictionaries': dictionaries,
+        'rows': len(rows),
+    }
+
+
+def url_template(template: str, *columns: str) -> Dict[str, Any]:
+    """Описание вычисляемой колонки-ссылки: шаблон с {} и колонки OUID по приоритету"""
+    return {'template': template, 'columns': list(columns)}
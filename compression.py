@@ -0,0 +1,64 @@
+"""
+Сжатие ответов приложения (RESPONSE_COMPRESSION)
+
+brotli - если установлен пакет Brotli и клиент его принимает, иначе gzip.
+Сжимаются только текстовые ответы (JSON, HTML, текст) от COMPRESSION_MIN_SIZE
+байт; файлы (send_file, выгрузки Excel, static) и потоковые ответы не трогаются.
+nginx сжимает JSON и сам, но только gzip и только за прокси; ответы, уже сжатые
+приложением, nginx передает как есть
+"""
+import gzip
+import time
+from typing import Optional
+
+from config import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'text/csv',
+                          'application/javascript')
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Кодировка по заголовку Accept-Encoding (werkzeug Accept); None - без сжатия"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encodings):
+    """Сжатие тела ответа на месте; возвращает тот же response"""
+    settings = config.performance
+    if (not settings.response_compression or response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    # Ответ зависит от Accept-Encoding - для кэшей и nginx
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < settings.compression_min_size:
+        return response
+
+    started = time.perf_counter()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=settings.brotli_quality)
+    else:
+        compressed = gzip.compress(data, compresslevel=settings.gzip_level, mtime=0)
+    elapsed = time.perf_counter() - started
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if config.logging.server_timing:
+        response.headers.add('Server-Timing',
+                             f'compress;dur={elapsed * 1000:.1f};desc="{encoding} {len(data)}->{len(compressed)}"')
+    return response
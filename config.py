@@ -4,7 +4,7 @@
 """
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения из .env файла
@@ -36,15 +36,31 @@ class DatabaseConfig:
     query_timeout: int = 300
     enable_ssl: bool = False
     verify_ssl: bool = False
+    prepare_threshold: Optional[int] = None  # PostgreSQL JDBC: после скольких выполнений готовить запрос на сервере
+    backend: str = "jdbc"  # jdbc (JPype) | psycopg (без JVM, только PostgreSQL) | broker (через db_broker)
+    broker_socket: str = "/tmp/metarep-db.sock"  # Unix сокет брокера БД (manage.py broker)
 
 @dataclass
 class LoggingConfig:
     """Конфигурация логирования"""
     level: str = "INFO"
+    module_levels: str = ""  # Уровни модулей: "data_service=DEBUG,database_manager=WARNING"
+    file: str = ""  # Файл журнала с ротацией (max_size, backup_count); пусто - только stdout
     max_size: int = 10485760  # 10MB
     backup_count: int = 5
     encrypt_passwords: bool = True
     datetime_format: str = "%Y-%m-%d %H:%M:%S"
+    slow_query_ms: int = 500  # Запросы дольше порога пишутся в журнал медленных запросов
+    slow_query_log: str = "logs/slow_queries.log"  # Пусто - в stderr
+    server_timing: bool = True  # Заголовок Server-Timing с временем SQL в ответах
+
+@dataclass
+class ProfilingConfig:
+    """Профилирование отдельных запросов (?__profile=1)"""
+    token: str = ""  # Токен администратора (X-Profile-Token); пусто - профилирование выключено
+    interval_ms: int = 5  # Период снятия стеков
+    directory: str = "logs/profiles"  # Куда сохраняются профили (формат collapsed stacks)
+    keep: int = 50  # Сколько последних профилей хранить
 
 @dataclass  
 class TaskGenerationConfig:
@@ -70,6 +86,80 @@ class PerformanceConfig:
     max_db_connections: int = 5
     connection_pool_timeout: int = 60
     connection_pool_size: int = 3
+    statement_cache_size: int = 64  # Подготовленных запросов на одно соединение пула
+    search_mode: str = "auto"  # auto | trigram | ilike - как выполнять поиск по тексту
+    health_check_interval: int = 10  # Не чаще раза в N сек проверять БД для /ready
+    attributes_per_class: int = 50  # Атрибутов в списке класса на странице анализа (остальные - "Показать ещё")
+    virtual_page_size: int = 500  # Строк в одном запросе JSON для виртуальной таблицы (view=virtual)
+    response_compression: bool = True  # Сжатие ответов JSON/HTML (brotli, если установлен пакет Brotli, иначе gzip)
+    compression_min_size: int = 1024  # Меньшие ответы не сжимаются
+    gzip_level: int = 5
+    brotli_quality: int = 4
+    json_provider: str = "auto"  # auto | orjson | stdlib - сериализация JSON ответов
+    json_stream_min_rows: int = 5000  # Ответы списков с таким числом строк кодируются потоком
+    http_cache: bool = True  # ETag по версии данных и 304 Not Modified для GET страниц и API
+    data_version_ttl: int = 2  # Не чаще раза в N сек читать версию данных из БД
+    invalidation_listen: bool = True  # LISTEN/NOTIFY: изменения данных сразу видны всем воркерам
+    coalesce_calls: bool = True  # Одинаковые одновременные вызовы DataService выполняются один раз
+    # Пределы одновременных тяжелых запросов в процессе (admission.py); 0 - без ограничения
+    export_concurrency: int = 1  # Выгрузки Excel
+    scripts_concurrency: int = 1  # Генерация SQL скриптов
+    analysis_concurrency: int = 2  # Страницы и API с analyze_exceptions=true
+    heavy_concurrency: int = 2  # Все тяжелые вместе: по умолчанию пул соединений минус одно
+    admission_queue_size: int = 10  # Ожидающих в очереди класса, сверх - сразу 503
+    admission_queue_timeout: int = 30  # Сколько ждать в очереди, сек
+    admission_retry_after: int = 10  # Retry-After ответа 503, сек
+    # Бюджет времени запроса по классам (query_budget.py), сек; 0 - только DB_QUERY_TIMEOUT
+    request_budget: int = 30  # Обычные страницы и API
+    analysis_budget: int = 55  # Не больше proxy_read_timeout nginx (60s)
+    export_budget: int = 0  # Выгрузки и скрипты по умолчанию ограничены только DB_QUERY_TIMEOUT
+    scripts_budget: int = 0
+    cancel_on_disconnect: bool = True  # Отменять SQL запросы ушедшего клиента
+    selection_ttl: int = 3600  # Время жизни материализованной выборки атрибутов, сек
+    micro_cache_seconds: int = 2  # X-Accel-Expires: сколько nginx может отдавать ответ из своего кэша
+
+# Профили параметров JVM (JVM_PROFILE); размеры heap переопределяются JVM_XMS/JVM_XMX
+JVM_PROFILES = {
+    # Прежние параметры: G1 с умеренной паузой
+    'default': {
+        'xms': '256m', 'xmx': '1024m',
+        'options': ['-XX:+UseG1GC', '-XX:MaxGCPauseMillis=200'],
+    },
+    # Минимальные паузы: ZGC (JDK 15+), heap выделяется сразу
+    'low-latency': {
+        'xms': '1024m', 'xmx': '1024m',
+        'options': ['-XX:+UseZGC', '-XX:+AlwaysPreTouch'],
+    },
+    # Минимальная память для контейнеров и нескольких экземпляров
+    'low-memory': {
+        'xms': '32m', 'xmx': '256m',
+        'options': ['-XX:+UseSerialGC', '-XX:TieredStopAtLevel=1', '-Xss512k',
+                    '-XX:MaxMetaspaceSize=96m', '-XX:ReservedCodeCacheSize=32m'],
+    },
+}
+
+@dataclass
+class JVMConfig:
+    """Конфигурация JVM для JDBC драйверов"""
+    profile: str = "default"  # Ключ JVM_PROFILES
+    xms: str = ""  # Переопределение начального heap профиля (например 128m)
+    xmx: str = ""  # Переопределение максимального heap профиля
+    extra_options: str = ""  # Дополнительные параметры через пробел
+    cds_archive: str = "./lib/metarep-cds.jsa"  # Архив AppCDS (manage.py build-cds)
+    use_cds: bool = True  # Подключать архив, если он есть
+    
+    def options(self) -> List[str]:
+        """Параметры JVM профиля с учетом переопределений (без classpath и CDS)"""
+        if self.profile not in JVM_PROFILES:
+            raise ValueError(f"Неизвестный профиль JVM: {self.profile} (доступны: {', '.join(JVM_PROFILES)})")
+        profile = JVM_PROFILES[self.profile]
+        return [
+            f"-Xms{self.xms or profile['xms']}",
+            f"-Xmx{self.xmx or profile['xmx']}",
+            *profile['options'],
+            "-Djava.awt.headless=true",
+            *self.extra_options.split(),
+        ]
 
 @dataclass
 class DirectoryConfig:
@@ -99,9 +189,12 @@ class MigrationConfig:
     task_generation: TaskGenerationConfig
     class_analysis: ClassAnalysisConfig
     performance: PerformanceConfig
+    jvm: JVMConfig
+    profiling: ProfilingConfig
     
     # Дополнительные настройки
     debug_mode: bool = False
+    auto_bootstrap: bool = False  # Создавать таблицы/загружать исключения при первом запросе (вместо manage.py bootstrap)
     create_backups: bool = True
     default_encoding: str = "utf-8"
     
@@ -172,16 +265,32 @@ class MigrationConfig:
             connection_timeout=get_int_env('DB_CONNECTION_TIMEOUT', 60),
             query_timeout=get_int_env('DB_QUERY_TIMEOUT', 600),
             enable_ssl=get_bool_env('ENABLE_SSL', False),
-            verify_ssl=get_bool_env('VERIFY_SSL_CERTIFICATES', False)
+            verify_ssl=get_bool_env('VERIFY_SSL_CERTIFICATES', False),
+            prepare_threshold=get_int_env('DB_PREPARE_THRESHOLD', 1),
+            backend=os.getenv('DB_BACKEND', 'jdbc').lower(),
+            broker_socket=os.getenv('DB_BROKER_SOCKET', '/tmp/metarep-db.sock')
         )
         
         # Конфигурация логирования
         logging_config = LoggingConfig(
             level=os.getenv('LOG_LEVEL', 'INFO'),
+            module_levels=os.getenv('LOG_LEVELS', ''),
+            file=os.getenv('LOG_FILE', ''),
             max_size=get_int_env('LOG_MAX_SIZE', 10485760),
             backup_count=get_int_env('LOG_BACKUP_COUNT', 5),
             encrypt_passwords=get_bool_env('ENCRYPT_PASSWORDS_IN_LOGS', True),
-            datetime_format=os.getenv('DATETIME_FORMAT', '%Y-%m-%d %H:%M:%S')
+            datetime_format=os.getenv('DATETIME_FORMAT', '%Y-%m-%d %H:%M:%S'),
+            slow_query_ms=get_int_env('SLOW_QUERY_MS', 500),
+            slow_query_log=os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log'),
+            server_timing=get_bool_env('SERVER_TIMING', True)
+        )
+        
+        # Конфигурация профилирования запросов
+        profiling_config = ProfilingConfig(
+            token=os.getenv('PROFILE_TOKEN', ''),
+            interval_ms=max(1, get_int_env('PROFILE_INTERVAL_MS', 5)),
+            directory=os.getenv('PROFILE_DIR', 'logs/profiles'),
+            keep=get_int_env('PROFILE_KEEP', 50)
         )
         
         # Конфигурация генерации задач
@@ -206,7 +315,47 @@ class MigrationConfig:
             max_retries=get_int_env('MAX_RETRIES', 3),
             max_db_connections=get_int_env('MAX_DB_CONNECTIONS', 5),
             connection_pool_timeout=get_int_env('CONNECTION_POOL_TIMEOUT', 60),
-            connection_pool_size=get_int_env('CONNECTION_POOL_SIZE', 3)
+            connection_pool_size=get_int_env('CONNECTION_POOL_SIZE', 3),
+            statement_cache_size=get_int_env('STATEMENT_CACHE_SIZE', 64),
+            search_mode=os.getenv('SEARCH_MODE', 'auto').lower(),
+            health_check_interval=get_int_env('HEALTH_CHECK_INTERVAL', 10),
+            attributes_per_class=max(1, get_int_env('ATTRIBUTES_PER_CLASS', 50)),
+            virtual_page_size=min(max(1, get_int_env('VIRTUAL_PAGE_SIZE', 500)), 1000),
+            response_compression=get_bool_env('RESPONSE_COMPRESSION', True),
+            compression_min_size=get_int_env('COMPRESSION_MIN_SIZE', 1024),
+            gzip_level=min(max(1, get_int_env('GZIP_LEVEL', 5)), 9),
+            brotli_quality=min(max(0, get_int_env('BROTLI_QUALITY', 4)), 11),
+            json_provider=os.getenv('JSON_PROVIDER', 'auto').lower(),
+            json_stream_min_rows=get_int_env('JSON_STREAM_MIN_ROWS', 5000),
+            http_cache=get_bool_env('HTTP_CACHE', True),
+            data_version_ttl=max(0, get_int_env('DATA_VERSION_TTL', 2)),
+            invalidation_listen=get_bool_env('INVALIDATION_LISTEN', True),
+            coalesce_calls=get_bool_env('COALESCE_CALLS', True),
+            export_concurrency=max(0, get_int_env('EXPORT_CONCURRENCY', 1)),
+            scripts_concurrency=max(0, get_int_env('SCRIPTS_CONCURRENCY', 1)),
+            analysis_concurrency=max(0, get_int_env('ANALYSIS_CONCURRENCY', 2)),
+            heavy_concurrency=max(0, get_int_env('HEAVY_CONCURRENCY',
+                                                 max(1, get_int_env('CONNECTION_POOL_SIZE', 3) - 1))),
+            admission_queue_size=max(0, get_int_env('ADMISSION_QUEUE_SIZE', 10)),
+            admission_queue_timeout=max(0, get_int_env('ADMISSION_QUEUE_TIMEOUT', 30)),
+            admission_retry_after=max(1, get_int_env('ADMISSION_RETRY_AFTER', 10)),
+            request_budget=max(0, get_int_env('REQUEST_BUDGET', 30)),
+            analysis_budget=max(0, get_int_env('ANALYSIS_BUDGET', 55)),
+            export_budget=max(0, get_int_env('EXPORT_BUDGET', 0)),
+            scripts_budget=max(0, get_int_env('SCRIPTS_BUDGET', 0)),
+            cancel_on_disconnect=get_bool_env('CANCEL_ON_DISCONNECT', True),
+            selection_ttl=max(60, get_int_env('SELECTION_TTL', 3600)),
+            micro_cache_seconds=max(0, get_int_env('MICRO_CACHE_SECONDS', 2))
+        )
+        
+        # Конфигурация JVM
+        jvm_config = JVMConfig(
+            profile=os.getenv('JVM_PROFILE', 'default').lower(),
+            xms=os.getenv('JVM_XMS', ''),
+            xmx=os.getenv('JVM_XMX', ''),
+            extra_options=os.getenv('JVM_OPTIONS', ''),
+            cds_archive=os.getenv('JVM_CDS_ARCHIVE', './lib/metarep-cds.jsa'),
+            use_cds=get_bool_env('JVM_USE_CDS', True)
         )
         
         # Конфигурация директорий
@@ -229,7 +378,10 @@ class MigrationConfig:
             task_generation=task_generation_config,
             class_analysis=class_analysis_config,
             performance=performance_config,
+            jvm=jvm_config,
+            profiling=profiling_config,
             debug_mode=get_bool_env('DEBUG_MODE', False),
+            auto_bootstrap=get_bool_env('AUTO_BOOTSTRAP', False),
             create_backups=get_bool_env('CREATE_BACKUPS', True),
             default_encoding=os.getenv('DEFAULT_ENCODING', 'utf-8')
         )
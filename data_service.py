@@ -1,63 +1,242 @@
 """
 Сервис для работы с данными классов, групп атрибутов и атрибутов
 """
+import json
 import math
+import re
+import uuid
 from typing import List, Dict, Any, Optional, Tuple
-from database_manager import PostgreSQLManager
+from database_manager import PostgreSQLManager, is_jvm_started, jvm_startup_time
+from query_builder import (QueryBuilder, build_filters, CLASS_SEARCH_COLUMNS,
+                           GROUP_SEARCH_COLUMNS, ATTRIBUTE_SEARCH_COLUMNS)
 from config import config
+from logging_setup import SampledLog
+from invalidation import InvalidationListener, VERSION_TTL_WHILE_LISTENING
+from singleflight import coalesce
+import logging
+import metrics
 import time
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Списки атрибутов класса в режиме анализа исключений
+ATTRIBUTE_LISTS = ('update_list', 'ignore_list', 'no_action_list')
+
+# Фильтры страницы атрибутов, сохраняемые в выборке (create_selection), в порядке параметров get_attributes
+SELECTION_FILTERS = ('search', 'status_variance', 'event', 'a_priznak', 'base_url', 'source_base_url',
+                     'exception_action_filter', 'analyze_exceptions', 'source_target_filter',
+                     'property_filter', 'show_update_actions')
+_SELECTION_ID = re.compile(r'[0-9a-f]{32}')
+
+# Отсутствие индексов поиска перепроверяется (manage.py indexes при работающем приложении), сек
+SEARCH_INDEXES_RECHECK = 300
 
 class DataService:
     """Сервис для работы с данными приложения"""
     
-    def __init__(self):
-        self.db_manager = PostgreSQLManager()
+    def __init__(self, db_manager: PostgreSQLManager = None):
+        # db_manager можно передать явно (например, с другим backend'ом для сравнения)
+        self.db_manager = db_manager or PostgreSQLManager()
         self.base_url = config.sitex_context_url.rstrip('/')
-        
-        # Инициализируем таблицу исключений при запуске
-        self._init_exceptions_table()
-        
-    def _init_exceptions_table(self):
-        """Инициализация таблицы исключений"""
+        self._trigram_search = None  # Определяется при первом поиске (режим auto)
+        self._trigram_checked_at = 0.0
+        self._bootstrapped = False
+        self._bootstrap_lock = threading.Lock()
+        self._readiness = None  # Кэш последней проверки /ready
+        self._readiness_checked_at = 0.0
+        self._readiness_lock = threading.Lock()
+        self._data_version = None  # Кэш версии данных для ETag (data_version)
+        self._data_version_checked_at = 0.0
+        self._data_version_lock = threading.Lock()
+        self._invalidation_listener = None  # Запускается при первом чтении версии (INVALIDATION_LISTEN)
+        self._selection_tables = False  # Созданы ли таблицы выборок (create_selection)
+        # Конструктор не обращается к БД: JVM и пул соединений поднимаются при
+        # первом запросе, а таблицы создает manage.py bootstrap (или AUTO_BOOTSTRAP)
+    
+    def bootstrap(self, force_reload: bool = False) -> Dict[str, Any]:
+        """
+        Одноразовая подготовка БД: таблица исключений, данные из файлов, индексы поиска
+        Вызывается командой manage.py bootstrap; повторный запуск безопасен
+        """
+        with metrics.track_job('bootstrap'):
+            return self._bootstrap(force_reload)
+    
+    def _bootstrap(self, force_reload: bool) -> Dict[str, Any]:
+        report = {'success': False}
         try:
             # Создаем таблицу если не существует
-            if self.db_manager.create_meta_statistic_table():
-                print("✅ Таблица __meta_statistic создана или уже существует")
-                
-                # Загружаем данные исключений из файлов
-                if self.db_manager.init_exceptions_data():
-                    print("✅ Данные исключений загружены")
+            if not self.db_manager.create_meta_statistic_table():
+                logger.error("❌ Ошибка создания таблицы __meta_statistic")
+                report['error'] = "Ошибка создания таблицы __meta_statistic"
+                return report
+            logger.info("✅ Таблица __meta_statistic создана или уже существует")
+            
+            # Загружаем данные исключений из файлов
+            report['exceptions'] = self.db_manager.init_exceptions_data(force_reload=force_reload)
+            if report['exceptions'].get('success'):
+                logger.info("✅ Данные исключений загружены")
+            else:
+                logger.warning("⚠️ Ошибка загрузки данных исключений")
+            
+            # Индексы для поиска по тексту (режим trigram/auto)
+            if config.performance.search_mode != 'ilike':
+                report['search_indexes'] = self.db_manager.create_search_indexes()
+                if report['search_indexes']:
+                    self._trigram_search = None  # Режим auto проверит индексы заново
+                    logger.info("✅ Триграммные индексы поиска созданы или уже существуют")
                 else:
-                    print("⚠️ Ошибка загрузки данных исключений")
+                    logger.warning("⚠️ Триграммные индексы поиска недоступны, используется ILIKE по колонкам")
+            
+            # Версия данных для ETag: триггеры на таблицах источника, назначения и исключений
+            report['data_version_tables'] = self.db_manager.create_data_version_tracking()
+            if report['data_version_tables']:
+                logger.info("✅ Версия данных отслеживается для %s таблиц", len(report['data_version_tables']))
             else:
-                print("❌ Ошибка создания таблицы __meta_statistic")
+                logger.warning("⚠️ Версия данных не отслеживается, HTTP кэширование (ETag) отключено")
+            
+            # Материализованные выборки атрибутов (без bootstrap создаются при первой выборке)
+            report['selection_tables'] = self._selection_tables = self.db_manager.create_selection_tables()
+            if not report['selection_tables']:
+                logger.warning("⚠️ Таблицы выборок атрибутов не созданы")
+            
+            report['success'] = report['exceptions'].get('success', False)
+            self.data_version_changed()
+            self._bootstrapped = report['success']
+            return report
         except Exception as e:
-            print(f"❌ Ошибка инициализации таблицы исключений: {e}")
+            logger.error("❌ Ошибка инициализации таблицы исключений: %s", e)
+            report['error'] = str(e)
+            return report
+    
+    def ensure_bootstrapped(self):
+        """Ленивый bootstrap при первом обращении (только при AUTO_BOOTSTRAP=true)"""
+        if self._bootstrapped or not config.auto_bootstrap:
+            return
+        with self._bootstrap_lock:
+            if not self._bootstrapped:
+                self.bootstrap()
+    
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Готовность к обслуживанию запросов: JVM, соединение с БД, выполнен ли bootstrap
+        Проверка БД (SELECT 1) выполняется не чаще раза в health_check_interval секунд,
+        одновременные проверки ждут одну общую; состояние пула всегда актуальное
+        """
+        with self._readiness_lock:
+            age = time.monotonic() - self._readiness_checked_at
+            if self._readiness is None or age >= config.performance.health_check_interval:
+                metrics.cache_miss('readiness')
+                self._readiness = self._check_readiness()
+                self._readiness_checked_at = time.monotonic()
+                age = 0.0
+            else:
+                metrics.cache_hit('readiness')
+            status = dict(self._readiness)
+        
+        status['checked_sec_ago'] = round(age, 1)
+        status['pool'] = self.db_manager.pool_stats()
+        return status
+    
+    def data_version(self) -> Optional[str]:
+        """
+        Версия данных (__meta_data_version, увеличивается триггерами при любых
+        изменениях таблиц) для ETag. Читается из БД не чаще раза в DATA_VERSION_TTL
+        секунд, одновременные запросы ждут одно чтение; при активной подписке на
+        NOTIFY (invalidation.py) кэш сбрасывается уведомлением, а не по времени.
+        None - версия не отслеживается (bootstrap не выполнен) или БД недоступна:
+        ответы не кэшируются
+        """
+        self._start_invalidation_listener()
+        listener = self._invalidation_listener
+        ttl = (VERSION_TTL_WHILE_LISTENING if listener is not None and listener.connected
+               else config.performance.data_version_ttl)
+        with self._data_version_lock:
+            if time.monotonic() - self._data_version_checked_at < ttl:
+                metrics.cache_hit('data_version')
+                return self._data_version
+            metrics.cache_miss('data_version')
+            try:
+                self._data_version = self.db_manager.get_data_version()
+            except Exception as e:
+                logger.warning("Не удалось прочитать версию данных: %s", e)
+                self._data_version = None
+            self._data_version_checked_at = time.monotonic()
+            return self._data_version
+    
+    def data_version_changed(self):
+        """Сброс кэша версии после записи: следующий запрос прочитает новую версию из БД"""
+        with self._data_version_lock:
+            self._data_version_checked_at = 0.0
+    
+    def _on_data_change(self, tables):
+        """
+        Уведомление InvalidationListener: версия данных - единственный кэш данных
+        процесса, поэтому она сбрасывается при изменении любой таблицы и после
+        переподключения (tables=None)
+        """
+        self.data_version_changed()
+    
+    def _start_invalidation_listener(self):
+        if self._invalidation_listener is not None or not config.performance.invalidation_listen:
+            return
+        with self._data_version_lock:
+            if self._invalidation_listener is None:
+                self._invalidation_listener = InvalidationListener(self.db_manager, self._on_data_change).start()
     
+    def _check_readiness(self) -> Dict[str, Any]:
+        """Проверка БД без обращения к таблицам метаданных"""
+        status = {'ready': False, 'backend': self.db_manager.backend.name, 'jvm': is_jvm_started(),
+                  'jvm_startup_sec': jvm_startup_time(), 'database': False, 'bootstrapped': self._bootstrapped}
+        try:
+            # Первый вызов прогревает пул соединений (и JVM для backend'а jdbc)
+            if not self.db_manager.connect():
+                return status
+            status['jvm'] = is_jvm_started()
+            self.db_manager.execute_query("SELECT 1", [])
+            status['database'] = True
+            
+            # Наличие таблицы исключений проверяем по каталогу, пока bootstrap не подтвержден
+            if not self._bootstrapped:
+                result = self.db_manager.execute_query(
+                    "SELECT to_regclass('__meta_statistic') IS NOT NULL", [])
+                self._bootstrapped = bool(result) and result[0][0] in ('t', 'true')
+            status['bootstrapped'] = self._bootstrapped
+            status['ready'] = self._bootstrapped
+        except Exception as e:
+            status['error'] = str(e)
+        finally:
+            self.db_manager.disconnect()
+        return status
+    
+    def _use_trigram_search(self, search: str = None) -> bool:
+        """Искать ли по выражению триграммного индекса вместо OR по колонкам"""
+        mode = config.performance.search_mode
+        if not search or mode == 'ilike':
+            return False
+        if mode == 'trigram':
+            return True
+        # auto - используем индексы, если они есть в БД: найденные запоминаются,
+        # отсутствие перепроверяется раз в SEARCH_INDEXES_RECHECK, ошибка проверки не запоминается
+        if not self._trigram_search and (self._trigram_search is None
+                                         or time.monotonic() - self._trigram_checked_at >= SEARCH_INDEXES_RECHECK):
+            found = self.db_manager.has_search_indexes()
+            if found is not None:
+                self._trigram_search = found
+                self._trigram_checked_at = time.monotonic()
+        return bool(self._trigram_search)
+    
+    @coalesce
     def get_classes(self, page: int = 1, per_page: int = 20, 
                    search: str = None, status_variance: int = None, 
                    event: int = None, a_priznak: int = None, base_url: str = None, 
                    source_base_url: str = None) -> Dict[str, Any]:
         """Получение списка классов с фильтрацией и пагинацией"""
         
-        # Базовый запрос
-        where_conditions = []
-        
-        if search:
-            # Экранируем кавычки для безопасности
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(name ILIKE '%{search_escaped}%' OR description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"a_status_variance = {status_variance}")
-            
-        if event is not None:
-            where_conditions.append(f"a_event = {event}")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"a_priznak = {a_priznak}")
-            
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        # Фильтры передаются параметрами запроса
+        filters = build_filters(None, CLASS_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
         # Общее количество записей
         count_query = f"""
@@ -74,7 +253,7 @@ class DataService:
             FROM sxclass_source 
             WHERE {where_clause}
             ORDER BY name
-            LIMIT {per_page} OFFSET {offset}
+            LIMIT ? OFFSET ?
         """
         
         try:
@@ -82,10 +261,10 @@ class DataService:
                 return {"error": "Ошибка подключения к БД"}
                 
             # Получаем общее количество
-            total_count = int(self.db_manager.execute_query(count_query)[0][0])
+            total_count = int(self.db_manager.execute_query(count_query, filters.params)[0][0])
             
             # Получаем данные
-            classes = self.db_manager.execute_query(main_query)
+            classes = self.db_manager.execute_query(main_query, filters.params + [per_page, offset])
             
             # Преобразуем в словари
             classes_list = []
@@ -127,6 +306,7 @@ class DataService:
         finally:
             self.db_manager.disconnect()
     
+    @coalesce
     def get_classes_with_exceptions(self, page: int = 1, per_page: int = 20, 
                       search: str = None, status_variance: int = None, 
                       event: int = None, a_priznak: int = None, base_url: str = None,
@@ -139,7 +319,7 @@ class DataService:
             if not self.db_manager.connect():
                 return {"error": "Ошибка подключения к БД"}
             
-            print(f"[DEBUG] Оптимизированный get_classes_with_exceptions: analyze_exceptions={analyze_exceptions}")
+            logger.debug("Оптимизированный get_classes_with_exceptions: analyze_exceptions=%s", analyze_exceptions)
             
             # ЭТАП 1: Быстрый запрос только классов БЕЗ анализа исключений
             if not analyze_exceptions:
@@ -149,7 +329,7 @@ class DataService:
             return self._get_classes_with_exceptions_optimized(page, per_page, search, status_variance, event, a_priznak, base_url, source_base_url, exception_action_filter, source_target_filter, property_filter, show_update_actions)
             
         except Exception as e:
-            print(f"[ERROR] Ошибка в оптимизированном get_classes_with_exceptions: {e}")
+            logger.error("Ошибка в оптимизированном get_classes_with_exceptions: %s", e)
             return {"error": f"Ошибка выполнения запроса: {e}"}
         finally:
             self.db_manager.disconnect()
@@ -158,23 +338,10 @@ class DataService:
                                  event: int, a_priznak: int, base_url: str, source_base_url: str) -> Dict[str, Any]:
         """Быстрый режим получения классов БЕЗ анализа исключений"""
         
-        # Базовый запрос без анализа исключений
-        where_conditions = []
-        
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(c.name ILIKE '%{search_escaped}%' OR c.description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"c.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            where_conditions.append(f"c.a_event = {event}")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"c.a_priznak = {a_priznak}")
-            
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        # Фильтры передаются параметрами запроса
+        filters = build_filters('c', CLASS_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
         # Получаем общее количество
         count_query = f"""
@@ -183,7 +350,7 @@ class DataService:
             WHERE {where_clause}
         """
         
-        total_count = int(self.db_manager.execute_query(count_query)[0][0])
+        total_count = int(self.db_manager.execute_query(count_query, filters.params)[0][0])
         
         # Основной запрос с пагинацией
         offset = (page - 1) * per_page
@@ -193,10 +360,10 @@ class DataService:
             FROM sxclass_source c
             WHERE {where_clause}
             ORDER BY c.name
-            LIMIT {per_page} OFFSET {offset}
+            LIMIT ? OFFSET ?
         """
         
-        classes = self.db_manager.execute_query(main_query)
+        classes = self.db_manager.execute_query(main_query, filters.params + [per_page, offset])
         
         # Преобразуем в словари для быстрого режима
         classes_list = []
@@ -214,6 +381,7 @@ class DataService:
                 'a_editor': row[7],
                 'parent_ouid': row[8],
                 'a_issystem': row[9],
+                'target_ouid': target_ouid,
                 'admin_url': self._build_admin_url(target_ouid or row[0], 'SXClass', base_url),
                 'source_admin_url': self._build_admin_url(row[0], 'SXClass', source_base_url),
                 'overall_action': -1,  # Без действия
@@ -222,7 +390,7 @@ class DataService:
         
         total_pages = math.ceil(total_count / per_page) if total_count > 0 else 0
         
-        print(f"[DEBUG] Быстрый режим классов: обработано {len(classes_list)} классов за {total_count} всего")
+        logger.debug("Быстрый режим классов: обработано %s классов за %s всего", len(classes_list), total_count)
         
         return {
             'classes': {'fast_mode': classes_list},
@@ -243,25 +411,12 @@ class DataService:
                                                  show_update_actions: bool) -> Dict[str, Any]:
         """ОПТИМИЗИРОВАННАЯ версия с анализом исключений классов - ОДИН SQL запрос"""
         
-        # Базовые условия фильтрации
-        where_conditions = []
-        
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(c.name ILIKE '%{search_escaped}%' OR c.description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"c.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            where_conditions.append(f"c.a_event = {event}")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"c.a_priznak = {a_priznak}")
-            
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        # Фильтры передаются параметрами запроса
+        filters = build_filters('c', CLASS_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
-        print(f"[DEBUG] ОПТИМИЗИРОВАННЫЙ запрос классов с where: {where_clause}")
+        logger.debug("ОПТИМИЗИРОВАННЫЙ запрос классов с where: %s", where_clause)
         
         # ОДИН мощный SQL запрос - получаем ВСЕ классы И их различия сразу
         optimized_query = f"""
@@ -346,14 +501,15 @@ class DataService:
             ORDER BY c.name
         """
         
-        print(f"[DEBUG] Выполняем ОПТИМИЗИРОВАННЫЙ запрос классов...")
+        logger.debug("Выполняем ОПТИМИЗИРОВАННЫЙ запрос классов...")
         start_time = time.time()
         
         # Выполняем ОДИН запрос для получения всех данных
-        all_classes_optimized = self.db_manager.execute_query(optimized_query)
+        all_classes_optimized = self.db_manager.execute_query(optimized_query, filters.params)
         
         query_time = time.time() - start_time
-        print(f"[DEBUG] ОПТИМИЗИРОВАННЫЙ запрос классов выполнен за {query_time:.2f} сек, получено {len(all_classes_optimized)} классов")
+        logger.debug("ОПТИМИЗИРОВАННЫЙ запрос классов выполнен за %.2f сек, получено %s классов",
+                     query_time, len(all_classes_optimized))
         
         # Обрабатываем результаты в памяти Python
         classes_by_action = {'ignore_list': [], 'update_list': [], 'no_action_list': []}
@@ -365,7 +521,6 @@ class DataService:
             class_description = row[2]
             
             # Парсим JSON различий
-            import json
             differences_json = row[10]
             if isinstance(differences_json, str):
                 original_exception_actions = json.loads(differences_json)
@@ -425,6 +580,7 @@ class DataService:
                 'property_name': display_property_name,
                 'source': source_value,
                 'target': target_value,
+                'target_ouid': target_ouid,
                 'admin_url': self._build_admin_url(target_ouid or class_ouid, 'SXClass', base_url),
                 'source_admin_url': self._build_admin_url(class_ouid, 'SXClass', source_base_url),
                 'exception_actions': exception_actions,
@@ -482,8 +638,9 @@ class DataService:
         total_pages = math.ceil(total_classes_count / per_page) if total_classes_count > 0 else 0
         
         processing_time = time.time() - start_time
-        print(f"[DEBUG] ОПТИМИЗАЦИЯ классов: обработано {len(all_classes_optimized)} классов за {processing_time:.2f} сек")
-        print(f"[DEBUG] Статистика классов: игнорировать={total_statistics['ignore_count']}, обновить={total_statistics['update_count']}, без действия={total_statistics['no_action_count']}")
+        logger.debug("ОПТИМИЗАЦИЯ классов: обработано %s классов за %.2f сек", len(all_classes_optimized), processing_time)
+        logger.debug("Статистика классов: игнорировать=%s, обновить=%s, без действия=%s",
+                     total_statistics['ignore_count'], total_statistics['update_count'], total_statistics['no_action_count'])
         
         # Получаем список всех доступных свойств для фильтра
         available_properties = self._get_available_properties_classes(all_classes_optimized)
@@ -495,7 +652,8 @@ class DataService:
         filtered_statistics['update_count'] = len(classes_by_action['update_list'])
         filtered_statistics['no_action_count'] = len(classes_by_action['no_action_list'])
         
-        print(f"[DEBUG] Пересчет статистики классов ПОСЛЕ фильтров: игнорировать={filtered_statistics['ignore_count']}, обновить={filtered_statistics['update_count']}, без действия={filtered_statistics['no_action_count']}")
+        logger.debug("Пересчет статистики классов ПОСЛЕ фильтров: игнорировать=%s, обновить=%s, без действия=%s",
+                     filtered_statistics['ignore_count'], filtered_statistics['update_count'], filtered_statistics['no_action_count'])
         
         return {
             'classes_by_action': paginated_by_action,
@@ -539,33 +697,20 @@ class DataService:
         
         # Возвращаем отсортированный список
         available_properties = sorted(list(properties_set))
-        print(f"[DEBUG] Найдено {len(available_properties)} уникальных свойств классов: {available_properties[:10]}...")
+        logger.debug("Найдено %s уникальных свойств классов: %s...", len(available_properties), available_properties[:10])
         return available_properties
     
+    @coalesce
     def get_groups(self, page: int = 1, per_page: int = 20, 
                    search: str = None, status_variance: int = None, 
                    event: int = None, a_priznak: int = None, base_url: str = None,
                    source_base_url: str = None) -> Dict[str, Any]:
         """Получение списка групп атрибутов с фильтрацией и пагинацией"""
         
-        # Базовый запрос
-        where_conditions = []
-        
-        if search:
-            # Экранируем кавычки для безопасности
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(g.name ILIKE '%{search_escaped}%' OR g.title ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"g.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            where_conditions.append(f"g.a_event = {event}")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"g.a_priznak = {a_priznak}")
-            
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        # Фильтры передаются параметрами запроса
+        filters = build_filters('g', GROUP_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
         # Общее количество записей
         count_query = f"""
@@ -586,7 +731,7 @@ class DataService:
             LEFT JOIN sxclass_source c ON c.ouid = g.cls 
             WHERE {where_clause}
             ORDER BY g.title, g.name
-            LIMIT {per_page} OFFSET {offset}
+            LIMIT ? OFFSET ?
         """
         
         try:
@@ -594,10 +739,10 @@ class DataService:
                 return {"error": "Ошибка подключения к БД"}
                 
             # Получаем общее количество
-            total_count = int(self.db_manager.execute_query(count_query)[0][0])
+            total_count = int(self.db_manager.execute_query(count_query, filters.params)[0][0])
             
             # Получаем данные
-            groups = self.db_manager.execute_query(main_query)
+            groups = self.db_manager.execute_query(main_query, filters.params + [per_page, offset])
             
             # Преобразуем в словари
             groups_list = []
@@ -653,19 +798,33 @@ class DataService:
         finally:
             self.db_manager.disconnect()
     
+    @coalesce
     def get_attributes(self, page: int = 1, per_page: int = 20, 
                       search: str = None, status_variance: int = None, 
                       event: int = None, a_priznak: int = None, base_url: str = None,
                       source_base_url: str = None, exception_action_filter: int = None,
                       analyze_exceptions: bool = False, source_target_filter: str = None,
-                      property_filter: List[str] = None, show_update_actions: bool = True) -> Dict[str, Any]:
-        """Получение списка атрибутов с фильтрацией, пагинацией и анализом исключений (ОПТИМИЗИРОВАННАЯ ВЕРСИЯ)"""
+                      property_filter: List[str] = None, show_update_actions: bool = True,
+                      attributes_per_class: int = None, selection_id: str = None) -> Dict[str, Any]:
+        """
+        Получение списка атрибутов с фильтрацией, пагинацией и анализом исключений (ОПТИМИЗИРОВАННАЯ ВЕРСИЯ)
         
+        В режиме анализа страница содержит per_page классов; attributes_per_class ограничивает
+        число атрибутов в каждом списке класса (остальные - get_class_attribute_rows),
+        None - все атрибуты (выгрузки, скрипты, массовые обновления)
+        
+        selection_id - атрибуты материализованной выборки (create_selection) вместе с
+        результатом анализа исключений на момент ее создания; остальные фильтры не
+        применяются - они уже учтены при создании выборки
+        """
         try:
             if not self.db_manager.connect():
                 return {"error": "Ошибка подключения к БД"}
             
-            print(f"[DEBUG] Оптимизированный get_attributes: analyze_exceptions={analyze_exceptions}")
+            if selection_id is not None:
+                return self._get_selection_attributes(selection_id, page, per_page)
+            
+            logger.debug("Оптимизированный get_attributes: analyze_exceptions=%s", analyze_exceptions)
             
             # ЭТАП 1: Быстрый запрос только атрибутов БЕЗ анализа исключений
             if not analyze_exceptions:
@@ -673,35 +832,66 @@ class DataService:
                 return self._get_attributes_fast_mode(page, per_page, search, status_variance, event, a_priznak, base_url, source_base_url)
             
             # ЭТАП 2: Полный режим с анализом исключений - фильтры исключений применяются только здесь
-            return self._get_attributes_with_exceptions_optimized(page, per_page, search, status_variance, event, a_priznak, base_url, source_base_url, exception_action_filter, source_target_filter, property_filter, show_update_actions)
+            return self._get_attributes_with_exceptions_optimized(page, per_page, search, status_variance, event, a_priznak, base_url, source_base_url, exception_action_filter, source_target_filter, property_filter, show_update_actions,
+                                                                  attributes_per_class=attributes_per_class)
             
         except Exception as e:
-            print(f"[ERROR] Ошибка в оптимизированном get_attributes: {e}")
+            logger.error("Ошибка в оптимизированном get_attributes: %s", e)
             return {"error": f"Ошибка выполнения запроса: {e}"}
         finally:
             self.db_manager.disconnect()
     
-    def _get_attributes_fast_mode(self, page: int, per_page: int, search: str, status_variance: int, 
-                                 event: int, a_priznak: int, base_url: str, source_base_url: str) -> Dict[str, Any]:
-        """Быстрый режим получения атрибутов БЕЗ анализа исключений"""
-        
-        # Базовый запрос без анализа исключений
-        where_conditions = []
+    @coalesce
+    def get_class_attribute_rows(self, class_ouid: int, list_name: str, offset: int = 0, limit: int = 50,
+                                 search: str = None, status_variance: int = None, event: int = None,
+                                 a_priznak: int = None, base_url: str = None, source_base_url: str = None,
+                                 source_target_filter: str = None, property_filter: List[str] = None,
+                                 show_update_actions: bool = True) -> Dict[str, Any]:
+        """
+        Страница одного списка атрибутов класса (update_list / ignore_list / no_action_list)
+        с теми же фильтрами, что и страница атрибутов в режиме анализа исключений
+        """
+        if list_name not in ATTRIBUTE_LISTS:
+            return {"error": f"Неизвестный список атрибутов: {list_name}"}
+        offset, limit = max(0, int(offset)), max(1, int(limit))
         
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(a.name ILIKE '%{search_escaped}%' OR a.title ILIKE '%{search_escaped}%' OR a.description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"a.a_status_variance = {status_variance}")
+        try:
+            if not self.db_manager.connect():
+                return {"error": "Ошибка подключения к БД"}
             
-        if event is not None:
-            where_conditions.append(f"a.a_event = {event}")
+            result = self._get_attributes_with_exceptions_optimized(
+                1, 1, search, status_variance, event, a_priznak, base_url, source_base_url,
+                None, source_target_filter, property_filter, show_update_actions,
+                class_ouid=class_ouid, attributes_per_class=limit, attributes_offset=offset)
+            class_data = next(iter(result['classes'].values()), None)
+            attributes = class_data['attributes'][list_name] if class_data else []
+            total = class_data['list_totals'][list_name] if class_data else 0
             
-        if a_priznak is not None:
-            where_conditions.append(f"a.a_priznak = {a_priznak}"    )
+            return {
+                'class_ouid': class_ouid,
+                'list': list_name,
+                'offset': offset,
+                'limit': limit,
+                'total': total,
+                'attributes': attributes,
+                'next_offset': offset + len(attributes),
+                'has_more': offset + len(attributes) < total
+            }
             
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        except Exception as e:
+            logger.error("Ошибка получения атрибутов класса %s: %s", class_ouid, e)
+            return {"error": f"Ошибка выполнения запроса: {e}"}
+        finally:
+            self.db_manager.disconnect()
+    
+    def _get_attributes_fast_mode(self, page: int, per_page: int, search: str, status_variance: int, 
+                                 event: int, a_priznak: int, base_url: str, source_base_url: str) -> Dict[str, Any]:
+        """Быстрый режим получения атрибутов БЕЗ анализа исключений"""
+        
+        # Фильтры передаются параметрами запроса
+        filters = build_filters('a', ATTRIBUTE_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
         # Получаем общее количество
         count_query = f"""
@@ -711,7 +901,7 @@ class DataService:
             WHERE {where_clause}
         """
         
-        total_count = int(self.db_manager.execute_query(count_query)[0][0])
+        total_count = int(self.db_manager.execute_query(count_query, filters.params)[0][0])
         
         # Основной запрос с пагинацией
         offset = (page - 1) * per_page
@@ -725,10 +915,10 @@ class DataService:
             LEFT JOIN sxclass_source c ON c.ouid = a.ouidsxclass
             WHERE {where_clause}
             ORDER BY c.name, a.title, a.name
-            LIMIT {per_page} OFFSET {offset}
+            LIMIT ? OFFSET ?
         """
         
-        attributes = self.db_manager.execute_query(main_query)
+        attributes = self.db_manager.execute_query(main_query, filters.params + [per_page, offset])
         
         # Преобразуем в словари для быстрого режима
         attributes_list = []
@@ -748,6 +938,7 @@ class DataService:
                 'datatype_name': row[9],
                 'class_name': row[10],
                 'class_description': row[11],
+                'target_ouid': target_ouid,
                 'admin_url': self._build_admin_url(target_ouid or row[0], 'SXAttr', base_url),
                 'source_admin_url': self._build_admin_url(row[0], 'SXAttr', source_base_url),
                 'overall_action': -1,  # Без действия
@@ -756,7 +947,7 @@ class DataService:
         
         total_pages = math.ceil(total_count / per_page) if total_count > 0 else 0
         
-        print(f"[DEBUG] Быстрый режим: обработано {len(attributes_list)} атрибутов за {total_count} всего")
+        logger.debug("Быстрый режим: обработано %s атрибутов за %s всего", len(attributes_list), total_count)
         
         return {
             'attributes': {'fast_mode': attributes_list},
@@ -775,28 +966,22 @@ class DataService:
                                                  status_variance: int, event: int, a_priznak: int,
                                                  base_url: str, source_base_url: str, exception_action_filter: int, 
                                                  source_target_filter: str, property_filter: List[str], 
-                                                 show_update_actions: bool) -> Dict[str, Any]:
-        """ОПТИМИЗИРОВАННАЯ версия с анализом исключений - ОДИН SQL запрос"""
-        
-        # Базовые условия фильтрации
-        where_conditions = []
+                                                 show_update_actions: bool, class_ouid: int = None,
+                                                 attributes_per_class: int = None,
+                                                 attributes_offset: int = 0) -> Dict[str, Any]:
+        """
+        ОПТИМИЗИРОВАННАЯ версия с анализом исключений - ОДИН SQL запрос
+        Списки атрибутов классов страницы обрезаются до attributes_per_class начиная с
+        attributes_offset; полные размеры списков - в list_totals класса
+        """
         
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(a.name ILIKE '%{search_escaped}%' OR a.title ILIKE '%{search_escaped}%' OR a.description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"a.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            where_conditions.append(f"a.a_event = {event}")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"a.a_priznak = {a_priznak}")
-            
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        # Фильтры передаются параметрами запроса
+        filters = build_filters('a', ATTRIBUTE_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                class_column='ouidsxclass', class_ouid=class_ouid,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
-        print(f"[DEBUG] ОПТИМИЗИРОВАННЫЙ запрос с where: {where_clause}")
+        logger.debug("ОПТИМИЗИРОВАННЫЙ запрос с where: %s", where_clause)
         
         # ОДИН мощный SQL запрос - получаем ВСЕ атрибуты И их различия сразу
         optimized_query = f"""
@@ -887,14 +1072,15 @@ class DataService:
             ORDER BY a.class_name, a.title, a.name
         """
         
-        print(f"[DEBUG] Выполняем ОПТИМИЗИРОВАННЫЙ запрос...")
+        logger.debug("Выполняем ОПТИМИЗИРОВАННЫЙ запрос...")
         start_time = time.time()
         
         # Выполняем ОДИН запрос для получения всех данных
-        all_attributes_optimized = self.db_manager.execute_query(optimized_query)
+        all_attributes_optimized = self.db_manager.execute_query(optimized_query, filters.params)
         
         query_time = time.time() - start_time
-        print(f"[DEBUG] ОПТИМИЗИРОВАННЫЙ запрос выполнен за {query_time:.2f} сек, получено {len(all_attributes_optimized)} атрибутов")
+        logger.debug("ОПТИМИЗИРОВАННЫЙ запрос выполнен за %.2f сек, получено %s атрибутов",
+                     query_time, len(all_attributes_optimized))
         
         # Обрабатываем результаты в памяти Python
         classes_data = {}
@@ -908,7 +1094,6 @@ class DataService:
             class_ouid = row[5]
             
             # Парсим JSON различий
-            import json
             differences_json = row[12]
             if isinstance(differences_json, str):
                 original_exception_actions = json.loads(differences_json)
@@ -946,9 +1131,6 @@ class DataService:
                     'statistics': {'ignore_count': 0, 'update_count': 0, 'no_action_count': 0}
                 }
             
-            # Получаем OUID атрибута назначения для admin_url
-            target_ouid = self._get_target_attribute_ouid(class_name, attr_name) if base_url and class_name else None
-            
             # Извлекаем данные для отображения из ИСХОДНЫХ данных (до фильтрации)
             source_value = ''
             target_value = ''
@@ -980,7 +1162,8 @@ class DataService:
                 'property_name': display_property_name,
                 'source': source_value,
                 'target': target_value,
-                'admin_url': self._build_admin_url(target_ouid or attr_ouid, 'SXAttr', base_url),
+                'target_ouid': None,
+                'admin_url': None,  # Только для атрибутов, попавших в ответ (_attach_attribute_admin_urls)
                 'source_admin_url': self._build_admin_url(attr_ouid, 'SXAttr', source_base_url),
                 'exception_actions': exception_actions,
                 'overall_action': overall_action,
@@ -1030,7 +1213,7 @@ class DataService:
                 non_empty_classes_data[class_name] = class_data
                 
         classes_data = non_empty_classes_data
-        print(f"[DEBUG] После удаления пустых классов: {len(classes_data)} классов")
+        logger.debug("После удаления пустых классов: %s классов", len(classes_data))
         
         # Применяем пагинацию к классам
         class_names = list(classes_data.keys())
@@ -1047,8 +1230,9 @@ class DataService:
         total_pages = math.ceil(total_classes / per_page) if total_classes > 0 else 0
         
         processing_time = time.time() - start_time
-        print(f"[DEBUG] ОПТИМИЗАЦИЯ: обработано {len(all_attributes_optimized)} атрибутов за {processing_time:.2f} сек")
-        print(f"[DEBUG] Статистика: игнорировать={total_statistics['ignore_count']}, обновить={total_statistics['update_count']}, без действия={total_statistics['no_action_count']}")
+        logger.debug("ОПТИМИЗАЦИЯ: обработано %s атрибутов за %.2f сек", len(all_attributes_optimized), processing_time)
+        logger.debug("Статистика: игнорировать=%s, обновить=%s, без действия=%s",
+                     total_statistics['ignore_count'], total_statistics['update_count'], total_statistics['no_action_count'])
         
         # Получаем список всех доступных свойств для фильтра
         available_properties = self._get_available_properties(all_attributes_optimized)
@@ -1062,7 +1246,19 @@ class DataService:
             filtered_statistics['update_count'] += len(class_data['attributes']['update_list'])
             filtered_statistics['no_action_count'] += len(class_data['attributes']['no_action_list'])
         
-        print(f"[DEBUG] Пересчет статистики ПОСЛЕ фильтров: игнорировать={filtered_statistics['ignore_count']}, обновить={filtered_statistics['update_count']}, без действия={filtered_statistics['no_action_count']}")
+        logger.debug("Пересчет статистики ПОСЛЕ фильтров: игнорировать=%s, обновить=%s, без действия=%s",
+                     filtered_statistics['ignore_count'], filtered_statistics['update_count'], filtered_statistics['no_action_count'])
+        
+        # Списки атрибутов классов страницы: полные размеры и (при ограничении) только нужная часть
+        for class_data in paginated_classes_data.values():
+            lists = class_data['attributes']
+            class_data['list_totals'] = {list_name: len(items) for list_name, items in lists.items()}
+            if attributes_per_class:
+                end = attributes_offset + attributes_per_class
+                class_data['attributes'] = {list_name: items[attributes_offset:end]
+                                            for list_name, items in lists.items()}
+            for items in class_data['attributes'].values():
+                self._attach_attribute_admin_urls(items, base_url)
         
         return {
             'classes': paginated_classes_data,
@@ -1076,6 +1272,7 @@ class DataService:
             'statistics': filtered_statistics,
             'exception_action_filter': exception_action_filter,
             'analyze_exceptions': True,
+            'attributes_per_class': attributes_per_class,
             'optimization_info': {
                 'query_time': query_time,
                 'processing_time': processing_time,
@@ -1084,6 +1281,14 @@ class DataService:
             'available_properties': available_properties
         }
     
+    def _attach_attribute_admin_urls(self, attributes: List[Dict[str, Any]], base_url: str):
+        """Ссылки в админку назначения (поиск OUID назначения - запрос на атрибут)"""
+        for attr in attributes:
+            class_name = attr['class_name']
+            target_ouid = self._get_target_attribute_ouid(class_name, attr['name']) if base_url and class_name else None
+            attr['target_ouid'] = target_ouid
+            attr['admin_url'] = self._build_admin_url(target_ouid or attr['ouid'], 'SXAttr', base_url)
+    
     def _get_overall_exception_action_from_json(self, exception_actions: List[Dict[str, Any]]) -> int:
         """Определение общего действия для атрибута на основе JSON исключений"""
         
@@ -1144,7 +1349,8 @@ class DataService:
             if include_action:
                 filtered_actions.append(action)
         
-        print(f"[DEBUG] Фильтр '{source_target_filter}': было {len(exception_actions)} исключений, стало {len(filtered_actions)}")
+        logger.debug("Фильтр '%s': было %s исключений, стало %s",
+                     source_target_filter, len(exception_actions), len(filtered_actions))
         return filtered_actions
     
     def _apply_property_filter(self, exception_actions: List[Dict[str, Any]], property_filter: List[str]) -> List[Dict[str, Any]]:
@@ -1162,7 +1368,8 @@ class DataService:
             if property_name in property_filter:
                 filtered_actions.append(action)
         
-        print(f"[DEBUG] Фильтр свойств {property_filter}: было {len(exception_actions)} исключений, стало {len(filtered_actions)}")
+        logger.debug("Фильтр свойств %s: было %s исключений, стало %s",
+                     property_filter, len(exception_actions), len(filtered_actions))
         return filtered_actions
     
     def _apply_action_filter(self, exception_actions: List[Dict[str, Any]], show_update_actions: bool) -> List[Dict[str, Any]]:
@@ -1185,7 +1392,8 @@ class DataService:
                     filtered_actions.append(action)
         
         action_name = "все действия" if show_update_actions else "только 'Игнорировать'"
-        print(f"[DEBUG] Фильтр действий ({action_name}): было {len(exception_actions)} исключений, стало {len(filtered_actions)}")
+        logger.debug("Фильтр действий (%s): было %s исключений, стало %s",
+                     action_name, len(exception_actions), len(filtered_actions))
         return filtered_actions
     
     def _get_available_properties(self, attributes_data: List) -> List[str]:
@@ -1211,9 +1419,10 @@ class DataService:
         
         # Возвращаем отсортированный список
         available_properties = sorted(list(properties_set))
-        print(f"[DEBUG] Найдено {len(available_properties)} уникальных свойств: {available_properties[:10]}...")
+        logger.debug("Найдено %s уникальных свойств: %s...", len(available_properties), available_properties[:10])
         return available_properties
     
+    @coalesce
     def get_class_details(self, class_ouid: int, base_url: str = None, 
                          source_base_url: str = None,
                          search: str = None, status_variance: int = None, 
@@ -1221,7 +1430,7 @@ class DataService:
         """Получение детальной информации о классе"""
         
         # Информация о классе
-        class_query = f"""
+        class_query = """
             SELECT ouid, name, description, map, datastore, a_sxdsncache, icon,
                    isvirtual, secinner, precache, pullable, titletemplate,
                    java_class, a_abstract, a_version, a_sql_view, java_handler,
@@ -1230,26 +1439,14 @@ class DataService:
                    a_editor, parent_ouid, a_link_target, a_log, a_event,
                    a_status_variance, a_priznak
             FROM sxclass_source 
-            WHERE ouid = {class_ouid}
+            WHERE ouid = ?
         """
         
         # Группы атрибутов
-        groups_where_conditions = [f"g.cls = {class_ouid}"]
-        
-        if search:
-            search_escaped = search.replace("'", "''")
-            groups_where_conditions.append(f"(g.name ILIKE '%{search_escaped}%' OR g.title ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            groups_where_conditions.append(f"g.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            groups_where_conditions.append(f"g.a_event = {event}")
-            
-        if a_priznak is not None:
-            groups_where_conditions.append(f"g.a_priznak = {a_priznak}")
-            
-        groups_where_clause = " AND ".join(groups_where_conditions)
+        groups_filters = build_filters('g', GROUP_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                       class_column='cls', class_ouid=class_ouid,
+                                       trigram=self._use_trigram_search(search))
+        groups_where_clause = groups_filters.where_clause()
         
         groups_query = f"""
             SELECT g.ouid, g.title, g.name, g.cls, g.num, g.forservice, g.icon, g.a_parent,
@@ -1263,22 +1460,10 @@ class DataService:
         """
         
         # Атрибуты
-        attrs_where_conditions = [f"a.ouidsxclass = {class_ouid}"]
-        
-        if search:
-            search_escaped = search.replace("'", "''")
-            attrs_where_conditions.append(f"(a.name ILIKE '%{search_escaped}%' OR a.title ILIKE '%{search_escaped}%' OR a.description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            attrs_where_conditions.append(f"a.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            attrs_where_conditions.append(f"a.a_event = {event}")
-            
-        if a_priznak is not None:
-            attrs_where_conditions.append(f"a.a_priznak = {a_priznak}")
-            
-        attrs_where_clause = " AND ".join(attrs_where_conditions)
+        attrs_filters = build_filters('a', ATTRIBUTE_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                      class_column='ouidsxclass', class_ouid=class_ouid,
+                                      trigram=self._use_trigram_search(search))
+        attrs_where_clause = attrs_filters.where_clause()
         
         attrs_query = f"""
             SELECT a.ouid, a.name, a.description, a.title, a.ouiddatatype, a.pkey, a.defvalue,
@@ -1309,7 +1494,7 @@ class DataService:
                 return {"error": "Ошибка подключения к БД"}
             
             # Получаем информацию о классе
-            class_result = self.db_manager.execute_query(class_query)
+            class_result = self.db_manager.execute_query(class_query, [int(class_ouid)])
             if not class_result:
                 return {"error": "Класс не найден"}
             
@@ -1355,7 +1540,7 @@ class DataService:
             }
             
             # Получаем группы атрибутов
-            groups_result = self.db_manager.execute_query(groups_query)
+            groups_result = self.db_manager.execute_query(groups_query, groups_filters.params)
             groups = []
             for row in groups_result:
                 groups.append({
@@ -1388,7 +1573,7 @@ class DataService:
                 })
             
             # Получаем атрибуты
-            attrs_result = self.db_manager.execute_query(attrs_query)
+            attrs_result = self.db_manager.execute_query(attrs_query, attrs_filters.params)
             attributes = []
             for row in attrs_result:
                 attributes.append({
@@ -1524,7 +1709,7 @@ class DataService:
                     unnest(string_to_array(a_log, E'\\n')) as log_line,
                     generate_series(1, array_length(string_to_array(a_log, E'\\n'), 1)) as line_number
                 FROM SXCLASS_SOURCE
-                WHERE A_STATUS_VARIANCE = 2 AND A_EVENT = 4 AND ouid = {class_ouid}
+                WHERE A_STATUS_VARIANCE = 2 AND A_EVENT = 4 AND ouid = ?
             ),
             source_lines AS (
                 SELECT
@@ -1650,7 +1835,7 @@ class DataService:
             if not self.db_manager.connect():
                 return []
             
-            result = self.db_manager.execute_query(differences_query)
+            result = self.db_manager.execute_query(differences_query, [int(class_ouid)])
             
             differences = []
             for row in result:
@@ -1678,7 +1863,7 @@ class DataService:
             return differences
             
         except Exception as e:
-            print(f"Ошибка парсинга различий: {e}")
+            logger.error("Ошибка парсинга различий: %s", e)
             return []
         finally:
             if not skip_disconnect:
@@ -1689,27 +1874,13 @@ class DataService:
                              skip_disconnect: bool = False) -> List[Dict[str, Any]]:
         """Парсинг различий для групп атрибутов (использует SQL из отчёт по группам.sql)"""
         
-        # Построение WHERE условий для фильтрации групп
-        where_conditions = [f"s.cls = {class_ouid}"]
-        
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(s.name ILIKE '%{search_escaped}%' OR s.title ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"s.a_status_variance = {status_variance}")
-        else:
-            where_conditions.append("s.A_STATUS_VARIANCE = 2")
-            
-        if event is not None:
-            where_conditions.append(f"s.a_event = {event}")
-        else:
-            where_conditions.append("s.A_EVENT = 4")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"s.a_priznak = {a_priznak}")
-        
-        where_clause = " AND ".join(where_conditions)
+        # Построение WHERE условий для фильтрации групп (по умолчанию - изменённые группы)
+        filters = build_filters('s', GROUP_SEARCH_COLUMNS, search,
+                                status_variance if status_variance is not None else 2,
+                                event if event is not None else 4,
+                                a_priznak, class_column='cls', class_ouid=class_ouid,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
         
         differences_query = f"""
             -- Анализ различий между группами атрибутов источника и назначения в системе SiTex
@@ -1848,7 +2019,7 @@ class DataService:
             if not self.db_manager.connect():
                 return []
             
-            result = self.db_manager.execute_query(differences_query)
+            result = self.db_manager.execute_query(differences_query, filters.params)
             
             differences = []
             for row in result:
@@ -1876,7 +2047,7 @@ class DataService:
             return differences
             
         except Exception as e:
-            print(f"Ошибка парсинга различий по группам: {e}")
+            logger.error("Ошибка парсинга различий по группам: %s", e)
             return []
         finally:
             if not skip_disconnect:
@@ -1887,26 +2058,15 @@ class DataService:
                              skip_disconnect: bool = False) -> List[Dict[str, Any]]:
         """Парсинг различий для атрибутов (использует SQL из отчёт по атрибутам.sql)"""
         
-        print(f"[DEBUG] get_attribute_differences вызван с: class_ouid={class_ouid}, search='{search}', status_variance={status_variance}, event={event}")
+        logger.debug("get_attribute_differences вызван с: class_ouid=%s, search='%s', status_variance=%s, event=%s",
+                     class_ouid, search, status_variance, event)
         
         # Построение WHERE условий для фильтрации атрибутов
-        where_conditions = [f"s.ouidsxclass = {class_ouid}"]
-        
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(f"(s.name ILIKE '%{search_escaped}%' OR s.title ILIKE '%{search_escaped}%' OR s.description ILIKE '%{search_escaped}%')")
-            
-        if status_variance is not None:
-            where_conditions.append(f"s.a_status_variance = {status_variance}")
-            
-        if event is not None:
-            where_conditions.append(f"s.a_event = {event}")
-            
-        if a_priznak is not None:
-            where_conditions.append(f"s.a_priznak = {a_priznak}")
-        
-        where_clause = " AND ".join(where_conditions)
-        print(f"[DEBUG] WHERE условия для атрибутов: {where_clause}")
+        filters = build_filters('s', ATTRIBUTE_SEARCH_COLUMNS, search, status_variance, event, a_priznak,
+                                class_column='ouidsxclass', class_ouid=class_ouid,
+                                trigram=self._use_trigram_search(search))
+        where_clause = filters.where_clause()
+        logger.debug("WHERE условия для атрибутов: %s", where_clause)
         
         differences_query = f"""
             -- Анализ различий между атрибутами источника и назначения в системе SiTex
@@ -1972,19 +2132,17 @@ class DataService:
             if not self.db_manager.connect():
                 return []
             
-            result = self.db_manager.execute_query(differences_query)
-            print(f"[DEBUG] SQL запрос атрибутов вернул {len(result)} строк")
+            result = self.db_manager.execute_query(differences_query, filters.params)
+            logger.debug("SQL запрос атрибутов вернул %s строк", len(result))
             
             differences = []
-            debug_count = 0
+            row_log = SampledLog(logger, first=3)
             for row in result:
                 difference_type = self._get_difference_type(row[4], row[5])
                 
                 # Получаем действие исключения для этого различия атрибута
                 # Для атрибутов сравниваем по полю "Свойство" (attribute_name), а не по названию атрибута
-                if debug_count < 3:  # Логируем первые 3 записи
-                    print(f"[DEBUG] Атрибут {debug_count}: attr_name='{row[1]}', attribute_name='{row[3]}'")
-                    debug_count += 1
+                row_log.debug("Атрибут: attr_name='%s', attribute_name='%s'", row[1], row[3])
                 exception_action = self.get_exception_action('attribute', row[3], skip_disconnect=skip_disconnect)
                 
                 differences.append({
@@ -2006,12 +2164,13 @@ class DataService:
             return differences
             
         except Exception as e:
-            print(f"Ошибка парсинга различий по атрибутам: {e}")
+            logger.error("Ошибка парсинга различий по атрибутам: %s", e)
             return []
         finally:
             if not skip_disconnect:
                 self.db_manager.disconnect()
 
+    @coalesce
     def get_statistics(self) -> Dict[str, Any]:
         """Получение общей статистики"""
         
@@ -2049,7 +2208,7 @@ class DataService:
                 return {}
             
             # Статистика классов
-            result = self.db_manager.execute_query(stats_query)
+            result = self.db_manager.execute_query(stats_query, [])
             stats = {}
             if result:
                 row = result[0]
@@ -2063,7 +2222,7 @@ class DataService:
                 })
             
             # Статистика атрибутов
-            result = self.db_manager.execute_query(attrs_stats_query)
+            result = self.db_manager.execute_query(attrs_stats_query, [])
             if result:
                 row = result[0]
                 stats.update({
@@ -2074,7 +2233,7 @@ class DataService:
                 })
             
             # Статистика групп
-            result = self.db_manager.execute_query(groups_stats_query)
+            result = self.db_manager.execute_query(groups_stats_query, [])
             if result:
                 row = result[0]
                 stats.update({
@@ -2087,7 +2246,7 @@ class DataService:
             return stats
             
         except Exception as e:
-            print(f"Ошибка получения статистики: {e}")
+            logger.error("Ошибка получения статистики: %s", e)
             return {}
         finally:
             self.db_manager.disconnect()
@@ -2097,53 +2256,46 @@ class DataService:
         url = base_url if base_url else self.base_url
         return f"{url}/admin/edit.htm?id={ouid}@{object_type}"
     
+    def admin_url_template(self, object_type: str, base_url: str = None) -> str:
+        """Шаблон URL админки с {} вместо OUID - ссылки собираются на стороне браузера"""
+        return self._build_admin_url('{}', object_type, base_url)
+    
     def _get_target_class_ouid(self, class_name: str) -> int:
         """Получение OUID класса назначения по имени"""
-        # Экранируем одинарные кавычки для безопасности
-        class_name_escaped = class_name.replace("'", "''") if class_name else ''
-        
-        query = f"SELECT ouid FROM sxclass WHERE name = '{class_name_escaped}'"
+        query = "SELECT ouid FROM sxclass WHERE name = ?"
         try:
-            result = self.db_manager.execute_query(query)
+            result = self.db_manager.execute_query(query, [class_name or ''])
             return result[0][0] if result else None
         except Exception as e:
-            print(f"Ошибка получения OUID класса назначения: {e}")
+            logger.error("Ошибка получения OUID класса назначения: %s", e)
             return None
     
     def _get_target_attribute_ouid(self, class_name: str, attr_name: str) -> int:
         """Получение OUID атрибута назначения по имени класса и атрибута"""
-        # Экранируем одинарные кавычки для безопасности
-        class_name_escaped = class_name.replace("'", "''") if class_name else ''
-        attr_name_escaped = attr_name.replace("'", "''") if attr_name else ''
-        
-        query = f"""
+        query = """
             SELECT a.ouid FROM sxattr a
             JOIN sxclass c ON c.ouid = a.ouidsxclass
-            WHERE c.name = '{class_name_escaped}' AND a.name = '{attr_name_escaped}'
+            WHERE c.name = ? AND a.name = ?
         """
         try:
-            result = self.db_manager.execute_query(query)
+            result = self.db_manager.execute_query(query, [class_name or '', attr_name or ''])
             return result[0][0] if result else None
         except Exception as e:
-            print(f"Ошибка получения OUID атрибута назначения: {e}")
+            logger.error("Ошибка получения OUID атрибута назначения: %s", e)
             return None
     
     def _get_target_group_ouid(self, class_name: str, group_name: str) -> int:
         """Получение OUID группы назначения по имени класса и группы"""
-        # Экранируем одинарные кавычки для безопасности
-        class_name_escaped = class_name.replace("'", "''") if class_name else ''
-        group_name_escaped = group_name.replace("'", "''") if group_name else ''
-        
-        query = f"""
+        query = """
             SELECT g.ouid FROM sxattr_grp g
             JOIN sxclass c ON c.ouid = g.cls
-            WHERE c.name = '{class_name_escaped}' AND g.name = '{group_name_escaped}'
+            WHERE c.name = ? AND g.name = ?
         """
         try:
-            result = self.db_manager.execute_query(query)
+            result = self.db_manager.execute_query(query, [class_name or '', group_name or ''])
             return result[0][0] if result else None
         except Exception as e:
-            print(f"Ошибка получения OUID группы назначения: {e}")
+            logger.error("Ошибка получения OUID группы назначения: %s", e)
             return None
     
     def _load_exceptions_cache(self) -> Dict[str, int]:
@@ -2152,7 +2304,7 @@ class DataService:
         try:
             # Изменяем запрос - теперь получаем и entity_name и property_name
             query = "SELECT entity_type, entity_name, property_name, action FROM __meta_statistic"
-            result = self.db_manager.execute_query(query)
+            result = self.db_manager.execute_query(query, [])
             
             for row in result:
                 entity_type, entity_name, property_name, action = row
@@ -2170,15 +2322,20 @@ class DataService:
                     key2 = f"{entity_type}:{property_name}"
                     cache[key2] = action
                 
-            print(f"[DEBUG] Загружен кэш исключений: {len(cache)} записей")
+            logger.debug("Загружен кэш исключений: %s записей", len(cache))
             return cache
             
         except Exception as e:
-            print(f"[DEBUG] Ошибка загрузки кэша исключений: {e}")
+            logger.warning("Ошибка загрузки кэша исключений: %s", e)
             return {}
 
-    def _analyze_attribute_exceptions_cached(self, attr_ouid: int, attr_name: str, a_log: str, exceptions_cache: Dict[str, int]) -> List[Dict[str, Any]]:
-        """Анализ исключений для атрибута с использованием кэша"""
+    def _analyze_attribute_exceptions_cached(self, attr_ouid: int, attr_name: str, a_log: str, exceptions_cache: Dict[str, int],
+                                             error_log: SampledLog = None) -> List[Dict[str, Any]]:
+        """
+        Анализ исключений для атрибута с использованием кэша
+        error_log - SampledLog цикла по атрибутам (создается вместе с exceptions_cache)
+        """
+        error_log = error_log or logger
         
         if not a_log or a_log.strip() == '':
             # print(f"[DEBUG] Атрибут {attr_name}: БЕЗ a_log")
@@ -2187,16 +2344,16 @@ class DataService:
         try:
             # Проверяем соединение перед выполнением запроса
             if self.db_manager.connection is None:
-                print(f"[DEBUG] Ошибка анализа исключений для {attr_name}: Нет соединения с БД")
+                error_log.warning("Ошибка анализа исключений для %s: Нет соединения с БД", attr_name)
                 return []
             
             # Парсим a_log как делается в get_attribute_differences
-            attr_blocks_query = f"""
+            attr_blocks_query = """
                 WITH source_data AS (
                     SELECT
-                        {attr_ouid} as ouid,
-                        '{attr_name}' as name,
-                        $${a_log}$$ as a_log
+                        CAST(? AS bigint) as ouid,
+                        CAST(? AS text) as name,
+                        CAST(? AS text) as a_log
                 ),
                 attr_blocks AS (
                     SELECT
@@ -2245,7 +2402,7 @@ class DataService:
                 ORDER BY attribute_name
             """
             
-            result = self.db_manager.execute_query(attr_blocks_query)
+            result = self.db_manager.execute_query(attr_blocks_query, [int(attr_ouid), attr_name, a_log])
             
             if not result:
                 # print(f"[DEBUG] Атрибут {attr_name}: парсинг a_log = ПУСТО")
@@ -2282,11 +2439,11 @@ class DataService:
             return exception_actions
             
         except Exception as e:
-            print(f"[DEBUG] Ошибка анализа исключений для {attr_name}: {e}")
+            error_log.warning("Ошибка анализа исключений для %s: %s", attr_name, e)
             # При ошибке БД пытаемся переподключиться
             try:
                 if not self.db_manager.connect():
-                    print(f"[DEBUG] Не удалось переподключиться к БД")
+                    logger.warning("Не удалось переподключиться к БД")
             except:
                 pass
             return []
@@ -2326,18 +2483,14 @@ class DataService:
                        entity_type: str = None, search: str = None) -> Dict[str, Any]:
         """Получение списка исключений с пагинацией"""
         
-        where_conditions = []
+        filters = QueryBuilder()
         
         if entity_type:
-            where_conditions.append(f"entity_type = '{entity_type}'")
+            filters.add_equals("entity_type", entity_type)
             
-        if search:
-            search_escaped = search.replace("'", "''")
-            where_conditions.append(
-                f"(entity_name ILIKE '%{search_escaped}%' OR property_name ILIKE '%{search_escaped}%')"
-            )
+        filters.add_search(("entity_name", "property_name"), search)
             
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+        where_clause = filters.where_clause()
         
         # Общее количество записей
         count_query = f"""
@@ -2354,7 +2507,7 @@ class DataService:
             FROM __meta_statistic 
             WHERE {where_clause}
             ORDER BY entity_type, entity_name, property_name
-            LIMIT {per_page} OFFSET {offset}
+            LIMIT ? OFFSET ?
         """
         
         try:
@@ -2362,10 +2515,10 @@ class DataService:
                 return {"error": "Ошибка подключения к БД"}
                 
             # Получаем общее количество
-            total_count = int(self.db_manager.execute_query(count_query)[0][0])
+            total_count = int(self.db_manager.execute_query(count_query, filters.params)[0][0])
             
             # Получаем данные
-            exceptions = self.db_manager.execute_query(main_query)
+            exceptions = self.db_manager.execute_query(main_query, filters.params + [per_page, offset])
             
             # Преобразуем в словари
             exceptions_list = []
@@ -2412,29 +2565,21 @@ class DataService:
             if not self.db_manager.connect():
                 return {"error": "Ошибка подключения к БД"}
                 
-            # Используем prepared statement
-            prep_stmt = self.db_manager.connection.prepareStatement(query)
-            prep_stmt.setInt(1, exception_id)
-            result_set = prep_stmt.executeQuery()
-            
-            if result_set.next():
-                exception_data = {
-                    'id': int(result_set.getInt('id')),
-                    'entity_type': str(result_set.getString('entity_type')),
-                    'entity_name': str(result_set.getString('entity_name')),
-                    'property_name': str(result_set.getString('property_name')),
-                    'action': int(result_set.getInt('action')),
-                    'action_name': str(self._get_action_name(result_set.getInt('action'))),
-                    'created_at': str(result_set.getTimestamp('created_at')) if result_set.getTimestamp('created_at') else None,
-                    'updated_at': str(result_set.getTimestamp('updated_at')) if result_set.getTimestamp('updated_at') else None
+            result = self.db_manager.execute_query(query, [int(exception_id)])
+            
+            if result:
+                row = result[0]
+                return {
+                    'id': int(row[0]),
+                    'entity_type': str(row[1]),
+                    'entity_name': str(row[2]),
+                    'property_name': str(row[3]),
+                    'action': int(row[4]),
+                    'action_name': str(self._get_action_name(int(row[4]))),
+                    'created_at': str(row[5]) if row[5] else None,
+                    'updated_at': str(row[6]) if row[6] else None
                 }
-                
-                result_set.close()
-                prep_stmt.close()
-                return exception_data
             else:
-                result_set.close()
-                prep_stmt.close()
                 return {"error": "Исключение не найдено"}
                 
         except Exception as e:
@@ -2463,36 +2608,14 @@ class DataService:
                 return {"error": "Ошибка подключения к БД"}
             
             # Проверяем на дубликаты
-            prep_stmt_check = self.db_manager.connection.prepareStatement(check_query)
-            prep_stmt_check.setString(1, entity_type)
-            prep_stmt_check.setString(2, entity_name)
-            prep_stmt_check.setString(3, property_name)
-            result_set = prep_stmt_check.executeQuery()
-            
-            if result_set.next():
-                result_set.close()
-                prep_stmt_check.close()
+            if self.db_manager.execute_query(check_query, [entity_type, entity_name, property_name]):
                 return {"error": "Исключение уже существует"}
             
-            result_set.close()
-            prep_stmt_check.close()
-            
             # Создаем новое исключение
-            prep_stmt = self.db_manager.connection.prepareStatement(insert_query)
-            prep_stmt.setString(1, entity_type)
-            prep_stmt.setString(2, entity_name)
-            prep_stmt.setString(3, property_name)
-            prep_stmt.setInt(4, action)
-            
-            result_set = prep_stmt.executeQuery()
-            if result_set.next():
-                new_id = result_set.getInt(1)
-                result_set.close()
-                prep_stmt.close()
-                return {"success": True, "id": new_id}
+            result = self.db_manager.execute_query(insert_query, [entity_type, entity_name, property_name, int(action)])
+            if result:
+                return {"success": True, "id": int(result[0][0])}
             else:
-                result_set.close()
-                prep_stmt.close()
                 return {"error": "Ошибка создания исключения"}
                 
         except Exception as e:
@@ -2541,17 +2664,7 @@ class DataService:
             if not self.db_manager.connect():
                 return {"error": "Ошибка подключения к БД"}
                 
-            prep_stmt = self.db_manager.connection.prepareStatement(update_query)
-            
-            # Устанавливаем параметры
-            for i, param in enumerate(params, 1):
-                if isinstance(param, int):
-                    prep_stmt.setInt(i, param)
-                else:
-                    prep_stmt.setString(i, str(param))
-            
-            rows_affected = prep_stmt.executeUpdate()
-            prep_stmt.close()
+            rows_affected = self.db_manager.execute_update(update_query, params)
             
             if rows_affected > 0:
                 return {"success": True}
@@ -2572,11 +2685,7 @@ class DataService:
             if not self.db_manager.connect():
                 return {"error": "Ошибка подключения к БД"}
                 
-            prep_stmt = self.db_manager.connection.prepareStatement(delete_query)
-            prep_stmt.setInt(1, exception_id)
-            
-            rows_affected = prep_stmt.executeUpdate()
-            prep_stmt.close()
+            rows_affected = self.db_manager.execute_update(delete_query, [int(exception_id)])
             
             if rows_affected > 0:
                 return {"success": True}
@@ -2605,17 +2714,11 @@ class DataService:
                 # print("[DEBUG] Ошибка подключения к БД")
                 return 0  # По умолчанию игнорировать
                 
-            prep_stmt = self.db_manager.connection.prepareStatement(query)
-            prep_stmt.setString(1, entity_type)
-            prep_stmt.setString(2, entity_name)
-            result_set = prep_stmt.executeQuery()
-            
-            if result_set.next():
-                action = result_set.getInt('action')
-                # print(f"[DEBUG] Найдено исключение: действие={action}")
-                result_set.close()
-                prep_stmt.close()
-                return action
+            result = self.db_manager.execute_query(query, [entity_type, entity_name])
+            
+            if result:
+                # print(f"[DEBUG] Найдено исключение: действие={result[0][0]}")
+                return int(result[0][0])
             else:
                 # Если не нашли по entity_name, пробуем искать по property_name
                 if property_name:
@@ -2623,29 +2726,16 @@ class DataService:
                         SELECT action FROM __meta_statistic 
                         WHERE entity_type = ? AND property_name = ?
                     """
-                    prep_stmt2 = self.db_manager.connection.prepareStatement(query2)
-                    prep_stmt2.setString(1, entity_type)
-                    prep_stmt2.setString(2, property_name)
-                    result_set2 = prep_stmt2.executeQuery()
-                    
-                    if result_set2.next():
-                        action = result_set2.getInt('action')
-                        result_set2.close()
-                        prep_stmt2.close()
-                        result_set.close()
-                        prep_stmt.close()
-                        return action
+                    result = self.db_manager.execute_query(query2, [entity_type, property_name])
                     
-                    result_set2.close()
-                    prep_stmt2.close()
+                    if result:
+                        return int(result[0][0])
                 
                 # print(f"[DEBUG] Исключение не найдено для: {entity_type}/{entity_name}")
-                result_set.close()
-                prep_stmt.close()
                 return 0  # По умолчанию игнорировать
                 
         except Exception as e:
-            print(f"[ERROR] Ошибка получения действия исключения: {e}")
+            logger.error("Ошибка получения действия исключения: %s", e)
             return 0
         finally:
             if not skip_disconnect:
@@ -2655,38 +2745,38 @@ class DataService:
         """Отладочный метод для вывода содержимого таблицы исключений"""
         try:
             if not self.db_manager.connect():
-                print("[DEBUG] Ошибка подключения к БД для отладки")
+                logger.warning("Ошибка подключения к БД для отладки")
                 return
                 
             # Проверяем общее количество записей
             count_query = "SELECT COUNT(*) FROM __meta_statistic"
             result = self.db_manager.execute_query(count_query)
             total_count = int(result[0][0]) if result else 0
-            print(f"[DEBUG] Всего исключений в таблице: {total_count}")
+            logger.debug("Всего исключений в таблице: %s", total_count)
             
             # Выводим количество по типам
             type_query = "SELECT entity_type, COUNT(*) FROM __meta_statistic GROUP BY entity_type"
             result = self.db_manager.execute_query(type_query)
-            print("[DEBUG] По типам:")
+            logger.debug("По типам:")
             for row in result:
-                print(f"  {row[0]}: {row[1]} записей")
+                logger.debug("%s: %s записей", row[0], row[1])
             
             # Выводим несколько примеров атрибутов
             attr_query = "SELECT entity_name, property_name, action FROM __meta_statistic WHERE entity_type = 'attribute' LIMIT 5"
             result = self.db_manager.execute_query(attr_query)
-            print("[DEBUG] Примеры атрибутов:")
+            logger.debug("Примеры атрибутов:")
             for row in result:
-                print(f"  {row[0]} / {row[1]} -> {row[2]}")
+                logger.debug("%s / %s -> %s", row[0], row[1], row[2])
             
             # Проверяем конкретно readOnly и informs
             specific_query = "SELECT entity_name, property_name, action FROM __meta_statistic WHERE entity_type = 'attribute' AND entity_name IN ('readOnly', 'informs', 'refClass')"
             specific_result = self.db_manager.execute_query(specific_query)
-            print("[DEBUG] Поиск readOnly, informs, refClass:")
+            logger.debug("Поиск readOnly, informs, refClass:")
             for row in specific_result:
-                print(f"  {row[0]} / {row[1]} -> {row[2]}")
+                logger.debug("%s / %s -> %s", row[0], row[1], row[2])
                 
         except Exception as e:
-            print(f"[ERROR] Ошибка отладки таблицы исключений: {e}")
+            logger.error("Ошибка отладки таблицы исключений: %s", e)
         finally:
             self.db_manager.disconnect()
     
@@ -2698,9 +2788,9 @@ class DataService:
             if attr_name:
                 unique_properties.add(attr_name)
         
-        print(f"[DEBUG] Уникальные свойства в различиях ({len(unique_properties)} шт.):")
+        logger.debug("Уникальные свойства в различиях (%s шт.):", len(unique_properties))
         for prop in sorted(unique_properties):
-            print(f"  {prop}")
+            logger.debug("%s", prop)
     
     def _get_action_name(self, action) -> str:
         """Получение названия действия по коду"""
@@ -2724,12 +2814,12 @@ class DataService:
         
         try:
             # Парсим a_log как делается в get_attribute_differences
-            attr_blocks_query = f"""
+            attr_blocks_query = """
                 WITH source_data AS (
                     SELECT
-                        {attr_ouid} as ouid,
-                        '{attr_name}' as name,
-                        $${a_log}$$ as a_log
+                        CAST(? AS bigint) as ouid,
+                        CAST(? AS text) as name,
+                        CAST(? AS text) as a_log
                 ),
                 attr_blocks AS (
                     SELECT
@@ -2777,7 +2867,7 @@ class DataService:
                 ORDER BY attribute_name
             """
             
-            result = self.db_manager.execute_query(attr_blocks_query)
+            result = self.db_manager.execute_query(attr_blocks_query, [int(attr_ouid), attr_name, a_log])
             
             exception_actions = []
             for row in result:
@@ -2797,7 +2887,7 @@ class DataService:
             return exception_actions
             
         except Exception as e:
-            print(f"Ошибка анализа исключений для атрибута {attr_ouid}: {e}")
+            logger.error("Ошибка анализа исключений для атрибута %s: %s", attr_ouid, e)
             return []
     
     def _get_overall_exception_action(self, exception_actions: List[Dict[str, Any]]) -> int:
@@ -2822,52 +2912,54 @@ class DataService:
         """Загрузка действий из списка исключений для класса"""
         
         try:
-            print(f"[DEBUG] Загрузка действий для класса {class_ouid} с фильтрами: search='{search}', status_variance={status_variance}, event={event}")
+            logger.debug("Загрузка действий для класса %s с фильтрами: search='%s', status_variance=%s, event=%s",
+                         class_ouid, search, status_variance, event)
             
             # Отладка: выводим содержимое таблицы исключений (отключено)
             # self._debug_exceptions_table()
             
             # Получаем все различия для класса с теми же фильтрами, что и на странице
-            print(f"[DEBUG] Вызов get_class_differences({class_ouid}) - без фильтров")
+            logger.debug("Вызов get_class_differences(%s) - без фильтров", class_ouid)
             class_differences = self.get_class_differences(class_ouid, None, None, skip_disconnect=True)
-            print(f"[DEBUG] Вызов get_group_differences({class_ouid}, {search}, {status_variance}, {event})")
+            logger.debug("Вызов get_group_differences(%s, %s, %s, %s)", class_ouid, search, status_variance, event)
             group_differences = self.get_group_differences(class_ouid, search, status_variance, event, None, None, skip_disconnect=True) 
-            print(f"[DEBUG] Вызов get_attribute_differences({class_ouid}, {search}, {status_variance}, {event})")
+            logger.debug("Вызов get_attribute_differences(%s, %s, %s, %s)", class_ouid, search, status_variance, event)
             attribute_differences = self.get_attribute_differences(class_ouid, search, status_variance, event, None, None, skip_disconnect=True)
             
             # Отладка: показываем все уникальные свойства в различиях
             self._debug_unique_properties(attribute_differences)
             
-            print(f"[DEBUG] Найдено различий: классы={len(class_differences)}, группы={len(group_differences)}, атрибуты={len(attribute_differences)}")
+            logger.debug("Найдено различий: классы=%s, группы=%s, атрибуты=%s",
+                         len(class_differences), len(group_differences), len(attribute_differences))
             
             class_count = 0
             group_count = 0
             attribute_count = 0
             
             # Подсчитываем количество различий с загруженными действиями
-            print("[DEBUG] Анализ различий классов:")
+            logger.debug("Анализ различий классов:")
             for i, diff in enumerate(class_differences[:5]):  # Первые 5 для отладки
                 action = diff.get('exception_action', 0)
-                print(f"  Класс {i}: {diff.get('attribute_name', 'N/A')} -> действие: {action}")
+                logger.debug("Класс %s: %s -> действие: %s", i, diff.get('attribute_name', 'N/A'), action)
                 if action != 0:
                     class_count += 1
                     
-            print("[DEBUG] Анализ различий групп:")
+            logger.debug("Анализ различий групп:")
             for i, diff in enumerate(group_differences[:5]):  # Первые 5 для отладки
                 action = diff.get('exception_action', 0)
-                print(f"  Группа {i}: {diff.get('attribute_name', 'N/A')} -> действие: {action}")
+                logger.debug("Группа %s: %s -> действие: %s", i, diff.get('attribute_name', 'N/A'), action)
                 if action != 0:
                     group_count += 1
                     
-            print("[DEBUG] Анализ различий атрибутов:")
+            logger.debug("Анализ различий атрибутов:")
             for i, diff in enumerate(attribute_differences[:5]):  # Первые 5 для отладки
                 action = diff.get('exception_action', 0)
                 attr_name = diff.get('attribute_name', 'N/A')
-                print(f"  Атрибут {i}: {attr_name} -> действие: {action}")
+                logger.debug("Атрибут %s: %s -> действие: %s", i, attr_name, action)
                 if action != 0:
                     attribute_count += 1
             
-            print(f"[DEBUG] Итого действий найдено: классы={class_count}, группы={group_count}, атрибуты={attribute_count}")
+            logger.debug("Итого действий найдено: классы=%s, группы=%s, атрибуты=%s", class_count, group_count, attribute_count)
             
             return {
                 "success": True,
@@ -2878,7 +2970,7 @@ class DataService:
             }
             
         except Exception as e:
-            print(f"[ERROR] Ошибка загрузки действий: {e}")
+            logger.error("Ошибка загрузки действий: %s", e)
             return {"error": f"Ошибка загрузки действий: {e}"}
     
     def _get_class_differences_no_disconnect(self, class_ouid: int) -> List[Dict[str, Any]]:
@@ -2895,7 +2987,7 @@ class DataService:
                         unnest(string_to_array(a_log, E'\\n')) as log_line,
                         generate_series(1, array_length(string_to_array(a_log, E'\\n'), 1)) as line_number
                     FROM SXCLASS_SOURCE
-                    WHERE A_STATUS_VARIANCE = 2 AND A_EVENT = 4 AND ouid = {class_ouid}
+                    WHERE A_STATUS_VARIANCE = 2 AND A_EVENT = 4 AND ouid = ?
                 ),
                 source_lines AS (
                     SELECT
@@ -2942,7 +3034,7 @@ class DataService:
                 ORDER BY class_name, property_name;
             """
             
-            result = self.db_manager.execute_query(differences_query)
+            result = self.db_manager.execute_query(differences_query, [int(class_ouid)])
             differences = []
             
             for row in result:
@@ -2964,29 +3056,21 @@ class DataService:
             return differences
             
         except Exception as e:
-            print(f"Ошибка парсинга различий: {e}")
+            logger.error("Ошибка парсинга различий: %s", e)
             return []
 
     def _get_group_differences_no_disconnect(self, class_ouid: int, search: str = None, status_variance: int = None, event: int = None) -> List[Dict[str, Any]]:
         """Версия get_group_differences без disconnect() для внутреннего использования"""
         try:
             # Определяем WHERE условия в зависимости от переданных параметров
-            where_conditions = [f"s.cls = {class_ouid}"]
-            
-            if status_variance is not None:
-                where_conditions.append(f"s.A_STATUS_VARIANCE = {status_variance}")
-            else:
-                where_conditions.append("s.A_STATUS_VARIANCE = 2")
-            
-            if event is not None:
-                where_conditions.append(f"s.a_event = {event}")
-            else:
-                where_conditions.append("s.A_EVENT = 0")
-            
-            if search and search.strip() and search != 'None':
-                where_conditions.append(f"(s.title ILIKE '%{search}%' OR s.name ILIKE '%{search}%')")
-            
-            groups_where_clause = " AND ".join(where_conditions)
+            if not (search and search.strip() and search != 'None'):
+                search = None
+            groups_filters = build_filters('s', GROUP_SEARCH_COLUMNS, search,
+                                           status_variance if status_variance is not None else 2,
+                                           event if event is not None else 0,
+                                           class_column='cls', class_ouid=class_ouid,
+                                           trigram=self._use_trigram_search(search))
+            groups_where_clause = groups_filters.where_clause()
             
             differences_query = f"""
                 -- Парсинг различий для групп атрибутов
@@ -3051,7 +3135,7 @@ class DataService:
                 ORDER BY attr_grp_name, property_name;
             """
             
-            result = self.db_manager.execute_query(differences_query)
+            result = self.db_manager.execute_query(differences_query, groups_filters.params)
             differences = []
             
             for row in result:
@@ -3074,29 +3158,21 @@ class DataService:
             return differences
             
         except Exception as e:
-            print(f"Ошибка парсинга различий по группам: {e}")
+            logger.error("Ошибка парсинга различий по группам: %s", e)
             return []
 
     def _get_attribute_differences_no_disconnect(self, class_ouid: int, search: str = None, status_variance: int = None, event: int = None) -> List[Dict[str, Any]]:
         """Версия get_attribute_differences без disconnect() для внутреннего использования"""
         try:
             # Определяем WHERE условия в зависимости от переданных параметров  
-            where_conditions = [f"s.ouidsxclass = {class_ouid}"]
-            
-            if status_variance is not None:
-                where_conditions.append(f"s.A_STATUS_VARIANCE = {status_variance}")
-            else:
-                where_conditions.append("s.A_STATUS_VARIANCE = 2")
-            
-            if event is not None:
-                where_conditions.append(f"s.a_event = {event}")
-            else:
-                where_conditions.append("s.A_EVENT = 0")
-            
-            if search and search.strip() and search != 'None':
-                where_conditions.append(f"(s.title ILIKE '%{search}%' OR s.name ILIKE '%{search}%')")
-            
-            attrs_where_clause = " AND ".join(where_conditions)
+            if not (search and search.strip() and search != 'None'):
+                search = None
+            attrs_filters = build_filters('s', ATTRIBUTE_SEARCH_COLUMNS, search,
+                                          status_variance if status_variance is not None else 2,
+                                          event if event is not None else 0,
+                                          class_column='ouidsxclass', class_ouid=class_ouid,
+                                          trigram=self._use_trigram_search(search))
+            attrs_where_clause = attrs_filters.where_clause()
             
             differences_query = f"""
                 -- Парсинг различий для атрибутов
@@ -3161,7 +3237,7 @@ class DataService:
                 ORDER BY attr_name, property_name;
             """
             
-            result = self.db_manager.execute_query(differences_query)
+            result = self.db_manager.execute_query(differences_query, attrs_filters.params)
             differences = []
             
             for row in result:
@@ -3184,108 +3260,99 @@ class DataService:
             return differences
             
         except Exception as e:
-            print(f"Ошибка парсинга различий по атрибутам: {e}")
+            logger.error("Ошибка парсинга различий по атрибутам: %s", e)
             return []
 
     def save_actions_to_db(self, class_ouid: int, search: str = None, status_variance: int = None, event: int = None) -> Dict[str, Any]:
         """Записать действия в поля event соответствующих таблиц"""
         
         try:
-            print(f"[DEBUG] Сохранение действий для класса {class_ouid} с фильтрами: search='{search}', status_variance={status_variance}, event={event}")
+            logger.debug("Сохранение действий для класса %s с фильтрами: search='%s', status_variance=%s, event=%s",
+                         class_ouid, search, status_variance, event)
             
-            print(f"[DEBUG] Попытка подключения к БД...")
+            logger.debug("Попытка подключения к БД...")
             if not self.db_manager.connect():
-                print(f"[DEBUG] Ошибка: не удалось подключиться к БД")
+                logger.warning("Ошибка: не удалось подключиться к БД")
                 return {"error": "Ошибка подключения к БД"}
             
-            print(f"[DEBUG] Подключение к БД успешно, connection: {self.db_manager.connection}")
+            logger.debug("Подключение к БД успешно, connection: %s", self.db_manager.connection)
             
             class_updated = 0
             group_updated = 0 
             attribute_updated = 0
             
             # Получаем различия с действиями используя основные функции с флагом skip_disconnect
-            print(f"[DEBUG] Получение различий классов...")
+            logger.debug("Получение различий классов...")
             class_differences = self.get_class_differences(class_ouid, None, None, skip_disconnect=True)
-            print(f"[DEBUG] Различий классов: {len(class_differences)}")
+            logger.debug("Различий классов: %s", len(class_differences))
             
-            print(f"[DEBUG] Получение различий групп...")
+            logger.debug("Получение различий групп...")
             group_differences = self.get_group_differences(class_ouid, search, status_variance, event, None, None, skip_disconnect=True)
-            print(f"[DEBUG] Различий групп: {len(group_differences)}")
+            logger.debug("Различий групп: %s", len(group_differences))
             
-            print(f"[DEBUG] Получение различий атрибутов...")
+            logger.debug("Получение различий атрибутов...")
             attribute_differences = self.get_attribute_differences(class_ouid, search, status_variance, event, None, None, skip_disconnect=True)
-            print(f"[DEBUG] Различий атрибутов: {len(attribute_differences)}")
+            logger.debug("Различий атрибутов: %s", len(attribute_differences))
             
             # Проверяем connection перед использованием
             if self.db_manager.connection is None:
-                print(f"[DEBUG] ОШИБКА: connection равен None!")
+                logger.warning("ОШИБКА: connection равен None!")
                 return {"error": "Подключение к БД потеряно"}
             
+            # Построчная отладка выводится выборочно (первые строки и каждая N-я)
+            row_log = SampledLog(logger)
+            
             # Обновляем классы в SXCLASS_SOURCE
-            print(f"[DEBUG] Обновление классов...")
+            logger.debug("Обновление классов...")
             for diff in class_differences:
                 action = diff.get('exception_action', 0)
-                print(f"[DEBUG] Класс {class_ouid}, действие: {action}")
+                row_log.debug("Класс %s, действие: %s", class_ouid, action)
                 if action != 0:  # Только если есть действие
                     update_query = """
                         UPDATE SXCLASS_SOURCE 
                         SET a_event = ? 
                         WHERE ouid = ?
                     """
-                    print(f"[DEBUG] Подготовка SQL для класса: {update_query}")
-                    prep_stmt = self.db_manager.connection.prepareStatement(update_query)
-                    prep_stmt.setInt(1, int(action))
-                    prep_stmt.setInt(2, int(class_ouid))
-                    rows = prep_stmt.executeUpdate()
-                    prep_stmt.close()
-                    print(f"[DEBUG] Обновлено строк классов: {rows}")
+                    rows = self.db_manager.execute_update(update_query, [int(action), int(class_ouid)])
+                    row_log.debug("Обновлено строк классов: %s", rows)
                     if rows > 0:
                         class_updated += 1
             
             # Обновляем группы в SXATTR_GRP_SOURCE
-            print(f"[DEBUG] Обновление групп...")
+            logger.debug("Обновление групп...")
             for i, diff in enumerate(group_differences):
                 action = diff.get('exception_action', 0)
-                print(f"[DEBUG] Группа {i}, OUID: {diff.get('attr_grp_ouid')}, действие: {action}")
+                row_log.debug("Группа %s, OUID: %s, действие: %s", i, diff.get('attr_grp_ouid'), action)
                 if action != 0:  # Только если есть действие
                     update_query = """
                         UPDATE SXATTR_GRP_SOURCE 
                         SET a_event = ? 
                         WHERE ouid = ?
                     """
-                    print(f"[DEBUG] Подготовка SQL для группы: {update_query}")
-                    prep_stmt = self.db_manager.connection.prepareStatement(update_query)
-                    prep_stmt.setInt(1, int(action))
-                    prep_stmt.setInt(2, int(diff['attr_grp_ouid']))
-                    rows = prep_stmt.executeUpdate()
-                    prep_stmt.close()
-                    print(f"[DEBUG] Обновлено строк групп: {rows}")
+                    rows = self.db_manager.execute_update(update_query, [int(action), int(diff['attr_grp_ouid'])])
+                    row_log.debug("Обновлено строк групп: %s", rows)
                     if rows > 0:
                         group_updated += 1
             
             # Обновляем атрибуты в SXATTR_SOURCE
-            print(f"[DEBUG] Обновление атрибутов...")
+            logger.debug("Обновление атрибутов...")
             for i, diff in enumerate(attribute_differences):
                 action = diff.get('exception_action', 0)
-                print(f"[DEBUG] Атрибут {i}, OUID: {diff.get('attr_ouid')}, действие: {action}")
+                row_log.debug("Атрибут %s, OUID: %s, действие: %s", i, diff.get('attr_ouid'), action)
                 if action != 0:  # Только если есть действие
                     update_query = """
                         UPDATE SXATTR_SOURCE 
                         SET a_event = ? 
                         WHERE ouid = ?
                     """
-                    print(f"[DEBUG] Подготовка SQL для атрибута: {update_query}")
-                    prep_stmt = self.db_manager.connection.prepareStatement(update_query)
-                    prep_stmt.setInt(1, int(action))
-                    prep_stmt.setInt(2, int(diff['attr_ouid']))
-                    rows = prep_stmt.executeUpdate()
-                    prep_stmt.close()
-                    print(f"[DEBUG] Обновлено строк атрибутов: {rows}")
+                    rows = self.db_manager.execute_update(update_query, [int(action), int(diff['attr_ouid'])])
+                    row_log.debug("Обновлено строк атрибутов: %s", rows)
                     if rows > 0:
                         attribute_updated += 1
             
-            print(f"[DEBUG] Сохранение завершено: классы={class_updated}, группы={group_updated}, атрибуты={attribute_updated}")
+            row_log.summary('построчных сообщений')
+            logger.debug("Сохранение завершено: классы=%s, группы=%s, атрибуты=%s",
+                         class_updated, group_updated, attribute_updated)
             
             return {
                 "success": True,
@@ -3296,13 +3363,10 @@ class DataService:
             }
             
         except Exception as e:
-            print(f"[DEBUG] ОШИБКА при сохранении: {e}")
-            print(f"[DEBUG] Тип ошибки: {type(e)}")
-            import traceback
-            print(f"[DEBUG] Стек вызовов: {traceback.format_exc()}")
+            logger.exception("Ошибка при сохранении действий: %s", e)
             return {"error": f"Ошибка записи действий: {e}"}
         finally:
-            print(f"[DEBUG] Отключение от БД...")
+            logger.debug("Отключение от БД...")
             self.db_manager.disconnect() 
 
     def migrate_actions_from_minus_one_to_two(self):
@@ -3317,9 +3381,7 @@ class DataService:
                 WHERE action = -1
             """
             
-            prep_stmt = self.db_manager.connection.prepareStatement(update_query)
-            rows_updated = prep_stmt.executeUpdate()
-            prep_stmt.close()
+            rows_updated = self.db_manager.execute_update(update_query, [])
             
             return {
                 "success": True,
@@ -3344,11 +3406,7 @@ class DataService:
                     SET a_event = ?
                     WHERE ouid = ?
                 """
-                prep = self.db_manager.connection.prepareStatement(update_sql)
-                prep.setInt(1, int(a_event))
-                prep.setInt(2, int(attr_ouid))
-                updated = prep.executeUpdate()
-                prep.close()
+                updated = self.db_manager.execute_update(update_sql, [int(a_event), int(attr_ouid)])
 
             return {"success": True, "updated": int(updated)}
         except Exception as e:
@@ -3358,30 +3416,42 @@ class DataService:
 
     def _collect_attribute_ouids_from_result(self, result: Dict[str, Any]) -> List[int]:
         """Вспомогательная: собирает все OUID атрибутов из результата get_attributes()"""
-        ouids: List[int] = []
+        return list(dict.fromkeys(item[0] for item in self._iter_result_attributes(result)))
+
+    def _iter_result_attributes(self, result: Dict[str, Any]):
+        """
+        Вспомогательная: атрибуты результата get_attributes() в порядке результата -
+        (ouid, ouid класса, список, имя класса, описание класса, словарь атрибута);
+        список быстрого режима - fast_mode
+        """
+        def item(attr, list_name, class_name=None, class_description=None):
+            try:
+                ouid = int(attr.get('ouid'))
+            except Exception:
+                return None
+            class_ouid = attr.get('ouidsxclass')
+            class_ouid = int(class_ouid) if class_ouid not in (None, '') else None
+            return ouid, class_ouid, list_name, class_name, class_description, attr
+        
         try:
             # Полный режим с анализом исключений (группировка по классам)
             if result.get('classes'):
-                for _class_name, class_data in result['classes'].items():
+                for class_name, class_data in result['classes'].items():
                     attributes = class_data.get('attributes', {})
-                    for list_name in ('update_list', 'ignore_list', 'no_action_list'):
+                    for list_name in ATTRIBUTE_LISTS:
                         for attr in attributes.get(list_name, []) or []:
-                            try:
-                                ouid = int(attr.get('ouid'))
-                                ouids.append(ouid)
-                            except Exception:
-                                continue
+                            entry = item(attr, list_name, class_data.get('class_name', class_name),
+                                         class_data.get('class_description'))
+                            if entry:
+                                yield entry
             # Быстрый режим
             elif result.get('attributes', {}).get('fast_mode'):
                 for attr in result['attributes']['fast_mode']:
-                    try:
-                        ouids.append(int(attr.get('ouid')))
-                    except Exception:
-                        continue
+                    entry = item(attr, 'fast_mode')
+                    if entry:
+                        yield entry
         except Exception:
-            pass
-        # Уникализируем порядок сохранения
-        return list(dict.fromkeys(ouids))
+            return
 
     def update_attributes_event_by_class(self,
                                          class_ouid: int,
@@ -3520,4 +3590,206 @@ class DataService:
         except Exception as e:
             return {"error": f"Ошибка массового обновления по фильтрам: {e}"}
         finally:
-            self.db_manager.disconnect()
\ No newline at end of file
+            self.db_manager.disconnect()
+
+    # ===== Материализованные выборки атрибутов =====
+
+    def create_selection(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Выборка атрибутов по фильтрам страницы: фильтры и анализ исключений
+        вычисляются один раз, атрибуты сохраняются в БД на SELECTION_TTL секунд вместе
+        с результатом анализа (список, действие, различия). Выгрузка, генерация
+        скриптов и массовое обновление с selection_id читают сохраненный результат и
+        работают с одним набором атрибутов, даже если данные или исключения изменились
+        """
+        filters = {key: filters.get(key) for key in SELECTION_FILTERS}
+        if not filters['analyze_exceptions']:
+            # Вне анализа исключений его фильтры не действуют (как на странице атрибутов)
+            filters.update(analyze_exceptions=False, exception_action_filter=None, source_target_filter=None,
+                           property_filter=None, show_update_actions=True)
+        elif filters['show_update_actions'] is None:
+            filters['show_update_actions'] = True
+        
+        if not self._selection_tables:
+            self._selection_tables = self.db_manager.create_selection_tables()
+            if not self._selection_tables:
+                return {"error": "Таблицы выборок недоступны"}
+        
+        result = self.get_attributes(page=1, per_page=100000, **filters)
+        if 'error' in result:
+            return {"error": result['error']}
+        selection_id = uuid.uuid4().hex
+        items, seen = [], set()
+        for ouid, class_ouid, list_name, class_name, class_description, attr in self._iter_result_attributes(result):
+            if ouid not in seen:
+                seen.add(ouid)
+                items.append([selection_id, ouid, class_ouid, len(items), list_name, class_name, class_description,
+                              json.dumps(attr, ensure_ascii=False, default=str)])
+        
+        ttl = config.performance.selection_ttl
+        try:
+            if not self.db_manager.connect():
+                return {"error": "Ошибка подключения к БД"}
+            with self.db_manager.transaction():
+                # Устаревшие выборки удаляются вместе с элементами (ON DELETE CASCADE)
+                self.db_manager.execute_update(
+                    "DELETE FROM __meta_selection WHERE expires_at <= CURRENT_TIMESTAMP", [])
+                self.db_manager.execute_update(
+                    """
+                    INSERT INTO __meta_selection (id, filters, item_count, expires_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP + ? * INTERVAL '1 second')
+                    """,
+                    [selection_id, json.dumps(filters, ensure_ascii=False), len(items), ttl])
+                if items:
+                    self.db_manager.execute_batch(
+                        """
+                        INSERT INTO __meta_selection_item
+                            (selection_id, ouid, class_ouid, position, list_name, class_name, class_description, data)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """, items)
+            logger.info("✅ Выборка %s: %s атрибутов", selection_id, len(items))
+            return {"success": True, "selection_id": selection_id, "count": len(items), "ttl": ttl,
+                    "filters": filters}
+        except Exception as e:
+            logger.error("Ошибка создания выборки: %s", e)
+            return {"error": f"Ошибка создания выборки: {e}"}
+        finally:
+            self.db_manager.disconnect()
+
+    def get_selection(self, selection_id: str) -> Optional[Dict[str, Any]]:
+        """Действующая выборка: фильтры и число атрибутов; None - нет, истекла или недоступна"""
+        if not selection_id or not _SELECTION_ID.fullmatch(selection_id):
+            return None
+        try:
+            if not self.db_manager.connect():
+                return None
+            rows = self.db_manager.execute_query(
+                """
+                SELECT filters, item_count, created_at, expires_at
+                FROM __meta_selection
+                WHERE id = ? AND expires_at > CURRENT_TIMESTAMP
+                """, [selection_id])
+            if not rows:
+                return None
+            filters, item_count, created_at, expires_at = rows[0]
+            return {
+                'selection_id': selection_id,
+                'filters': json.loads(filters),
+                'count': int(item_count),
+                'created_at': created_at,
+                'expires_at': expires_at
+            }
+        except Exception as e:
+            logger.warning("⚠️ Выборка %s недоступна: %s", selection_id, e)
+            return None
+        finally:
+            self.db_manager.disconnect()
+
+    def _get_selection_attributes(self, selection_id: str, page: int, per_page: int) -> Dict[str, Any]:
+        """
+        Результат get_attributes() из сохраненной выборки (соединение уже получено):
+        атрибуты и результат анализа исключений на момент создания, без повторного
+        анализа; страницы - по классам (анализ) или по атрибутам (быстрый режим)
+        """
+        header = self.db_manager.execute_query(
+            "SELECT filters FROM __meta_selection WHERE id = ? AND expires_at > CURRENT_TIMESTAMP", [selection_id])
+        if not header:
+            return {"error": "Выборка не найдена или устарела"}
+        analyze_exceptions = bool(json.loads(header[0][0]).get('analyze_exceptions'))
+        rows = self.db_manager.execute_query(
+            """
+            SELECT list_name, class_name, class_description, class_ouid, data
+            FROM __meta_selection_item
+            WHERE selection_id = ?
+            ORDER BY position
+            """, [selection_id])
+        
+        per_page = max(1, per_page)
+        offset = (page - 1) * per_page
+        result = {
+            'current_page': page,
+            'per_page': per_page,
+            'has_prev': page > 1,
+            'analyze_exceptions': analyze_exceptions,
+            'selection_id': selection_id
+        }
+        
+        if not analyze_exceptions:
+            attributes = [json.loads(row[4]) for row in rows]
+            total_pages = math.ceil(len(attributes) / per_page) if attributes else 0
+            result.update({
+                'attributes': {'fast_mode': attributes[offset:offset + per_page]},
+                'total_count': len(attributes),
+                'total_classes': 1,
+                'total_pages': total_pages,
+                'has_next': page < total_pages,
+                'statistics': {'total_count': len(attributes)}
+            })
+            return result
+        
+        classes: Dict[str, Dict[str, Any]] = {}
+        for list_name, class_name, class_description, class_ouid, data in rows:
+            class_data = classes.get(class_name)
+            if class_data is None:
+                class_data = classes[class_name] = {
+                    'class_name': class_name,
+                    'class_description': class_description or '',
+                    'class_ouid': int(class_ouid) if class_ouid is not None else None,
+                    'attributes': {name: [] for name in ATTRIBUTE_LISTS}
+                }
+            class_data['attributes'][list_name].append(json.loads(data))
+        
+        class_names = list(classes)
+        total_pages = math.ceil(len(class_names) / per_page) if class_names else 0
+        result.update({
+            'classes': {name: classes[name] for name in class_names[offset:offset + per_page]},
+            'total_count': len(rows),
+            'total_classes': len(class_names),
+            'total_pages': total_pages,
+            'has_next': page < total_pages
+        })
+        return result
+
+    def delete_selection(self, selection_id: str) -> bool:
+        """Удаление выборки до истечения TTL; False - выборки нет"""
+        if not selection_id or not _SELECTION_ID.fullmatch(selection_id):
+            return False
+        try:
+            if not self.db_manager.connect():
+                return False
+            return self.db_manager.execute_update("DELETE FROM __meta_selection WHERE id = ?", [selection_id]) > 0
+        except Exception as e:
+            logger.warning("⚠️ Ошибка удаления выборки %s: %s", selection_id, e)
+            return False
+        finally:
+            self.db_manager.disconnect()
+
+    def update_attributes_event_by_selection(self, selection_id: str,
+                                             class_ouid: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Устанавливает A_EVENT=2 для атрибутов выборки (только класса class_ouid, если задан)
+        одним UPDATE по таблице выборки, без повторного вычисления фильтров
+        """
+        items = QueryBuilder().add("selection_id = ?", selection_id).add_equals(
+            "class_ouid", int(class_ouid) if class_ouid is not None else None)
+        try:
+            if not self.db_manager.connect():
+                return {"error": "Ошибка подключения к БД"}
+            
+            count_query = f"SELECT COUNT(*) FROM __meta_selection_item WHERE {items.where_clause()}"
+            count = int(self.db_manager.execute_query(count_query, items.params)[0][0])
+            if not count:
+                return {"success": True, "updated": 0, "message": "Нет атрибутов для обновления"}
+            
+            update_sql = f"""
+                UPDATE SXATTR_SOURCE SET a_event = 2
+                WHERE ouid IN (SELECT ouid FROM __meta_selection_item WHERE {items.where_clause()})
+            """
+            with self.db_manager.transaction():
+                total_updated = int(self.db_manager.execute_update(update_sql, items.params))
+            
+            return {"success": True, "updated": total_updated, "count": count}
+        except Exception as e:
+            return {"error": f"Ошибка массового обновления по выборке {selection_id}: {e}"}
+        finally:
+            self.db_manager.disconnect()
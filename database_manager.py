@@ -7,19 +7,53 @@ import jpype
 import jpype.imports
 import logging
 import atexit
-from typing import List, Tuple, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple, Any, Optional, Dict, Callable
 from contextlib import contextmanager
 from config import config
+from instrumentation import add_phase, record_error, track_query
+import metrics
+import query_budget
 
 # Глобальная переменная для отслеживания состояния JVM
 _jvm_started = False
+_jvm_lock = threading.Lock()
+_jvm_startup_sec: Optional[float] = None
 
-def initialize_jvm():
+def initialize_jvm(cds_dump_path: str = None):
     """
     Единая инициализация JVM для всех JDBC подключений
     Аналогично export_db_scripts.py
+    
+    cds_dump_path - записать архив AppCDS при завершении JVM (manage.py build-cds)
     """
-    global _jvm_started
+    if _jvm_started and jpype.isJVMStarted():
+        return True
+    
+    # Соединения теперь открываются из разных потоков - стартуем JVM один раз
+    with _jvm_lock:
+        return _start_jvm(cds_dump_path)
+
+def _jvm_args(classpath: str, cds_dump_path: str = None) -> List[str]:
+    """Параметры запуска JVM: профиль из config.jvm и архив AppCDS"""
+    args = [f"-Djava.class.path={classpath}", *config.jvm.options()]
+    if cds_dump_path:
+        # Динамический архив классов, загруженных до завершения JVM (JDK 13+)
+        args.append(f"-XX:ArchiveClassesAtExit={cds_dump_path}")
+    elif config.jvm.use_cds and os.path.exists(config.jvm.cds_archive):
+        # Несовместимый архив (другая JDK или classpath) JVM просто игнорирует
+        args += [f"-XX:SharedArchiveFile={config.jvm.cds_archive}", "-Xshare:auto"]
+    return args
+
+def jvm_startup_time() -> Optional[float]:
+    """Время запуска JVM в секундах (None если JVM не запускалась)"""
+    return _jvm_startup_sec
+
+def _start_jvm(cds_dump_path: str = None):
+    """Запуск JVM (вызывается под _jvm_lock)"""
+    global _jvm_started, _jvm_startup_sec
     
     if _jvm_started and jpype.isJVMStarted():
         return True
@@ -72,21 +106,15 @@ def initialize_jvm():
                     logger.error(f"❌ JVM файл не найден: {jvm_path}")
                     return False
                 
-                # Оптимизированные параметры JVM для M2 Mac
-                jvm_args = [
-                    f"-Djava.class.path={classpath}",
-                    "-Xmx1024m",  # Ограничиваем память
-                    "-Xms256m",   # Начальная память
-                    "-XX:+UseG1GC",  # Используем G1 сборщик мусора
-                    "-XX:MaxGCPauseMillis=200",
-                    "-Djava.awt.headless=true",  # Без GUI
-                    "-XX:+UnlockExperimentalVMOptions",  # Для M2 совместимости
-                    "-XX:+UseZGC" if hasattr(jpype, '_hasFeature') else "-XX:+UseG1GC"  # ZGC для новых версий
-                ]
+                jvm_args = _jvm_args(classpath, cds_dump_path)
+                logger.info(f"🔧 Профиль JVM: {config.jvm.profile}, параметры: {' '.join(jvm_args[1:])}")
                 
-                # Запускаем JVM с оптимизированными параметрами
+                started = time.perf_counter()
                 jpype.startJVM(jvm_path, *jvm_args, convertStrings=False)
-                logger.info("✅ JVM запущена успешно")
+                _jvm_startup_sec = time.perf_counter() - started
+                
+                cds = any(arg.startswith('-XX:SharedArchiveFile') for arg in jvm_args)
+                logger.info(f"✅ JVM запущена за {_jvm_startup_sec:.2f} сек (AppCDS: {'да' if cds else 'нет'})")
                 
                 # Регистрируем shutdown при выходе из приложения
                 atexit.register(shutdown_jvm)
@@ -102,6 +130,10 @@ def initialize_jvm():
         logger.error(f"❌ Ошибка инициализации JVM: {e}")
         return False
 
+def is_jvm_started() -> bool:
+    """Запущена ли JVM (без попытки запуска)"""
+    return _jvm_started and jpype.isJVMStarted()
+
 def shutdown_jvm():
     """Безопасное завершение JVM"""
     global _jvm_started
@@ -110,140 +142,577 @@ def shutdown_jvm():
     
     try:
         if jpype.isJVMStarted():
+            close_pools()
             jpype.shutdownJVM()
             logger.info("JVM завершена")
         _jvm_started = False
     except Exception as e:
         logger.warning(f"Предупреждение при завершении JVM: {e}")
 
-class DatabaseManager:
-    """Базовый класс для работы с БД через JDBC"""
+class PooledConnection:
+    """JDBC соединение пула вместе с кэшем подготовленных запросов"""
+    
+    def __init__(self, connection, statement_cache_size: int):
+        self.connection = connection
+        self.statement_cache_size = max(0, statement_cache_size)
+        self.statements = OrderedDict()  # SQL -> PreparedStatement (LRU)
+        self.last_used = time.monotonic()
+    
+    def prepare(self, query: str):
+        """Получение PreparedStatement из кэша или подготовка нового"""
+        statement = self.statements.get(query)
+        if statement is not None:
+            self.statements.move_to_end(query)
+            metrics.cache_hit('statements')
+            return statement
+        
+        metrics.cache_miss('statements')
+        statement = self.connection.prepareStatement(query)
+        if self.statement_cache_size:
+            self.statements[query] = statement
+            # Вытесняем самый давно использованный запрос
+            while len(self.statements) > self.statement_cache_size:
+                _, evicted = self.statements.popitem(last=False)
+                self._close_statement(evicted)
+                metrics.cache_eviction('statements')
+        return statement
+    
+    def is_usable(self, validation_interval: int) -> bool:
+        """Проверка соединения перед выдачей из пула"""
+        try:
+            if self.connection.isClosed():
+                return False
+            # Долго простаивавшее соединение проверяем запросом к серверу
+            if time.monotonic() - self.last_used > validation_interval:
+                return bool(self.connection.isValid(2))
+            return True
+        except Exception:
+            return False
+    
+    def reset(self):
+        """Возврат соединения в исходное состояние перед возвратом в пул"""
+        if not self.connection.getAutoCommit():
+            self.connection.rollback()
+            self.connection.setAutoCommit(True)
+    
+    def close(self):
+        """Закрытие всех подготовленных запросов и самого соединения"""
+        for statement in self.statements.values():
+            self._close_statement(statement)
+        self.statements.clear()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _close_statement(statement):
+        try:
+            statement.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Пул соединений для одной БД
+    Соединения переиспользуются между запросами, поэтому кэш
+    подготовленных запросов живет дольше одного вызова DataService
+    
+    open_connection - функция, открывающая новое соединение пула; соединение
+    должно иметь last_used, is_usable(), reset() и close() (см. PooledConnection)
+    """
+    
+    # Соединение, простаивавшее дольше (сек), проверяется запросом к серверу
+    VALIDATION_INTERVAL = 30
+    
+    def __init__(self, open_connection: Callable[[], Any], max_size: int, timeout: int, name: str = 'db'):
+        self.open_connection = open_connection
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._idle: List[Any] = []
+        self._size = 0  # Всего открытых соединений (свободные + выданные)
+        self._condition = threading.Condition()
+    
+    def acquire(self):
+        """Получение соединения; ждет освобождения не дольше timeout секунд"""
+        started = time.perf_counter()
+        pooled = self._acquire()
+        metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, self.name)
+        return pooled
+    
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    if pooled.is_usable(self.VALIDATION_INTERVAL):
+                        return pooled
+                    pooled.close()
+                    self._size -= 1
+                    continue
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(f"Нет свободных соединений в пуле (размер {self.max_size})")
+                self._condition.wait(remaining)
+        
+        # Новое соединение открываем вне блокировки
+        try:
+            return self.open_connection()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+    
+    def release(self, pooled):
+        """Возврат соединения в пул"""
+        try:
+            pooled.reset()
+        except Exception:
+            self.discard(pooled)
+            return
+        
+        pooled.last_used = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+    
+    def discard(self, pooled):
+        """Закрытие сломанного соединения без возврата в пул"""
+        pooled.close()
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+    
+    def stats(self) -> Dict[str, int]:
+        """Состояние пула без обращения к БД"""
+        with self._condition:
+            idle = len(self._idle)
+            return {'size': self._size, 'idle': idle, 'in_use': self._size - idle, 'max_size': self.max_size}
+    
+    def close_all(self):
+        """Закрытие всех свободных соединений"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for pooled in idle:
+            pooled.close()
+
+
+# Пулы соединений по ключу подключения (один пул на БД и драйвер в процессе)
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(key: Tuple, open_connection: Callable[[], Any]) -> ConnectionPool:
+    """Получение (или создание) пула соединений по ключу подключения"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                open_connection,
+                max_size=config.performance.connection_pool_size,
+                timeout=config.performance.connection_pool_timeout,
+                # Ключ заканчивается (database, username) у всех backend'ов
+                name=f"{key[0]}:{key[-2]}"
+            )
+            _pools[key] = pool
+        return pool
+
+def _pool_samples():
+    """Состояние всех пулов для /metrics"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        stats = pool.stats()
+        for state in ('in_use', 'idle', 'max_size'):
+            yield (pool.name, state), stats[state]
+
+metrics.register_gauge('metarep_db_pool_connections', 'Соединения пулов (in_use, idle, max_size)',
+                       ('pool', 'state'), _pool_samples)
+
+def close_pools():
+    """Закрытие всех пулов (перед остановкой JVM)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+class JDBCListener:
+    """LISTEN на отдельном соединении вне пула (держится все время работы процесса)"""
+    
+    def __init__(self, connection, channel: str):
+        from org.postgresql import PGConnection
+        
+        self.connection = connection
+        statement = connection.createStatement()
+        try:
+            statement.execute(f"LISTEN {channel}")
+        finally:
+            statement.close()
+        self._pg_connection = connection.unwrap(PGConnection)
+    
+    def poll(self, timeout: float) -> List[str]:
+        """Данные уведомлений; ждет не дольше timeout секунд (исключение при обрыве)"""
+        notifications = self._pg_connection.getNotifications(max(1, int(timeout * 1000)))
+        if notifications is None:
+            return []
+        return [str(notification.getParameter()) for notification in notifications]
+    
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class JDBCBackend:
+    """
+    Выполнение запросов через JPype и JDBC драйвер
+    Соединение выдается из пула отдельно каждому потоку
+    """
+    
+    name = 'jdbc'
     
     def __init__(self, db_config):
         self.db_config = db_config
-        self.connection = None
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._local = threading.local()
+        self._running: Dict[int, Any] = {}  # Выполняющийся Statement по потокам (для cancel)
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        key = (self.name, self.db_config.jdbc_url_template, self.db_config.host,
+               self.db_config.port, self.db_config.database, self.db_config.username)
+        return get_pool(key, self._open_connection)
+    
+    @property
+    def connection(self):
+        """JDBC соединение текущего потока (None если не подключены)"""
+        pooled = getattr(self._local, 'pooled', None)
+        return pooled.connection if pooled else None
+    
+    def connect(self):
+        """Получение соединения из пула (исключение при ошибке)"""
+        # Инициализируем JVM если еще не запущена
+        if not initialize_jvm():
+            raise Exception("Не удалось запустить JVM")
+        self._local.pooled = self.pool.acquire()
+    
+    def disconnect(self):
+        """Возврат соединения текущего потока в пул"""
+        pooled = getattr(self._local, 'pooled', None)
+        if pooled:
+            self._local.pooled = None
+            self.pool.release(pooled)
+    
+    def discard(self):
+        """Выбрасывание сломанного соединения текущего потока"""
+        pooled = getattr(self._local, 'pooled', None)
+        if pooled:
+            self._local.pooled = None
+            self.pool.discard(pooled)
+    
+    def is_connection_error(self, error: Exception) -> bool:
+        # "canceling statement due to statement timeout" - отмена, а не обрыв соединения
+        if query_budget.is_cancellation(error):
+            return False
+        error_msg = str(error).lower()
+        return any(keyword in error_msg for keyword in ['connection', 'socket', 'timeout', 'backend'])
+    
+    def cancel(self, thread_id: int) -> bool:
+        """Отмена SQL запроса, выполняющегося в потоке thread_id (вызывается из другого потока)"""
+        statement = self._running.get(thread_id)
+        if statement is None:
+            return False
+        statement.cancel()
+        return True
+    
+    @contextmanager
+    def _executing(self, statement):
+        """Statement выполняется в текущем потоке: таймаут запроса и регистрация для cancel()"""
+        statement.setQueryTimeout(query_budget.statement_timeout(self.db_config.query_timeout))
+        thread_id = threading.get_ident()
+        self._running[thread_id] = statement
+        try:
+            yield
+        finally:
+            self._running.pop(thread_id, None)
+    
+    def query(self, query: str, params: Optional[List]) -> List[List]:
+        """Одно выполнение SELECT запроса на текущем соединении"""
+        if params is None:
+            # Динамический SQL без параметров - обычный Statement без кэширования
+            statement = self.connection.createStatement()
+            try:
+                with self._executing(statement):
+                    started = time.perf_counter()
+                    result_set = statement.executeQuery(query)
+                    add_phase('execute', time.perf_counter() - started)
+                    try:
+                        return self._fetch_rows(result_set)
+                    finally:
+                        result_set.close()
+            finally:
+                statement.close()
+        
+        started = time.perf_counter()
+        statement = self._prepare(query, params)
+        prepared = time.perf_counter()
+        with self._executing(statement):
+            result_set = statement.executeQuery()
+            add_phase('prepare', prepared - started)
+            add_phase('execute', time.perf_counter() - prepared)
+            try:
+                return self._fetch_rows(result_set)
+            finally:
+                result_set.close()
+    
+    def update(self, query: str, params: Optional[List]) -> int:
+        """Выполнение INSERT/UPDATE/DELETE запроса"""
+        if params is None:
+            statement = self.connection.createStatement()
+            try:
+                with self._executing(statement):
+                    return int(statement.executeUpdate(query))
+            finally:
+                statement.close()
+        
+        statement = self._prepare(query, params)
+        with self._executing(statement):
+            return int(statement.executeUpdate())
+    
+    def batch(self, query: str, rows: List[List], batch_size: int) -> int:
+        """Пакетное выполнение (addBatch/executeBatch) порциями по batch_size"""
+        total = 0
+        for i in range(0, len(rows), batch_size):
+            statement = self._local.pooled.prepare(query)
+            for row in rows[i:i + batch_size]:
+                statement.clearParameters()
+                self._bind_params(statement, row)
+                statement.addBatch()
+            with self._executing(statement):
+                # Отрицательные значения (SUCCESS_NO_INFO) не учитываем
+                total += sum(int(count) for count in statement.executeBatch() if count > 0)
+        return total
+    
+    def begin(self):
+        self.connection.setAutoCommit(False)
+    
+    def commit(self):
+        self.connection.commit()
+    
+    def rollback(self):
+        self.connection.rollback()
+    
+    def end_transaction(self):
+        self.connection.setAutoCommit(True)
+    
+    def open_listener(self, channel: str) -> JDBCListener:
+        """Отдельное соединение с LISTEN channel (для invalidation.py)"""
+        if not initialize_jvm():
+            raise Exception("Не удалось запустить JVM")
+        return JDBCListener(self._open_connection().connection, channel)
+    
+    def _open_connection(self) -> PooledConnection:
+        """Открытие нового физического соединения"""
+        from java.sql import DriverManager
+        from java.util import Properties
+        
+        jdbc_url = self.db_config.jdbc_url_template.format(
+            host=self.db_config.host,
+            port=self.db_config.port,
+            database=self.db_config.database
+        )
+        
+        self.logger.info(f"JDBC URL: {jdbc_url}")
+        self.logger.info(f"User: {self.db_config.username}")
+        self.logger.info(f"Database: {self.db_config.database}")
+        
+        properties = Properties()
+        properties.setProperty('user', self.db_config.username)
+        properties.setProperty('password', self.db_config.password)
+        if self.db_config.prepare_threshold is not None:
+            # Серверная подготовка запросов драйвером PostgreSQL
+            properties.setProperty('prepareThreshold', str(self.db_config.prepare_threshold))
+        
+        started = time.perf_counter()
+        connection = DriverManager.getConnection(jdbc_url, properties)
+        self.logger.info(f"✅ JDBC соединение установлено успешно за {time.perf_counter() - started:.2f} сек")
+        return PooledConnection(connection, config.performance.statement_cache_size)
+    
+    def _prepare(self, query: str, params: List):
+        """PreparedStatement из кэша соединения с привязанными параметрами"""
+        statement = self._local.pooled.prepare(query)
+        statement.clearParameters()
+        self._bind_params(statement, params)
+        return statement
+    
+    @staticmethod
+    def _bind_params(statement, params: List):
+        """Привязка Python значений к параметрам PreparedStatement"""
+        from java.sql import Types
+        
+        for index, value in enumerate(params, 1):
+            if value is None:
+                statement.setNull(index, Types.NULL)
+            elif isinstance(value, bool):
+                statement.setBoolean(index, value)
+            elif isinstance(value, int):
+                if -2**31 <= value < 2**31:
+                    statement.setInt(index, value)
+                else:
+                    statement.setLong(index, value)
+            elif isinstance(value, float):
+                statement.setDouble(index, value)
+            else:
+                statement.setString(index, str(value))
+    
+    @classmethod
+    def _fetch_rows(cls, result_set) -> List[List]:
+        """Чтение ResultSet в список строк (значения приводятся к str)"""
+        # Получаем метаданные для определения количества колонок
+        column_count = result_set.getMetaData().getColumnCount()
+        
+        # Собираем результаты; время чтения из драйвера и конвертации в str считаем отдельно
+        results = []
+        fetch_time = convert_time = 0.0
+        while True:
+            started = time.perf_counter()
+            has_row = result_set.next()
+            fetched = time.perf_counter()
+            fetch_time += fetched - started
+            if not has_row:
+                break
+            results.append(cls._read_row(result_set, column_count))
+            convert_time += time.perf_counter() - fetched
+        add_phase('fetch', fetch_time)
+        add_phase('convert', convert_time)
+        return results
+    
+    @staticmethod
+    def _read_row(result_set, column_count: int) -> List:
+        """Текущая строка ResultSet; Java объекты конвертируются в str"""
+        row = []
+        for i in range(1, column_count + 1):
+            value = result_set.getObject(i)
+            if value is not None:
+                if hasattr(value, 'toString'):
+                    row.append(str(value.toString()))
+                else:
+                    row.append(str(value))
+            else:
+                row.append(None)
+        return row
+
+
+def create_backend(name: str, db_config):
+    """Создание backend'а выполнения запросов по имени из конфигурации"""
+    if name == 'jdbc':
+        return JDBCBackend(db_config)
+    if name == 'psycopg':
+        # Необязательная зависимость: JVM не нужна, но нужен пакет psycopg
+        try:
+            from psycopg_backend import PsycopgBackend
+        except ImportError as e:
+            raise RuntimeError(f"DB_BACKEND=psycopg требует пакет psycopg: pip install \"psycopg[binary]\" ({e})")
+        return PsycopgBackend(db_config)
+    if name == 'broker':
+        # Запросы выполняет отдельный процесс с JVM (manage.py broker)
+        from db_broker import BrokerBackend
+        return BrokerBackend(db_config)
+    raise ValueError(f"Неизвестный backend БД: {name} (ожидается jdbc, psycopg или broker)")
+
+
+class DatabaseManager:
+    """
+    Базовый класс для работы с БД
+    Запросы выполняются через backend (JDBC по умолчанию или psycopg),
+    во всех backend'ах параметры обозначаются ? и строки возвращаются списками str
+    """
+    
+    def __init__(self, db_config, backend: str = None):
+        self.db_config = db_config
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.backend = create_backend(backend or db_config.backend, db_config)
+        self._local = threading.local()
+        self._data_version_table = False  # Найдена ли __meta_data_version (get_data_version)
+    
+    @property
+    def connection(self):
+        """Соединение текущего потока (None если не подключены)"""
+        return self.backend.connection
+    
+    def pool_stats(self) -> Dict[str, int]:
+        """Состояние пула соединений backend'а"""
+        return self.backend.pool.stats()
+    
+    def open_listener(self, channel: str):
+        """
+        Подписка на NOTIFY channel на отдельном соединении: объект с poll(timeout)
+        (список данных уведомлений) и close()
+        """
+        return self.backend.open_listener(channel)
         
     def connect(self) -> bool:
-        """Установка соединения с БД"""
+        """Получение соединения с БД из пула (повторный вызов переиспользует текущее)"""
+        if self.connection is not None:
+            return True
+        
         try:
-            # Инициализируем JVM если еще не запущена
-            if not initialize_jvm():
-                return False
-            
-            # Импортируем Java классы
-            from java.sql import DriverManager, SQLException
-            
-            # Формируем JDBC URL
-            jdbc_url = self.db_config.jdbc_url_template.format(
-                host=self.db_config.host,
-                port=self.db_config.port,
-                database=self.db_config.database
-            )
-            
-            self.logger.info(f"JDBC URL: {jdbc_url}")
-            self.logger.info(f"User: {self.db_config.username}")
-            self.logger.info(f"Database: {self.db_config.database}")
-            
-            # Создаем соединение с таймаутами
-            connection_properties = {
-                'user': self.db_config.username,
-                'password': self.db_config.password,
-                'connectTimeout': str(self.db_config.connection_timeout * 1000),  # В миллисекундах
-                'socketTimeout': str(self.db_config.query_timeout * 1000)
-            }
-            
-            # Создаем соединение
-            self.connection = DriverManager.getConnection(jdbc_url, self.db_config.username, self.db_config.password)
-            
-            self.logger.info("✅ JDBC соединение установлено успешно!")
+            self.backend.connect()
             return True
-            
         except Exception as e:
+            record_error()
             self.logger.error(f"❌ Ошибка подключения к БД: {e}")
             return False
     
     def disconnect(self):
-        """Закрытие соединения с БД"""
-        if self.connection:
-            try:
-                self.connection.close()
-                self.logger.info("Соединение с БД закрыто")
-            except Exception as e:
-                self.logger.error(f"Ошибка закрытия соединения: {e}")
-            finally:
-                self.connection = None
+        """Возврат соединения текущего потока в пул"""
+        try:
+            self.backend.disconnect()
+            self.logger.debug("Соединение возвращено в пул")
+        except Exception as e:
+            self.logger.error(f"Ошибка возврата соединения в пул: {e}")
     
     def execute_query(self, query: str, params: List = None) -> List[List]:
-        """Выполнение запроса с возвращением результата"""
+        """
+        Выполнение запроса с возвращением результата
+        
+        params - значения для плейсхолдеров ?; если переданы (хотя бы пустой список),
+        запрос выполняется как подготовленный (кэшируется на соединении)
+        """
+        captured = getattr(self._local, 'captured', None)
+        if captured is not None:
+            captured.append((query, None if params is None else list(params)))
+        
         if self.connection is None:
             if not self.connect():
                 raise Exception("Не удалось установить соединение с БД")
         
         try:
-            statement = self.connection.createStatement()
-            result_set = statement.executeQuery(query)
-            
-            # Получаем метаданные для определения количества колонок
-            metadata = result_set.getMetaData()
-            column_count = metadata.getColumnCount()
-            
-            # Собираем результаты
-            results = []
-            while result_set.next():
-                row = []
-                for i in range(1, column_count + 1):
-                    value = result_set.getObject(i)
-                    if value is not None:
-                        # Конвертируем Java объекты в Python
-                        if hasattr(value, 'toString'):
-                            row.append(str(value.toString()))
-                        else:
-                            row.append(str(value))
-                    else:
-                        row.append(None)
-                results.append(row)
-            
-            result_set.close()
-            statement.close()
-            return results
+            return self._run_query(query, params)
             
         except Exception as e:
+            # Отмененный запрос (бюджет времени, уход клиента) не повторяем
+            if query_budget.is_cancellation(e):
+                self.logger.debug("Запрос отменен: %s", e)
+                raise query_budget.cancellation_error(e) from e
             # Проверяем не потеряно ли соединение
-            error_msg = str(e)
-            if any(keyword in error_msg.lower() for keyword in ['connection', 'socket', 'timeout', 'backend']):
+            if self.backend.is_connection_error(e):
                 self.logger.warning(f"Обнаружена ошибка соединения: {e}. Попытка переподключения...")
-                self.connection = None
+                self.backend.discard()
                 # Пытаемся переподключиться и повторить запрос
                 if self.connect():
                     self.logger.info("Переподключение успешно, повторяем запрос")
                     try:
-                        statement = self.connection.createStatement()
-                        result_set = statement.executeQuery(query)
-                        
-                        # Получаем метаданные для определения количества колонок
-                        metadata = result_set.getMetaData()
-                        column_count = metadata.getColumnCount()
-                        
-                        # Собираем результаты
-                        results = []
-                        while result_set.next():
-                            row = []
-                            for i in range(1, column_count + 1):
-                                value = result_set.getObject(i)
-                                if value is not None:
-                                    # Конвертируем Java объекты в Python
-                                    if hasattr(value, 'toString'):
-                                        row.append(str(value.toString()))
-                                    else:
-                                        row.append(str(value))
-                                else:
-                                    row.append(None)
-                            results.append(row)
-                        
-                        result_set.close()
-                        statement.close()
-                        return results
+                        return self._run_query(query, params)
                     except Exception as retry_error:
                         self.logger.error(f"Ошибка при повторном выполнении запроса: {retry_error}")
                         raise retry_error
@@ -254,28 +723,63 @@ class DatabaseManager:
                 self.logger.error(f"Ошибка выполнения запроса: {e}")
                 raise e
     
-    def execute_update(self, query: str) -> int:
-        """Выполнение INSERT/UPDATE/DELETE запроса"""
+    def _run_query(self, query: str, params: Optional[List]) -> List[List]:
+        """Выполнение запроса через backend с замером времени (instrumentation)"""
+        with query_budget.running(self.backend), track_query(query, params) as tracker:
+            rows = self.backend.query(query, params)
+            tracker['rows'] = len(rows)
+        return rows
+    
+    def execute_update(self, query: str, params: List = None) -> int:
+        """Выполнение INSERT/UPDATE/DELETE запроса (params - как в execute_query)"""
         if not self.connection:
             raise Exception("Нет соединения с БД")
         
         try:
-            statement = self.connection.createStatement()
-            
-            # Устанавливаем таймауты
-            statement.setQueryTimeout(self.db_config.query_timeout)
-            
-            affected_rows = statement.executeUpdate(query)
-            
-            self.logger.info(f"Выполнен запрос, затронуто {affected_rows} строк")
-            
-            statement.close()
+            with query_budget.running(self.backend), track_query(query, params) as tracker:
+                affected_rows = self.backend.update(query, params)
+                tracker['rows'] = affected_rows
+            self.logger.debug("Выполнен запрос, затронуто %s строк", affected_rows)
             return affected_rows
             
         except Exception as e:
+            if query_budget.is_cancellation(e):
+                raise query_budget.cancellation_error(e) from e
             self.logger.error(f"Ошибка выполнения запроса: {e}")
             raise
     
+    def execute_batch(self, query: str, rows: List[List]) -> int:
+        """
+        Пакетное выполнение INSERT/UPDATE
+        Размер пакета - config.performance.batch_size; возвращает число затронутых
+        строк, если драйвер его сообщает
+        """
+        if not self.connection:
+            raise Exception("Нет соединения с БД")
+        
+        try:
+            with query_budget.running(self.backend), \
+                    track_query(query, [f"пакет из {len(rows)} строк"]) as tracker:
+                tracker['rows'] = self.backend.batch(query, rows, max(1, config.performance.batch_size))
+        except Exception as e:
+            if query_budget.is_cancellation(e):
+                raise query_budget.cancellation_error(e) from e
+            raise
+        return tracker['rows']
+    
+    @contextmanager
+    def capture_queries(self):
+        """
+        Запись всех SELECT запросов текущего потока (текст и параметры)
+        Используется manage.py explain для получения реальных запросов приложения
+        """
+        captured: List[Tuple[str, Optional[List]]] = []
+        self._local.captured = captured
+        try:
+            yield captured
+        finally:
+            self._local.captured = None
+    
     @contextmanager
     def transaction(self):
         """Контекстный менеджер для транзакций"""
@@ -283,16 +787,16 @@ class DatabaseManager:
             raise Exception("Нет соединения с БД")
         
         try:
-            self.connection.setAutoCommit(False)
+            self.backend.begin()
             yield
-            self.connection.commit()
+            self.backend.commit()
             self.logger.info("Транзакция зафиксирована")
         except Exception as e:
-            self.connection.rollback()
+            self.backend.rollback()
             self.logger.error(f"Транзакция отменена: {e}")
             raise
         finally:
-            self.connection.setAutoCommit(True)
+            self.backend.end_transaction()
 
     def create_meta_statistic_table(self):
         """Создание таблицы исключений если не существует"""
@@ -313,133 +817,336 @@ class DatabaseManager:
             if not self.connect():
                 return False
                 
-            statement = self.connection.createStatement()
-            statement.execute(create_query)
-            statement.close()
+            self.execute_update(create_query)
             return True
             
         except Exception as e:
-            print(f"Ошибка создания таблицы __meta_statistic: {e}")
+            self.logger.error("Ошибка создания таблицы __meta_statistic: %s", e)
             return False
         finally:
             self.disconnect()
 
-    def init_exceptions_data(self, force_reload=False):
-        """Инициализация данных исключений из файлов"""
-        import os
-        
-        # Проверяем есть ли уже данные
-        if not force_reload:
-            check_query = "SELECT COUNT(*) FROM __meta_statistic"
-            try:
-                if not self.connect():
-                    return False
-                result = self.execute_query(check_query)
-                if result and int(result[0][0]) > 0:
-                    print("Данные исключений уже загружены")
-                    return True
-            except Exception as e:
-                print(f"Ошибка проверки данных: {e}")
-            finally:
-                self.disconnect()
-        
-        # Файлы исключений
-        files_mapping = {
-            'class': 'исключения классо.md',
-            'group': 'исключения групп.md', 
-            'attribute': 'исключение атрибутов.md'
-        }
+    def create_selection_tables(self) -> bool:
+        """
+        Таблицы материализованных выборок атрибутов (DataService.create_selection)
+        UNLOGGED: временные данные с TTL, без записи в WAL; после сбоя сервера пустеют
+        """
+        queries = [
+            """
+            CREATE UNLOGGED TABLE IF NOT EXISTS __meta_selection (
+                id VARCHAR(32) PRIMARY KEY,
+                filters TEXT NOT NULL,
+                item_count INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL
+            )
+            """,
+            """
+            CREATE UNLOGGED TABLE IF NOT EXISTS __meta_selection_item (
+                selection_id VARCHAR(32) NOT NULL REFERENCES __meta_selection(id) ON DELETE CASCADE,
+                ouid BIGINT NOT NULL,
+                class_ouid BIGINT,
+                position INTEGER NOT NULL,
+                list_name VARCHAR(20) NOT NULL,
+                class_name TEXT,
+                class_description TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (selection_id, ouid)
+            )
+            """,
+        ]
+
+        try:
+            if not self.connect():
+                return False
+
+            for query in queries:
+                self.execute_update(query)
+            return True
+
+        except Exception as e:
+            self.logger.error("Ошибка создания таблиц выборок: %s", e)
+            return False
+        finally:
+            self.disconnect()
+
+    def create_search_indexes(self) -> bool:
+        """
+        Создание триграммных GIN индексов для поиска по name/title/description
+        Требует расширения pg_trgm (создается, если у пользователя есть права)
+        """
+        from query_builder import SEARCH_INDEXES, search_expression
         
         try:
             if not self.connect():
                 return False
-                
-            # Очищаем таблицу при force_reload
-            if force_reload:
-                statement = self.connection.createStatement()
-                statement.execute("DELETE FROM __meta_statistic")
-                statement.close()
             
-            for entity_type, filename in files_mapping.items():
-                if os.path.exists(filename):
-                    self._load_exceptions_from_file(filename, entity_type)
-                    
+            self.execute_update("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for table, (index_name, columns) in SEARCH_INDEXES.items():
+                self.execute_update(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} "
+                    f"USING gin (({search_expression(columns)}) gin_trgm_ops)"
+                )
             return True
             
         except Exception as e:
-            print(f"Ошибка инициализации данных исключений: {e}")
+            self.logger.error("Ошибка создания индексов поиска: %s", e)
             return False
         finally:
             self.disconnect()
     
-    def _load_exceptions_from_file(self, filename, entity_type):
-        """Загрузка исключений из файла"""
+    def has_search_indexes(self) -> Optional[bool]:
+        """Проверка наличия всех триграммных индексов поиска; None - проверить не удалось"""
+        from query_builder import SEARCH_INDEXES
+        
+        index_names = [index_name for index_name, _ in SEARCH_INDEXES.values()]
+        query = f"""
+            SELECT COUNT(*) FROM pg_indexes
+            WHERE indexname IN ({', '.join('?' for _ in index_names)})
+        """
+        
+        # Не отдаем соединение в пул, если его взял вызывающий код
+        was_connected = self.connection is not None
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            # Пропускаем заголовок
-            for line in lines[1:]:
-                line = line.strip()
-                if not line:
+            if not was_connected and not self.connect():
+                return None
+            result = self.execute_query(query, index_names)
+            return bool(result) and int(result[0][0]) == len(index_names)
+        except Exception as e:
+            self.logger.warning(f"Не удалось проверить индексы поиска: {e}")
+            return None
+        finally:
+            if not was_connected:
+                self.disconnect()
+
+    # Таблицы, от которых зависят страницы и API: любое изменение увеличивает версию данных
+    DATA_VERSION_TABLES = (
+        'sxclass_source', 'sxattr_grp_source', 'sxattr_source',
+        'sxclass', 'sxattr_grp', 'sxattr', 'sxdatatype', '__meta_statistic',
+    )
+    # Канал NOTIFY об изменениях: данные уведомления - имя таблицы (invalidation.py)
+    DATA_CHANGE_CHANNEL = 'metarep_data_changed'
+
+    def create_data_version_tracking(self) -> List[str]:
+        """
+        Таблица __meta_data_version (одна строка) и триггеры уровня оператора на
+        DATA_VERSION_TABLES: INSERT/UPDATE/DELETE/TRUNCATE увеличивают version в той же
+        транзакции и отправляют NOTIFY в DATA_CHANGE_CHANNEL (доставляется после
+        коммита, одинаковые уведомления транзакции PostgreSQL объединяет). Так
+        учитываются и изменения в обход приложения (повторный импорт источника,
+        ручные правки). Возвращает таблицы с триггерами; отсутствующие таблицы пропускаются
+        """
+        tracked = []
+        try:
+            if not self.connect():
+                return tracked
+
+            self.execute_update("""
+                CREATE TABLE IF NOT EXISTS __meta_data_version (
+                    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                    version BIGINT NOT NULL DEFAULT 1,
+                    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self.execute_update("INSERT INTO __meta_data_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING")
+            self.execute_update(f"""
+                CREATE OR REPLACE FUNCTION __meta_bump_data_version() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE __meta_data_version SET version = version + 1, changed_at = CURRENT_TIMESTAMP
+                    WHERE id = 1;
+                    PERFORM pg_notify('{self.DATA_CHANGE_CHANNEL}', TG_TABLE_NAME);
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+
+            existing = {row[0] for row in self.execute_query(
+                f"SELECT tablename FROM pg_tables WHERE tablename IN "
+                f"({', '.join('?' for _ in self.DATA_VERSION_TABLES)})",
+                list(self.DATA_VERSION_TABLES))}
+            for table in self.DATA_VERSION_TABLES:
+                if table not in existing:
+                    self.logger.warning("Таблица %s не найдена - ее изменения не меняют версию данных", table)
                     continue
-                    
-                parts = line.split('\t')
-                if len(parts) >= 3:
-                    attr_title = parts[0].strip()
-                    attr_name = parts[1].strip()
-                    # Третья колонка attr_map игнорируется для исключений
-                    
-                    # Определяем действие по умолчанию
-                    default_action = 0  # По умолчанию - игнорировать
-                    
-                    # Для атрибутов устанавливаем действие "обновить" для важных свойств
-                    if entity_type == 'attribute':
-                        # Свойства которые должны обновляться
-                        update_properties = [
-                            'readOnly', 'visible', 'informs', 'grp', 'title', 'description',
-                            'refClass', 'refAttr', 'defValue', 'length', 'mandatory',
-                            'calculated', 'guid', 'hierarchy', 'cascade'
-                        ]
-                        
-                        if attr_name in update_properties:
-                            default_action = 2  # Обновить
-                    
-                    # Используем простой INSERT с WHERE NOT EXISTS для избежания дубликатов
-                    insert_query = """
-                        INSERT INTO __meta_statistic (entity_type, entity_name, property_name, action)
-                        SELECT ?, ?, ?, ?
-                        WHERE NOT EXISTS (
-                            SELECT 1 FROM __meta_statistic 
-                            WHERE entity_type = ? AND entity_name = ? AND property_name = ?
-                        )
-                    """
-                    
+                # CREATE OR REPLACE TRIGGER есть только с PostgreSQL 14
+                trigger = f"{table.strip('_')}_data_version"
+                self.execute_update(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+                self.execute_update(
+                    f"CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+                    f"FOR EACH STATEMENT EXECUTE PROCEDURE __meta_bump_data_version()"
+                )
+                tracked.append(table)
+            return tracked
+
+        except Exception as e:
+            self.logger.error("Ошибка создания отслеживания версии данных: %s", e)
+            return tracked
+        finally:
+            self.disconnect()
+
+    def get_data_version(self) -> Optional[str]:
+        """Текущая версия данных (__meta_data_version); None - таблица не создана"""
+        was_connected = self.connection is not None
+        try:
+            if not was_connected and not self.connect():
+                return None
+            # Наличие таблицы проверяется по каталогу, пока она не найдена: без ошибок в журнале
+            if not self._data_version_table:
+                result = self.execute_query("SELECT to_regclass('__meta_data_version') IS NOT NULL", [])
+                self._data_version_table = bool(result) and result[0][0] in ('t', 'true')
+                if not self._data_version_table:
+                    return None
+            result = self.execute_query("SELECT version FROM __meta_data_version WHERE id = 1", [])
+            return result[0][0] if result else None
+        finally:
+            if not was_connected:
+                self.disconnect()
+
+    # Ключевые слова в имени файла исключений -> тип сущности
+    EXCEPTION_FILE_TYPES = (
+        ('класс', 'class'),
+        ('групп', 'group'),
+        ('атрибут', 'attribute'),
+    )
+    
+    # Свойства атрибутов, которые по умолчанию должны обновляться
+    ATTRIBUTE_UPDATE_PROPERTIES = {
+        'readOnly', 'visible', 'informs', 'grp', 'title', 'description',
+        'refClass', 'refAttr', 'defValue', 'length', 'mandatory',
+        'calculated', 'guid', 'hierarchy', 'cascade'
+    }
+    
+    def init_exceptions_data(self, force_reload=False) -> Dict[str, Any]:
+        """
+        Инициализация данных исключений из файлов исключени*.md
+        
+        Все файлы разбираются заранее, затем записи вставляются пакетами
+        (INSERT ... ON CONFLICT DO NOTHING) в одной транзакции. При force_reload
+        таблица очищается в той же транзакции, поэтому читатели до коммита
+        видят старые данные, а не полупустую таблицу.
+        
+        Возвращает отчёт об импорте; success=False при ошибке
+        """
+        report = {'success': False, 'files': [], 'parsed': 0, 'inserted': 0,
+                  'duplicates': 0, 'deleted': 0, 'skipped_lines': 0}
+        started = time.time()
+        
+        try:
+            if not self.connect():
+                report['error'] = "Ошибка подключения к БД"
+                return report
+            
+            # Проверяем есть ли уже данные
+            if not force_reload:
+                result = self.execute_query("SELECT COUNT(*) FROM __meta_statistic", [])
+                if result and int(result[0][0]) > 0:
+                    self.logger.info("Данные исключений уже загружены")
+                    report['success'] = True
+                    report['already_loaded'] = True
+                    return report
+            
+            # Разбираем все файлы до начала транзакции
+            rows = []
+            for filename in self._find_exception_files():
+                entity_type = self._exception_file_type(filename)
+                file_report = {'file': filename, 'entity_type': entity_type}
+                if entity_type is None:
+                    file_report['error'] = "Не удалось определить тип сущности по имени файла"
+                else:
                     try:
-                        prep_stmt = self.connection.prepareStatement(insert_query)
-                        prep_stmt.setString(1, entity_type)
-                        prep_stmt.setString(2, attr_name)
-                        prep_stmt.setString(3, attr_title)
-                        prep_stmt.setInt(4, default_action)
-                        prep_stmt.setString(5, entity_type)
-                        prep_stmt.setString(6, attr_name)
-                        prep_stmt.setString(7, attr_title)
-                        prep_stmt.executeUpdate()
-                        prep_stmt.close()
+                        file_rows, skipped = self._parse_exceptions_file(filename, entity_type)
+                        rows.extend(file_rows)
+                        file_report.update(rows=len(file_rows), skipped_lines=skipped)
+                        report['skipped_lines'] += skipped
                     except Exception as e:
-                        print(f"Ошибка вставки записи {entity_type}/{attr_name}/{attr_title}: {e}")
-                        
+                        file_report['error'] = f"Ошибка чтения файла: {e}"
+                report['files'].append(file_report)
+            report['parsed'] = len(rows)
+            
+            insert_query = """
+                INSERT INTO __meta_statistic (entity_type, entity_name, property_name, action)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (entity_type, entity_name, property_name) DO NOTHING
+            """
+            
+            with self.transaction():
+                if force_reload:
+                    report['deleted'] = self.execute_update("DELETE FROM __meta_statistic", [])
+                
+                count_query = "SELECT COUNT(*) FROM __meta_statistic"
+                before = int(self.execute_query(count_query, [])[0][0])
+                self.execute_batch(insert_query, rows)
+                after = int(self.execute_query(count_query, [])[0][0])
+            
+            report['inserted'] = after - before
+            report['duplicates'] = report['parsed'] - report['inserted']
+            report['success'] = True
+            self.logger.info("Импорт исключений: разобрано %s, добавлено %s, дубликатов %s, удалено %s",
+                             report['parsed'], report['inserted'], report['duplicates'], report['deleted'])
+            return report
+            
         except Exception as e:
-            print(f"Ошибка загрузки файла {filename}: {e}")
+            self.logger.error("Ошибка инициализации данных исключений: %s", e)
+            report['error'] = str(e)
+            return report
+        finally:
+            report['duration_sec'] = round(time.time() - started, 3)
+            self.disconnect()
+    
+    @staticmethod
+    def _find_exception_files() -> List[str]:
+        """Файлы исключений в рабочей директории"""
+        import glob
+        return sorted(glob.glob('исключени*.md'))
+    
+    def _exception_file_type(self, filename: str) -> Optional[str]:
+        """Тип сущности по ключевому слову в имени файла"""
+        name = os.path.basename(filename).lower()
+        for keyword, entity_type in self.EXCEPTION_FILE_TYPES:
+            if keyword in name:
+                return entity_type
+        return None
+    
+    def _parse_exceptions_file(self, filename, entity_type) -> Tuple[List[List], int]:
+        """Разбор файла исключений: строки для вставки и число пропущенных строк"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        
+        rows = []
+        skipped = 0
+        # Пропускаем заголовок
+        for line in lines[1:]:
+            line = line.strip()
+            if not line:
+                continue
+                
+            parts = line.split('\t')
+            if len(parts) < 3:
+                skipped += 1
+                continue
+            
+            attr_title = parts[0].strip()
+            attr_name = parts[1].strip()
+            # Третья колонка attr_map игнорируется для исключений
+            
+            # По умолчанию - игнорировать; для важных свойств атрибутов - обновить
+            default_action = 0
+            if entity_type == 'attribute' and attr_name in self.ATTRIBUTE_UPDATE_PROPERTIES:
+                default_action = 2
+            
+            rows.append([entity_type, attr_name, attr_title, default_action])
+        
+        return rows, skipped
 
 class MSSQLManager(DatabaseManager):
     """Менеджер для работы с Microsoft SQL Server"""
     
     def __init__(self):
-        super().__init__(config.mssql)
+        # Для MSSQL доступен только JDBC драйвер
+        super().__init__(config.mssql, backend='jdbc')
 
 class PostgreSQLManager(DatabaseManager):
     """Менеджер для работы с PostgreSQL"""
     
-    def __init__(self):
-        super().__init__(config.postgres)
+    def __init__(self, backend: str = None):
+        super().__init__(config.postgres, backend=backend)
@@ -0,0 +1,359 @@
+"""
+Брокер доступа к БД: один процесс с JVM и пулом JDBC соединений на все web воркеры
+
+    python manage.py broker            # процесс брокера (слушает DB_BROKER_SOCKET)
+    DB_BACKEND=broker python app.py    # воркеры выполняют запросы через брокер
+
+Обмен идет по Unix сокету кадрами: 1 байт типа, 4 байта длины, данные.
+Запросы передаются в JSON, строки результата - в компактном двоичном виде
+(без JSON): число строк и колонок, затем для каждой ячейки длина и UTF-8 байты
+
+Запросы передают таймаут SQL по бюджету HTTP запроса воркера (query_budget.py);
+connect возвращает номер сессии, по которому воркер отменяет выполняющийся
+запрос операцией cancel с отдельного сокета
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Dict, List, Optional
+
+from database_manager import create_backend
+import query_budget
+
+# Типы кадров
+FRAME_REQUEST = b'Q'   # JSON: {"op": ..., ...}
+FRAME_VALUE = b'V'     # JSON: результат операции
+FRAME_ROWS = b'R'      # двоичные строки (ответ query)
+FRAME_ERROR = b'X'     # JSON: {"error": ..., "connection_error": bool, "cancelled": bool}
+
+# Операции с SQL запросами: их поле timeout - таймаут запроса по бюджету воркера
+_QUERY_OPS = ('query', 'update', 'batch')
+
+_HEADER = struct.Struct('>cI')
+_ROWS_HEADER = struct.Struct('>IH')
+_CELL = struct.Struct('>i')
+
+
+class BrokerError(Exception):
+    """Ошибка, полученная от брокера"""
+
+    def __init__(self, message: str, connection_error: bool = False, cancelled: bool = False):
+        super().__init__(message)
+        self.connection_error = connection_error
+        self.cancelled = cancelled  # SQL запрос отменен (query_budget.is_cancellation)
+
+
+def encode_rows(rows: List[List[Optional[str]]]) -> bytes:
+    """Строки результата в двоичный вид; None кодируется длиной -1"""
+    column_count = len(rows[0]) if rows else 0
+    parts = [_ROWS_HEADER.pack(len(rows), column_count)]
+    for row in rows:
+        for value in row:
+            if value is None:
+                parts.append(_CELL.pack(-1))
+            else:
+                data = value.encode('utf-8')
+                parts.append(_CELL.pack(len(data)))
+                parts.append(data)
+    return b''.join(parts)
+
+
+def decode_rows(payload: bytes) -> List[List[Optional[str]]]:
+    """Обратное преобразование encode_rows"""
+    view = memoryview(payload)
+    row_count, column_count = _ROWS_HEADER.unpack_from(view, 0)
+    offset = _ROWS_HEADER.size
+    rows = []
+    for _ in range(row_count):
+        row = []
+        for _ in range(column_count):
+            (length,) = _CELL.unpack_from(view, offset)
+            offset += _CELL.size
+            if length < 0:
+                row.append(None)
+            else:
+                row.append(str(view[offset:offset + length], 'utf-8'))
+                offset += length
+        rows.append(row)
+    return rows
+
+
+def send_frame(sock: socket.socket, frame_type: bytes, payload: bytes = b''):
+    sock.sendall(_HEADER.pack(frame_type, len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Брокер БД закрыл соединение")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock: socket.socket):
+    frame_type, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return frame_type, _recv_exact(sock, length) if length else b''
+
+
+# ===== Сервер =====
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    """
+    Одно клиентское соединение = один поток брокера
+    Соединение с БД берется из пула на connect и возвращается на disconnect
+    (или при обрыве сокета), поэтому транзакции воркера выполняются на одном соединении
+    """
+
+    def handle(self):
+        backend = self.server.backend
+        self.listener = None
+        try:
+            while True:
+                try:
+                    frame_type, payload = recv_frame(self.request)
+                except ConnectionError:
+                    break
+                if frame_type != FRAME_REQUEST:
+                    break
+                request = json.loads(payload)
+                try:
+                    timeout = request.get('timeout') if request['op'] in _QUERY_OPS else None
+                    with query_budget.override_timeout(timeout):
+                        self._dispatch(backend, request)
+                except (ConnectionError, BrokenPipeError):
+                    break
+                except Exception as e:
+                    send_frame(self.request, FRAME_ERROR, json.dumps({
+                        'error': str(e),
+                        'connection_error': bool(backend.connection is None or backend.is_connection_error(e)),
+                        'cancelled': query_budget.is_cancellation(e),
+                    }).encode('utf-8'))
+        finally:
+            # Незакрытая транзакция откатывается при возврате соединения в пул
+            if backend.connection is not None:
+                backend.disconnect()
+            if self.listener is not None:
+                self.listener.close()
+
+    def _dispatch(self, backend, request: Dict[str, Any]):
+        op = request['op']
+        if op == 'query':
+            send_frame(self.request, FRAME_ROWS, encode_rows(backend.query(request['query'], request['params'])))
+        else:
+            if op == 'update':
+                value = backend.update(request['query'], request['params'])
+            elif op == 'batch':
+                value = backend.batch(request['query'], request['rows'], request['batch_size'])
+            elif op == 'connect':
+                if backend.connection is None:
+                    backend.connect()
+                # Номер сессии - поток брокера, в котором выполняются запросы клиента
+                value = threading.get_ident()
+            elif op == 'cancel':
+                # Отдельный сокет воркера: отмена запроса, выполняющегося в сессии
+                value = backend.cancel(request['session'])
+            elif op in ('disconnect', 'discard', 'begin', 'commit', 'rollback', 'end_transaction'):
+                if backend.connection is not None:
+                    getattr(backend, op)()
+                value = True
+            elif op == 'stats':
+                value = backend.pool.stats()
+            elif op == 'listen':
+                # Клиент-слушатель: отдельное соединение LISTEN в брокере на время сокета
+                if self.listener is None:
+                    self.listener = backend.open_listener(request['channel'])
+                value = True
+            elif op == 'poll':
+                if self.listener is None:
+                    raise ValueError("poll без listen")
+                value = self.listener.poll(request['timeout'])
+            else:
+                raise ValueError(f"Неизвестная операция брокера: {op}")
+            send_frame(self.request, FRAME_VALUE, json.dumps(value).encode('utf-8'))
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Брокер: Unix сокет, поток на каждого клиента, один backend (JVM + пул) на процесс"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, db_config, backend: str = 'jdbc'):
+        # Backend хранит соединение в threading.local, поэтому потоки клиентов не мешают друг другу
+        self.backend = create_backend(backend, db_config)
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _BrokerHandler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+# ===== Клиент =====
+
+class _BrokerConnection:
+    """Сокет потока воркера к брокеру (в роли connection backend'а)"""
+
+    def __init__(self, socket_path: str, timeout: int):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+
+    def call(self, request: Dict[str, Any]):
+        send_frame(self.sock, FRAME_REQUEST, json.dumps(request, ensure_ascii=False).encode('utf-8'))
+        return self.read()
+
+    def read(self):
+        frame_type, payload = recv_frame(self.sock)
+        if frame_type == FRAME_ROWS:
+            return decode_rows(payload)
+        if frame_type == FRAME_VALUE:
+            return json.loads(payload)
+        error = json.loads(payload)
+        raise BrokerError(error['error'], error['connection_error'], error.get('cancelled', False))
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class _BrokerListener:
+    """Слушатель NOTIFY через брокер: свой сокет, LISTEN выполняется соединением брокера"""
+
+    def __init__(self, socket_path: str, timeout: int, channel: str):
+        self.connection = _BrokerConnection(socket_path, timeout)
+        try:
+            self.connection.call({'op': 'listen', 'channel': channel})
+        except Exception:
+            self.connection.close()
+            raise
+
+    def poll(self, timeout: float) -> List[str]:
+        return self.connection.call({'op': 'poll', 'timeout': timeout})
+
+    def close(self):
+        self.connection.close()
+
+
+class _BrokerPool:
+    """Статистика пула брокера для DatabaseManager.pool_stats()"""
+
+    def __init__(self, backend: 'BrokerBackend'):
+        self.backend = backend
+
+    def stats(self) -> Dict[str, int]:
+        return self.backend._call({'op': 'stats'})
+
+
+class BrokerBackend:
+    """
+    Backend воркера: те же операции, что у JDBCBackend, выполняются в процессе брокера
+    На каждый поток воркера - свой сокет и свое соединение с БД в брокере
+    """
+
+    name = 'broker'
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._local = threading.local()
+        self.pool = _BrokerPool(self)
+        self._sessions: Dict[int, int] = {}  # Номер сессии брокера по подключенным потокам воркера (для cancel)
+
+    @property
+    def connection(self) -> Optional[_BrokerConnection]:
+        """Сокет к брокеру, если в брокере получено соединение с БД для этого потока"""
+        if getattr(self._local, 'connected', False):
+            return self._local.connection
+        return None
+
+    def connect(self):
+        self._sessions[threading.get_ident()] = self._call({'op': 'connect'})
+        self._local.connected = True
+
+    def disconnect(self):
+        # Сокет остается открытым и переиспользуется следующим connect()
+        self._sessions.pop(threading.get_ident(), None)
+        if self.connection is not None:
+            self._local.connected = False
+            self._call({'op': 'disconnect'})
+
+    def discard(self):
+        # Закрытие сокета: брокер сам вернет соединение с БД в пул; номер его потока
+        # может достаться другому клиенту брокера, поэтому сессия забывается сразу
+        self._sessions.pop(threading.get_ident(), None)
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        self._local.connected = False
+        if connection is not None:
+            connection.close()
+
+    def open_listener(self, channel: str) -> _BrokerListener:
+        return _BrokerListener(self.db_config.broker_socket, self.db_config.query_timeout, channel)
+
+    def is_connection_error(self, error: Exception) -> bool:
+        if isinstance(error, BrokerError):
+            return error.connection_error and not error.cancelled
+        return isinstance(error, OSError)
+
+    def cancel(self, thread_id: int) -> bool:
+        """Отмена запроса потока thread_id в брокере (его сокет занят ожиданием ответа)"""
+        session = self._sessions.get(thread_id)
+        if session is None:
+            return False
+        connection = _BrokerConnection(self.db_config.broker_socket, self.db_config.connection_timeout)
+        try:
+            return connection.call({'op': 'cancel', 'session': session})
+        finally:
+            connection.close()
+
+    def _timeout(self) -> int:
+        return query_budget.statement_timeout(self.db_config.query_timeout)
+
+    def query(self, query: str, params: Optional[List]) -> List[List]:
+        return self._call({'op': 'query', 'query': query, 'params': params, 'timeout': self._timeout()})
+
+    def update(self, query: str, params: Optional[List]) -> int:
+        return self._call({'op': 'update', 'query': query, 'params': params, 'timeout': self._timeout()})
+
+    def batch(self, query: str, rows: List[List], batch_size: int) -> int:
+        return self._call({'op': 'batch', 'query': query, 'rows': rows, 'batch_size': batch_size,
+                           'timeout': self._timeout()})
+
+    def begin(self):
+        self._call({'op': 'begin'})
+
+    def commit(self):
+        self._call({'op': 'commit'})
+
+    def rollback(self):
+        self._call({'op': 'rollback'})
+
+    def end_transaction(self):
+        self._call({'op': 'end_transaction'})
+
+    def _socket(self) -> _BrokerConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = _BrokerConnection(self.db_config.broker_socket, self.db_config.query_timeout)
+            self._local.connection = connection
+        return connection
+
+    def _call(self, request: Dict[str, Any]):
+        try:
+            return self._socket().call(request)
+        except OSError:
+            self.discard()
+            raise
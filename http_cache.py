@@ -0,0 +1,54 @@
+"""
+HTTP кэширование GET страниц и API по версии данных (HTTP_CACHE)
+
+ETag ответа - хэш версии данных (DataService.data_version, увеличивается
+триггерами при любых изменениях таблиц), версии приложения и пути с параметрами.
+Повторный запрос с If-None-Match получает 304 Not Modified до выполнения
+обработчика, то есть без запросов к БД. X-Accel-Expires разрешает nginx отдавать
+ответ из своего кэша MICRO_CACHE_SECONDS секунд и затем перепроверять его у
+приложения тем же If-None-Match (nginx.conf, proxy_cache_revalidate)
+"""
+import hashlib
+import os
+
+from config import config
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _app_version() -> str:
+    """Время изменения модулей и шаблонов: после обновления приложения ETag меняются"""
+    latest = 0.0
+    for directory in (APP_ROOT, os.path.join(APP_ROOT, 'templates')):
+        for name in os.listdir(directory):
+            if name.endswith(('.py', '.html')):
+                latest = max(latest, os.path.getmtime(os.path.join(directory, name)))
+    return str(int(latest))
+
+
+APP_VERSION = _app_version()
+
+
+def compute_etag(data_version: str, full_path: str) -> str:
+    """ETag для пути с параметрами запроса (request.full_path) при данной версии данных"""
+    key = f"{data_version}|{APP_VERSION}|{full_path}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+
+
+def is_not_modified(etag: str, if_none_match) -> bool:
+    """Совпадает ли ETag с If-None-Match (werkzeug ETags, слабое сравнение)"""
+    return bool(if_none_match) and if_none_match.contains_weak(etag)
+
+
+def add_cache_headers(response, etag: str):
+    """
+    Заголовки кэширования для ответа 200 и 304: слабый ETag и Vary: Accept-Encoding
+    (тело зависит от сжатия, compression.py), браузер перепроверяет ответ при
+    каждом переходе (no-cache), nginx хранит его MICRO_CACHE_SECONDS
+    """
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    if config.performance.micro_cache_seconds:
+        response.headers['X-Accel-Expires'] = str(config.performance.micro_cache_seconds)
+    return response
@@ -0,0 +1,173 @@
+"""
+Замеры SQL запросов в рамках HTTP запроса
+
+DatabaseManager оборачивает каждый запрос в track_query(), backend'ы добавляют
+время фаз через add_phase() (prepare, execute, fetch, convert). Итоги запроса
+накапливаются в RequestStats текущего HTTP запроса (contextvars) и отдаются
+в заголовке Server-Timing; запросы дольше порога пишутся в журнал медленных запросов
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from config import config
+import metrics
+
+PHASES = ('prepare', 'execute', 'fetch', 'convert')
+
+_request_stats: contextvars.ContextVar = contextvars.ContextVar('request_stats', default=None)
+_query_phases: contextvars.ContextVar = contextvars.ContextVar('query_phases', default=None)
+
+_slow_logger: Optional[logging.Logger] = None
+
+
+class RequestStats:
+    """Счетчики SQL запросов одного HTTP запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.total = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.slowest: Optional[Dict[str, Any]] = None
+        self.errors = 0  # Ошибки SQL и подключения: такой ответ не кэшируется (http_cache)
+        self.coalesced = 0.0  # Ожидание одинаковых вызовов других запросов (singleflight)
+        self.queued = 0.0  # Ожидание допуска тяжелого запроса (admission)
+
+    def add(self, sql: str, elapsed: float, phases: Dict[str, float], rows: int):
+        self.queries += 1
+        self.rows += rows
+        self.total += elapsed
+        for phase, value in phases.items():
+            self.phases[phase] = self.phases.get(phase, 0.0) + value
+        if self.slowest is None or elapsed > self.slowest['elapsed']:
+            self.slowest = {'sql': sql, 'elapsed': elapsed}
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing (длительности в мс)"""
+        metrics = [f'db;dur={self.total * 1000:.1f};desc="SQL x{self.queries}"']
+        metrics += [f"db-{phase};dur={self.phases[phase] * 1000:.1f}"
+                    for phase in PHASES if self.phases.get(phase)]
+        if self.queued:
+            metrics.append(f'queue;dur={self.queued * 1000:.1f};desc="admission wait"')
+        if self.coalesced:
+            metrics.append(f'coalesced;dur={self.coalesced * 1000:.1f};desc="shared in-flight call"')
+        metrics.append(f"app;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(metrics)
+
+
+def start_request() -> RequestStats:
+    """Новые счетчики для текущего HTTP запроса"""
+    stats = RequestStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def current_request() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def record_error():
+    """Ошибка SQL запроса или подключения в текущем HTTP запросе"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.errors += 1
+
+
+def add_coalesced_wait(elapsed: float):
+    """Время ожидания результата одинакового вызова из другого HTTP запроса"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.coalesced += elapsed
+
+
+def add_phase(phase: str, elapsed: float):
+    """Время фазы выполнения текущего SQL запроса (вызывается backend'ами)"""
+    phases = _query_phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + elapsed
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL в одну строку без лишних пробелов (для группировки в журнале)"""
+    return ' '.join(sql.split())
+
+
+@contextmanager
+def track_query(sql: str, params: Optional[List] = None):
+    """
+    Замер одного SQL запроса; в блоке можно указать число строк: tracker['rows'] = n
+    Вложенные замеры (повтор после переподключения) учитываются как отдельные запросы
+    """
+    tracker = {'rows': 0}
+    phases: Dict[str, float] = {}
+    token = _query_phases.set(phases)
+    started = time.perf_counter()
+    try:
+        yield tracker
+    except Exception:
+        record_error()
+        raise
+    finally:
+        _query_phases.reset(token)
+        record_query(sql, params, time.perf_counter() - started, phases, tracker['rows'])
+
+
+def record_query(sql: str, params: Optional[List], elapsed: float,
+                 phases: Dict[str, float] = None, rows: int = 0):
+    """Учет выполненного запроса в счетчиках HTTP запроса и журнале медленных запросов"""
+    phases = phases or {}
+    metrics.DB_QUERY_SECONDS.observe(elapsed, metrics.query_name(sql))
+    normalized = normalize_sql(sql)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add(normalized, elapsed, phases, rows)
+    if elapsed * 1000 >= config.logging.slow_query_ms:
+        _log_slow_query(normalized, params, elapsed, phases, rows)
+
+
+def _get_slow_logger() -> logging.Logger:
+    """Журнал медленных запросов: JSON по строке на запрос, с ротацией"""
+    global _slow_logger
+    if _slow_logger is None:
+        logger = logging.getLogger('metarep.slow_queries')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        path = config.logging.slow_query_log
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=config.logging.max_size,
+                                          backupCount=config.logging.backup_count, encoding='utf-8')
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        _slow_logger = logger
+    return _slow_logger
+
+
+def _log_slow_query(sql: str, params: Optional[List], elapsed: float, phases: Dict[str, float], rows: int):
+    entry = {
+        'time': time.strftime(config.logging.datetime_format),
+        'duration_ms': round(elapsed * 1000, 1),
+        'phases_ms': {phase: round(value * 1000, 1) for phase, value in phases.items()},
+        'rows': rows,
+        'sql': sql,
+        'params': params,
+    }
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            entry['path'] = request.path
+            entry['args'] = request.args.to_dict()
+    except ImportError:
+        pass
+    _get_slow_logger().warning(json.dumps(entry, ensure_ascii=False, default=str))
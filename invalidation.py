@@ -0,0 +1,75 @@
+"""
+Согласование кэшей процессов через PostgreSQL LISTEN/NOTIFY (INVALIDATION_LISTEN)
+
+Триггеры версии данных (DatabaseManager.create_data_version_tracking) отправляют
+NOTIFY с именем измененной таблицы после коммита любой записи - из любого
+воркера, экземпляра приложения или внешнего импорта. Каждый процесс держит
+InvalidationListener: фоновый поток с отдельным соединением LISTEN (через
+брокер при DB_BACKEND=broker), который вызывает обработчик с набором таблиц.
+
+Пока соединение слушателя потеряно, уведомления могут пропасть: после
+переподключения обработчик получает None - сбросить все
+"""
+import logging
+import threading
+from typing import Callable, Optional, Set
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30  # Ожидание уведомлений за один вызов poll, сек
+RECONNECT_DELAY = 5  # Пауза перед повторной подпиской после ошибки, удваивается до MAX_RECONNECT_DELAY
+MAX_RECONNECT_DELAY = 60
+# Пока подписка активна, кэш версии данных перечитывается из БД только для подстраховки
+VERSION_TTL_WHILE_LISTENING = 60
+
+
+class InvalidationListener:
+    """
+    Поток-слушатель канала NOTIFY: handler(tables) - измененные таблицы,
+    handler(None) - после (пере)подключения, когда уведомления могли быть пропущены
+    """
+
+    def __init__(self, db_manager, handler: Callable[[Optional[Set[str]]], None]):
+        self.db_manager = db_manager
+        self.handler = handler
+        self.channel = db_manager.DATA_CHANGE_CHANNEL
+        self.connected = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'InvalidationListener':
+        self._thread = threading.Thread(target=self._run, name='invalidation-listener', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            listener = None
+            try:
+                listener = self.db_manager.open_listener(self.channel)
+                self.connected = True
+                delay = RECONNECT_DELAY
+                logger.info("✅ Подписка на изменения данных: LISTEN %s", self.channel)
+                self.handler(None)
+                while not self._stop.is_set():
+                    tables = set(listener.poll(POLL_TIMEOUT))
+                    if tables:
+                        metrics.cache_eviction('data_version')
+                        self.handler(tables)
+            except Exception as e:
+                if self.connected:
+                    logger.warning("⚠️ Подписка на изменения данных потеряна: %s", e)
+                else:
+                    logger.debug("Подписка на изменения данных недоступна: %s", e)
+            finally:
+                self.connected = False
+                if listener is not None:
+                    listener.close()
+            self._stop.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
@@ -0,0 +1,119 @@
+"""
+Сериализация JSON ответов Flask (app.json)
+
+    app.json = create_provider(app)   # JSON_PROVIDER=auto | orjson | stdlib
+
+FastJSONProvider кодирует через orjson (необязательный пакет, в 4-5 раз быстрее
+json на больших ответах; кириллица в UTF-8), без пакета - стандартным json.
+Ключи не сортируются, даты - как у Flask (http_date): datetime передается в
+DefaultJSONProvider.default, как и типы, которых orjson не знает. Стандартный
+json оставлен с ensure_ascii (\\uXXXX): без экранирования он медленнее на четверть,
+а разницу в размере снимает сжатие ответа. JSON_AS_ASCII Flask 2.3 не читает
+
+stream_json() кодирует ответ частями для самых больших списков: в памяти не
+собирается вся строка JSON, а первые байты уходят клиенту сразу
+"""
+import logging
+from typing import Any, Callable, Iterator
+
+from flask.json.provider import DefaultJSONProvider
+
+from config import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Размер части потокового ответа: меньшие куски копятся в буфере
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider с orjson; use_orjson=False - стандартный json с теми же настройками"""
+
+    sort_keys = False
+
+    def __init__(self, app, use_orjson: bool = True):
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+        if self.use_orjson:
+            self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Особые параметры (indent, separators, cls) - только стандартный json
+        if not self.use_orjson or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Компактный JSON в UTF-8 (stream_json)"""
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._options)
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if not self.use_orjson or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.use_orjson or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        # Байты orjson передаются в ответ без промежуточной строки
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def create_provider(app) -> FastJSONProvider:
+    """Провайдер по JSON_PROVIDER: auto - orjson, если установлен"""
+    mode = config.performance.json_provider
+    if mode == 'orjson' and orjson is None:
+        logger.warning("JSON_PROVIDER=orjson, но пакет orjson не установлен - используется json")
+    provider = FastJSONProvider(app, use_orjson=mode != 'stdlib')
+    logger.info("JSON ответы: %s", 'orjson' if provider.use_orjson else 'json')
+    return provider
+
+
+def stream_json(obj: Any, dumps: Callable[[Any], bytes], chunk_rows: int = 500,
+                max_depth: int = 4) -> Iterator[bytes]:
+    """
+    Потоковое кодирование: словари до глубины max_depth раскрываются по ключам,
+    списки длиннее chunk_rows кодируются по chunk_rows элементов, остальное -
+    одним вызовом dumps (FastJSONProvider.dumps_bytes). Куски объединяются до
+    STREAM_BUFFER_SIZE байт
+    """
+    buffer, size = [], 0
+    for part in _iter_json(obj, dumps, chunk_rows, max_depth):
+        buffer.append(part)
+        size += len(part)
+        if size >= STREAM_BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(b'\n')
+    yield b''.join(buffer)
+
+
+def _iter_json(obj: Any, dumps: Callable[[Any], bytes], chunk_rows: int, depth: int) -> Iterator[bytes]:
+    if isinstance(obj, dict) and depth > 0:
+        yield b'{'
+        for index, (key, value) in enumerate(obj.items()):
+            if index:
+                yield b','
+            yield dumps(str(key))
+            yield b':'
+            yield from _iter_json(value, dumps, chunk_rows, depth - 1)
+        yield b'}'
+    elif isinstance(obj, list) and len(obj) > chunk_rows:
+        yield b'['
+        for start in range(0, len(obj), chunk_rows):
+            if start:
+                yield b','
+            # "[a,b]" -> "a,b": элементы части без скобок списка
+            yield dumps(obj[start:start + chunk_rows])[1:-1]
+        yield b']'
+    else:
+        yield dumps(obj)
@@ -0,0 +1,121 @@
+"""
+Настройка логирования из LoggingConfig
+
+    setup_logging()   # один раз при старте app.py / manage.py
+
+Уровень по умолчанию LOG_LEVEL, уровни отдельных модулей - LOG_LEVELS
+(например "data_service=DEBUG,database_manager=WARNING"). Сообщения пишутся
+в stdout и, если задан LOG_FILE, в файл с ротацией
+
+Для сообщений в циклах по строкам используется SampledLog: первые сообщения
+выводятся полностью, дальше - каждое N-е, при выключенном уровне аргументы
+не форматируются вовсе
+"""
+import logging
+import os
+import sys
+from logging.handlers import RotatingFileHandler
+from typing import Dict
+
+from config import config
+
+_configured = False
+
+
+def parse_module_levels(value: str) -> Dict[str, str]:
+    """'data_service=DEBUG,database_manager=WARNING' -> {'data_service': 'DEBUG', ...}"""
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class PasswordMaskFilter(logging.Filter):
+    """Замена паролей подключений к БД на *** (ENCRYPT_PASSWORDS_IN_LOGS)"""
+
+    def __init__(self, passwords):
+        super().__init__()
+        self.passwords = [password for password in passwords if password and len(password) >= 4]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        masked = message
+        for password in self.passwords:
+            masked = masked.replace(password, '***')
+        if masked != message:
+            record.msg, record.args = masked, None
+        return True
+
+
+def setup_logging(level: str = None):
+    """Настройка корневого логгера; повторный вызов ничего не делает"""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    settings = config.logging
+    formatter = logging.Formatter('%(asctime)s %(levelname)-7s %(name)s: %(message)s',
+                                  datefmt=settings.datetime_format)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if settings.file:
+        directory = os.path.dirname(settings.file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(RotatingFileHandler(settings.file, maxBytes=settings.max_size,
+                                            backupCount=settings.backup_count, encoding='utf-8'))
+
+    mask = PasswordMaskFilter([config.postgres.password, config.mssql.password]) \
+        if settings.encrypt_passwords else None
+    root = logging.getLogger()
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        if mask:
+            handler.addFilter(mask)
+        root.addHandler(handler)
+    root.setLevel((level or settings.level).upper())
+
+    for name, module_level in parse_module_levels(settings.module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+class SampledLog:
+    """
+    Логирование в циклах по строкам: первые first сообщений, затем каждое every-е
+    Создается перед циклом; summary() после цикла сообщает, сколько пропущено
+    """
+
+    def __init__(self, logger: logging.Logger, first: int = 10, every: int = 1000):
+        self.logger = logger
+        self.first = first
+        self.every = max(1, every)
+        self.count = 0
+        self.suppressed = 0
+
+    def _emit(self, level: int, msg: str, args):
+        self.count += 1
+        if self.count <= self.first or self.count % self.every == 0:
+            self.logger.log(level, msg, *args)
+        else:
+            self.suppressed += 1
+
+    # Проверка уровня выполняется до любой другой работы: при выключенной отладке
+    # стоимость вызова - одно сравнение в isEnabledFor (результат кэшируется logging)
+    def debug(self, msg: str, *args):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, msg, args)
+
+    def warning(self, msg: str, *args):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._emit(logging.WARNING, msg, args)
+
+    def error(self, msg: str, *args):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._emit(logging.ERROR, msg, args)
+
+    def summary(self, what: str = 'сообщений'):
+        if self.suppressed:
+            self.logger.info("Пропущено %d %s (выведены первые %d и каждое %d-е)",
+                             self.suppressed, what, self.first, self.every)
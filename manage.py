@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Служебные команды MetaRep
+
+    python manage.py bootstrap [--reload-exceptions]
+    python manage.py broker [--socket PATH] [--backend jdbc|psycopg]
+    python manage.py build-cds [--output FILE] [--connect]
+    python manage.py indexes [--check] [--no-concurrently]
+    python manage.py explain [--baseline FILE] [--save-baseline FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+
+
+# ===== bootstrap =====
+
+def cmd_bootstrap(args) -> int:
+    """Одноразовая подготовка БД перед запуском приложения"""
+    from data_service import DataService
+
+    started = time.time()
+    report = DataService().bootstrap(force_reload=args.reload_exceptions)
+    exceptions = report.get('exceptions') or {}
+    if exceptions.get('success') and not exceptions.get('already_loaded'):
+        print(f"📥 Исключений добавлено: {exceptions['inserted']} из {exceptions['parsed']}")
+    print(f"⏱️ Bootstrap выполнен за {time.time() - started:.2f} сек")
+    return 0 if report.get('success') else 1
+
+
+# ===== broker =====
+
+def cmd_broker(args) -> int:
+    """Процесс брокера БД: одна JVM и один пул соединений на все web воркеры"""
+    from db_broker import BrokerServer
+
+    socket_path = args.socket or config.postgres.broker_socket
+    server = BrokerServer(socket_path, config.postgres, backend=args.backend)
+    print(f"🔌 Брокер БД ({args.backend}) слушает {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Брокер остановлен")
+    finally:
+        server.server_close()
+    return 0
+
+
+# ===== build-cds =====
+
+JDBC_DRIVER_CLASSES = ('org.postgresql.Driver', 'com.microsoft.sqlserver.jdbc.SQLServerDriver')
+
+
+def cmd_build_cds(args) -> int:
+    """
+    Архив AppCDS с классами JDBC драйверов: JVM загружает их из общего архива
+    вместо разбора jar файлов, что сокращает время запуска
+    """
+    import jpype
+    from database_manager import initialize_jvm, jvm_startup_time, shutdown_jvm, PostgreSQLManager
+
+    archive = args.output or config.jvm.cds_archive
+    # Архив пишется при завершении JVM; текущий архив при этом не подключается
+    if not initialize_jvm(cds_dump_path=archive):
+        print("❌ Не удалось запустить JVM")
+        return 1
+    print(f"⏱️ JVM без архива запущена за {jvm_startup_time():.2f} сек")
+
+    for driver in JDBC_DRIVER_CLASSES:
+        jpype.JClass(driver)
+
+    if args.connect:
+        # Классы соединения, PreparedStatement и ResultSet загружаются только при работе с БД
+        db_manager = PostgreSQLManager(backend='jdbc')
+        if db_manager.connect():
+            try:
+                db_manager.execute_query("SELECT 1, now(), 'x'::text", [])
+            finally:
+                db_manager.disconnect()
+        else:
+            print("⚠️ Нет соединения с БД: архив будет содержать только классы драйверов")
+
+    shutdown_jvm()
+    if not os.path.exists(archive):
+        print(f"❌ Архив не создан (нужна JDK 13+): {archive}")
+        return 1
+    print(f"💾 Архив AppCDS: {archive} ({os.path.getsize(archive) // 1024} КБ)")
+    return 0
+
+
+# ===== indexes =====
+
+def cmd_indexes(args) -> int:
+    """Создание/проверка рекомендуемых индексов"""
+    from database_manager import PostgreSQLManager
+    from schema import ensure_indexes
+
+    db_manager = PostgreSQLManager()
+    if not db_manager.connect():
+        print("❌ Ошибка подключения к БД")
+        return 1
+
+    try:
+        report = ensure_indexes(db_manager, create=not args.check,
+                                concurrently=not args.no_concurrently)
+    finally:
+        db_manager.disconnect()
+
+    icons = {'ok': '✅', 'created': '🆕', 'missing': '⚠️', 'invalid': '❌', 'failed': '❌'}
+    for entry in report:
+        print(f"{icons[entry['status']]} {entry['name']:<45} {entry['table']:<20} {entry['status']}")
+        if entry.get('error'):
+            print(f"    {entry['error']}")
+        elif entry['status'] == 'invalid':
+            print(f"    Удалите индекс (DROP INDEX {entry['name']}) и запустите команду повторно")
+
+    problems = [e for e in report if e['status'] in ('missing', 'invalid', 'failed')]
+    print(f"\nВсего индексов: {len(report)}, проблем: {len(problems)}")
+    return 1 if problems else 0
+
+
+# ===== explain =====
+
+def _canonical_scenarios(data_service) -> List[Tuple[str, Any]]:
+    """Типовые вызовы DataService, запросы которых проверяются через EXPLAIN"""
+    base_url = config.sitex_context_url
+    return [
+        ('classes', lambda: data_service.get_classes(page=1, per_page=20, base_url=base_url)),
+        ('classes_search', lambda: data_service.get_classes(page=1, per_page=20, search='doc')),
+        ('classes_filtered', lambda: data_service.get_classes(page=1, per_page=20, status_variance=2, event=4)),
+        ('groups', lambda: data_service.get_groups(page=1, per_page=20, search='doc', base_url=base_url)),
+        ('attributes_fast', lambda: data_service.get_attributes(page=1, per_page=20, search='doc',
+                                                                analyze_exceptions=False)),
+        ('attributes_analysis', lambda: data_service.get_attributes(page=1, per_page=20, status_variance=2,
+                                                                    analyze_exceptions=True)),
+        ('class_details', lambda: _class_details(data_service)),
+        ('statistics', lambda: data_service.get_statistics()),
+        ('exceptions', lambda: data_service.get_exceptions(page=1, per_page=50, entity_type='attribute')),
+    ]
+
+
+def _class_details(data_service):
+    """Детали первого класса с различиями (или просто первого класса)"""
+    result = data_service.db_manager.execute_query(
+        "SELECT ouid FROM sxclass_source ORDER BY a_status_variance DESC, ouid LIMIT 1", [])
+    if result:
+        return data_service.get_class_details(int(result[0][0]))
+    return None
+
+
+def _walk_plan(node: Dict[str, Any]):
+    """Обход всех узлов плана"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from _walk_plan(child)
+
+
+def _explain(db_manager, query: str, params: Optional[List]) -> Dict[str, Any]:
+    """EXPLAIN (ANALYZE, BUFFERS) запроса с теми же параметрами, что у приложения"""
+    result = db_manager.execute_query(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+    return json.loads(result[0][0])[0]
+
+
+def _summarize(plan: Dict[str, Any], seq_scan_rows: int) -> Dict[str, Any]:
+    """Время, буферы и последовательные сканирования больших таблиц"""
+    root = plan['Plan']
+    seq_scans = []
+    for node in _walk_plan(root):
+        if node.get('Node Type') != 'Seq Scan':
+            continue
+        scanned = node.get('Actual Rows', 0) * node.get('Actual Loops', 1) + node.get('Rows Removed by Filter', 0)
+        if scanned >= seq_scan_rows:
+            seq_scans.append(f"{node.get('Relation Name')} ({scanned} строк)")
+    return {
+        'execution_ms': round(plan.get('Execution Time', 0.0), 2),
+        'planning_ms': round(plan.get('Planning Time', 0.0), 2),
+        'buffers': root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0),
+        'seq_scans': seq_scans,
+    }
+
+
+def cmd_explain(args) -> int:
+    """EXPLAIN по реальным запросам приложения с поиском seq scan и регрессий"""
+    from data_service import DataService
+
+    data_service = DataService()
+    db_manager = data_service.db_manager
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    problems = 0
+
+    for scenario, call in _canonical_scenarios(data_service):
+        # Собираем запросы сценария; одинаковый текст (N+1 запросы) проверяем один раз
+        with db_manager.capture_queries() as captured:
+            started = time.time()
+            call()
+            elapsed = time.time() - started
+
+        unique = {}
+        for query, params in captured:
+            if query.lstrip().upper().startswith(('SELECT', 'WITH')) and query not in unique:
+                unique[query] = params
+
+        print(f"\n▶ {scenario}: {len(captured)} запросов ({len(unique)} уникальных), {elapsed:.2f} сек")
+
+        if not db_manager.connect():
+            print("❌ Ошибка подключения к БД")
+            return 1
+        try:
+            for number, (query, params) in enumerate(unique.items(), 1):
+                name = f"{scenario}:{number}"
+                try:
+                    summary = _summarize(_explain(db_manager, query, params), args.seq_scan_rows)
+                except Exception as e:
+                    print(f"  ❌ {name}: ошибка EXPLAIN: {e}")
+                    problems += 1
+                    continue
+
+                summary['query'] = ' '.join(query.split())[:200]
+                results[name] = summary
+                flags = []
+
+                if summary['seq_scans']:
+                    flags.append(f"Seq Scan: {', '.join(summary['seq_scans'])}")
+
+                previous = baseline.get(name)
+                if previous:
+                    slower = summary['execution_ms'] > previous['execution_ms'] * args.regression_factor
+                    if slower and summary['execution_ms'] - previous['execution_ms'] >= args.regression_min_ms:
+                        flags.append(f"регрессия: {previous['execution_ms']} -> {summary['execution_ms']} мс")
+                    if summary['buffers'] > previous['buffers'] * args.regression_factor:
+                        flags.append(f"буферы: {previous['buffers']} -> {summary['buffers']}")
+
+                icon = '⚠️' if flags else '✅'
+                print(f"  {icon} {name}: {summary['execution_ms']} мс, буферов {summary['buffers']}")
+                for flag in flags:
+                    print(f"      {flag}")
+                problems += bool(flags)
+        finally:
+            db_manager.disconnect()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Базовая линия сохранена: {args.save_baseline}")
+
+    print(f"\nПроверено запросов: {len(results)}, с замечаниями: {problems}")
+    return 1 if problems else 0
+
+
+def main(argv: List[str] = None) -> int:
+    from logging_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Служебные команды MetaRep')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bootstrap = subparsers.add_parser('bootstrap', help='Создать таблицы и загрузить исключения')
+    bootstrap.add_argument('--reload-exceptions', action='store_true',
+                           help='Перезагрузить исключения из файлов (заменяет текущие действия)')
+    bootstrap.set_defaults(handler=cmd_bootstrap)
+
+    broker = subparsers.add_parser('broker', help='Запустить брокер БД для воркеров с DB_BACKEND=broker')
+    broker.add_argument('--socket', help='Путь к Unix сокету (по умолчанию DB_BROKER_SOCKET)')
+    broker.add_argument('--backend', choices=('jdbc', 'psycopg'), default='jdbc',
+                        help='Как брокер выполняет запросы')
+    broker.set_defaults(handler=cmd_broker)
+
+    build_cds = subparsers.add_parser('build-cds', help='Собрать архив AppCDS для ускорения запуска JVM')
+    build_cds.add_argument('--output', help='Путь к архиву (по умолчанию JVM_CDS_ARCHIVE)')
+    build_cds.add_argument('--connect', action='store_true',
+                           help='Выполнить тестовый запрос, чтобы в архив попали классы работы с БД')
+    build_cds.set_defaults(handler=cmd_build_cds)
+
+    indexes = subparsers.add_parser('indexes', help='Создать/проверить рекомендуемые индексы')
+    indexes.add_argument('--check', action='store_true', help='Только проверить, ничего не создавая')
+    indexes.add_argument('--no-concurrently', action='store_true',
+                         help='Создавать без CONCURRENTLY (быстрее, но блокирует запись)')
+    indexes.set_defaults(handler=cmd_indexes)
+
+    explain = subparsers.add_parser('explain', help='EXPLAIN ANALYZE типовых запросов приложения')
+    explain.add_argument('--baseline', help='JSON с предыдущими результатами для поиска регрессий')
+    explain.add_argument('--save-baseline', help='Сохранить результаты в JSON')
+    explain.add_argument('--seq-scan-rows', type=int, default=1000,
+                         help='Seq Scan по стольким строкам и больше считается проблемой')
+    explain.add_argument('--regression-factor', type=float, default=1.5,
+                         help='Во сколько раз запрос должен замедлиться, чтобы считаться регрессией')
+    explain.add_argument('--regression-min-ms', type=float, default=50.0,
+                         help='Минимальное абсолютное замедление для регрессии, мс')
+    explain.set_defaults(handler=cmd_explain)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics)
+
+Без внешних зависимостей: счетчики, гистограммы и значения, вычисляемые при
+чтении (пул соединений, heap/GC JVM через JMX). Метрики хранятся в памяти
+процесса - при нескольких воркерах каждый отдает свои значения
+"""
+import bisect
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Границы гистограмм, сек
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                                for key, value in sorted(values)]
+
+
+class Histogram(_Metric):
+    """Распределение длительностей по корзинам (кумулятивно при выводе)"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List] = {}  # [counts по корзинам + Inf, сумма, количество]
+
+    def observe(self, value: float, *label_values: str):
+        key = tuple(str(label) for label in label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in sorted(values):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Текущее значение, вычисляемое функцией при каждом чтении /metrics"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 callback: Callable[[], Iterable[Tuple[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        try:
+            samples = list(self.callback())
+        except Exception:
+            samples = []
+        if not samples:
+            return []
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                                for key, value in samples]
+
+
+class CounterFunc(Gauge):
+    """Счетчик, накопленное значение которого читается при каждом чтении /metrics (JMX)"""
+    kind = 'counter'
+
+
+_registry: List[_Metric] = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+# ===== Метрики приложения =====
+
+HTTP_REQUEST_SECONDS = _register(Histogram(
+    'metarep_http_request_duration_seconds', 'Время обработки HTTP запроса', ('route', 'method', 'status')))
+
+DB_QUERY_SECONDS = _register(Histogram(
+    'metarep_db_query_duration_seconds', 'Время выполнения SQL запроса', ('query',)))
+
+DB_POOL_WAIT_SECONDS = _register(Histogram(
+    'metarep_db_pool_wait_seconds', 'Ожидание соединения из пула (включая открытие нового)', ('pool',)))
+
+CACHE_REQUESTS = _register(Counter(
+    'metarep_cache_requests_total', 'Обращения к кэшам', ('cache', 'result')))
+
+CACHE_EVICTIONS = _register(Counter(
+    'metarep_cache_evictions_total', 'Вытеснения из кэшей', ('cache',)))
+
+COALESCED_CALLS = _register(Counter(
+    'metarep_coalesced_calls_total',
+    'Вызовы DataService: executed - выполнены, joined - дождались одинакового выполняющегося',
+    ('method', 'role')))
+
+ADMISSION_REQUESTS = _register(Counter(
+    'metarep_admission_requests_total',
+    'Тяжелые запросы: admitted, rejected_queue_full, rejected_timeout', ('class', 'result')))
+
+ADMISSION_WAIT_SECONDS = _register(Histogram(
+    'metarep_admission_wait_seconds', 'Ожидание допуска тяжелого запроса в очереди', ('class',)))
+
+CANCELLED_REQUESTS = _register(Counter(
+    'metarep_cancelled_requests_total',
+    'Запросы, SQL которых отменен: budget - истек бюджет времени, disconnect - клиент ушел',
+    ('class', 'reason')))
+
+JOB_SECONDS = _register(Histogram(
+    'metarep_job_duration_seconds', 'Длительность выгрузок и служебных операций', ('job',), JOB_BUCKETS))
+
+
+def cache_hit(cache: str):
+    CACHE_REQUESTS.inc(cache, 'hit')
+
+
+def cache_miss(cache: str):
+    CACHE_REQUESTS.inc(cache, 'miss')
+
+
+def cache_eviction(cache: str, count: int = 1):
+    CACHE_EVICTIONS.inc(cache, amount=count)
+
+
+@contextmanager
+def track_job(job: str):
+    """Замер длительности выгрузки или служебной операции (учитывается и при ошибке)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        JOB_SECONDS.observe(time.perf_counter() - started, job)
+
+
+_SQL_TABLE = re.compile(r'\b(?:from|into|update|join)\s+([a-z_][a-z0-9_.]*)', re.IGNORECASE)
+_query_names: Dict[str, str] = {}
+
+
+def query_name(sql: str) -> str:
+    """
+    Короткое имя запроса для метки: операция, первая таблица и хэш текста
+    (вида "select sxattr_source #1a2b3c"); число разных имен равно числу разных запросов в коде
+    """
+    name = _query_names.get(sql)
+    if name is None:
+        words = sql.split(None, 1)
+        operation = words[0].lower() if words else ''
+        match = _SQL_TABLE.search(sql)
+        table = match.group(1).lower() if match else '-'
+        digest = hashlib.sha1(sql.encode('utf-8')).hexdigest()[:6]
+        name = f"{operation} {table} #{digest}"
+        if len(_query_names) < 10000:
+            _query_names[sql] = name
+    return name
+
+
+def register_gauge(name: str, documentation: str, labels: Sequence[str],
+                   callback: Callable[[], Iterable[Tuple[LabelValues, float]]]) -> Gauge:
+    """Метрика, значения которой вычисляются при чтении /metrics"""
+    return _register(Gauge(name, documentation, labels, callback))
+
+
+def register_counter_func(name: str, documentation: str, labels: Sequence[str],
+                          callback: Callable[[], Iterable[Tuple[LabelValues, float]]]) -> CounterFunc:
+    """Счетчик, значения которого (монотонные итоги) вычисляются при чтении /metrics"""
+    return _register(CounterFunc(name, documentation, labels, callback))
+
+
+def jvm_samples(kind: str) -> List[Tuple[LabelValues, float]]:
+    """Heap и GC запущенной JVM через JMX (ManagementFactory); пусто если JVM не запущена"""
+    import jpype
+    if not jpype.isJVMStarted():
+        return []
+    from java.lang.management import ManagementFactory
+
+    if kind == 'memory':
+        samples = []
+        memory = ManagementFactory.getMemoryMXBean()
+        for area, usage in (('heap', memory.getHeapMemoryUsage()), ('nonheap', memory.getNonHeapMemoryUsage())):
+            samples.append(((area, 'used'), float(usage.getUsed())))
+            samples.append(((area, 'committed'), float(usage.getCommitted())))
+            if usage.getMax() >= 0:
+                samples.append(((area, 'max'), float(usage.getMax())))
+        return samples
+
+    samples = []
+    for collector in ManagementFactory.getGarbageCollectorMXBeans():
+        name = str(collector.getName())
+        if kind == 'gc_count':
+            samples.append(((name,), float(collector.getCollectionCount())))
+        else:
+            samples.append(((name,), collector.getCollectionTime() / 1000.0))
+    return samples
+
+
+def _optional(callback: Callable[[], Iterable]) -> Callable[[], Iterable]:
+    """JVM метрики доступны только при установленном jpype"""
+    def wrapper():
+        try:
+            return callback()
+        except ImportError:
+            return []
+    return wrapper
+
+
+register_gauge('metarep_jvm_memory_bytes', 'Память JVM (JMX MemoryMXBean)', ('area', 'kind'),
+               _optional(lambda: jvm_samples('memory')))
+register_counter_func('metarep_jvm_gc_collections_total', 'Число сборок мусора по сборщикам', ('gc',),
+                      _optional(lambda: jvm_samples('gc_count')))
+register_counter_func('metarep_jvm_gc_seconds_total', 'Суммарное время сборок мусора', ('gc',),
+                      _optional(lambda: jvm_samples('gc_time')))
@@ -0,0 +1,146 @@
+"""
+Профилирование отдельного HTTP запроса по требованию администратора
+
+    GET /attributes?...&__profile=1          (заголовок X-Profile-Token: PROFILE_TOKEN)
+    GET /attributes?...&__profile=folded     профиль вместо ответа
+
+Во время запроса отдельный поток раз в PROFILE_INTERVAL_MS снимает стек потока
+запроса (sys._current_frames). Стеки сохраняются в формате collapsed stacks
+("func1;func2;func3 N" - flamegraph.pl, speedscope, inferno), время по фазам
+(SQL, JDBC, шаблоны, Python) оценивается по доле выборок. Без токена или без
+параметра запрос не профилируется и дополнительных затрат нет
+"""
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from config import config
+
+# Фаза по файлу кадра: проверяются от вершины стека вниз, первое совпадение определяет фазу
+PHASE_MARKERS = (
+    ('render', ('jinja2', 'templates')),
+    ('jdbc', ('jpype',)),
+    ('db', ('database_manager.py', 'psycopg', 'db_broker.py', 'instrumentation.py')),
+    ('excel', ('openpyxl',)),
+)
+PROFILE_PHASES = ('db', 'jdbc', 'render', 'excel', 'python')
+
+
+def is_requested(value: Optional[str], token: Optional[str]) -> bool:
+    """Запрошено ли профилирование и совпадает ли токен администратора"""
+    if not value or not config.profiling.token or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), config.profiling.token.encode('utf-8'))
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _phase(filenames: List[str]) -> str:
+    for filename in reversed(filenames):
+        for phase, markers in PHASE_MARKERS:
+            if any(marker in filename for marker in markers):
+                return phase
+    return 'python'
+
+
+class SamplingProfiler:
+    """Выборочный профилировщик одного потока"""
+
+    def __init__(self, thread_id: int = None, interval_ms: int = None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = (interval_ms or config.profiling.interval_ms) / 1000
+        self.stacks: Counter = Counter()
+        self.phases: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SamplingProfiler':
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == own:
+                continue
+            labels, filenames = [], []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                filenames.append(frame.f_code.co_filename)
+                frame = frame.f_back
+            labels.reverse()
+            filenames.reverse()
+            self.stacks[';'.join(labels)] += 1
+            self.phases[_phase(filenames)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Стеки в формате collapsed stacks"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def phase_seconds(self) -> Dict[str, float]:
+        """Оценка времени фаз по доле выборок"""
+        if not self.samples:
+            return {}
+        return {phase: self.elapsed * self.phases[phase] / self.samples
+                for phase in PROFILE_PHASES if self.phases.get(phase)}
+
+    def server_timing(self) -> str:
+        """Фазы профиля для заголовка Server-Timing"""
+        metrics = [f"prof-{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phase_seconds().items()]
+        metrics.append(f'prof;desc="{self.samples} samples"')
+        return ', '.join(metrics)
+
+    def save(self, name: str, details: Dict[str, Any] = None) -> str:
+        """
+        Профиль (<name>.folded) и сводка (<name>.json) в PROFILE_DIR;
+        старые профили сверх PROFILE_KEEP удаляются. Возвращает путь к профилю
+        """
+        directory = config.profiling.directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+        summary = dict(details or {})
+        summary.update({
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'samples': self.samples,
+            'interval_ms': round(self.interval * 1000, 1),
+            'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in self.phase_seconds().items()},
+        })
+        with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+        _prune(directory, config.profiling.keep)
+        return path
+
+
+def _prune(directory: str, keep: int):
+    """Удаление самых старых профилей"""
+    profiles = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.folded')),
+                      key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:max(0, len(profiles) - keep)]:
+        for path in (entry.path, entry.path[:-len('.folded')] + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
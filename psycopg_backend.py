@@ -0,0 +1,311 @@
+"""
+Backend выполнения запросов через psycopg (без JVM)
+Включается DB_BACKEND=psycopg; требует пакета psycopg (pip install "psycopg[binary]")
+
+Запросы приложения пишутся с плейсхолдерами ? (как для JDBC) и переводятся
+в формат psycopg (%s); значения строк приводятся к тем же строкам, что
+возвращает JDBC backend (toString), чтобы DataService работал одинаково
+"""
+import datetime
+import json
+import logging
+import select
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import psycopg
+
+from database_manager import get_pool, ConnectionPool
+from instrumentation import add_phase
+import query_budget
+
+
+def convert_placeholders(query: str) -> str:
+    """
+    Перевод плейсхолдеров ? в %s с учетом строк, идентификаторов и комментариев
+    Знаки ? внутри '...', E'...', "...", $$...$$ и комментариев не трогаются;
+    все % удваиваются, т.к. psycopg разбирает их во всем тексте запроса
+    """
+    result = []
+    i = 0
+    length = len(query)
+    while i < length:
+        char = query[i]
+        if char == "'":
+            # Строка; E'...' допускает экранирование обратной косой чертой
+            escaped = i > 0 and query[i - 1] in 'eE'
+            end = i + 1
+            while end < length:
+                if escaped and query[end] == '\\':
+                    end += 2
+                    continue
+                if query[end] == "'":
+                    if end + 1 < length and query[end + 1] == "'":
+                        end += 2
+                        continue
+                    break
+                end += 1
+            result.append(query[i:end + 1].replace('%', '%%'))
+            i = end + 1
+        elif char == '"':
+            end = query.find('"', i + 1)
+            end = length if end == -1 else end
+            result.append(query[i:end + 1].replace('%', '%%'))
+            i = end + 1
+        elif char == '$' and (i == 0 or not (query[i - 1].isalnum() or query[i - 1] == '_')):
+            # Строка в долларовых кавычках $tag$...$tag$
+            tag_end = query.find('$', i + 1)
+            tag = query[i:tag_end + 1] if tag_end != -1 else ''
+            if tag and (tag == '$$' or tag[1:-1].replace('_', 'a').isalnum()):
+                end = query.find(tag, tag_end + 1)
+                end = length if end == -1 else end + len(tag)
+                result.append(query[i:end].replace('%', '%%'))
+                i = end
+            else:
+                result.append(char)
+                i += 1
+        elif query.startswith('--', i):
+            end = query.find('\n', i)
+            end = length if end == -1 else end
+            result.append(query[i:end].replace('%', '%%'))
+            i = end
+        elif query.startswith('/*', i):
+            end = query.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            result.append(query[i:end].replace('%', '%%'))
+            i = end
+        elif char == '?':
+            result.append('%s')
+            i += 1
+        elif char == '%':
+            result.append('%%')
+            i += 1
+        else:
+            result.append(char)
+            i += 1
+    return ''.join(result)
+
+
+def to_jdbc_text(value) -> Optional[str]:
+    """Значение psycopg в виде строки, совпадающей с toString() JDBC драйвера"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime.datetime):
+        # java.sql.Timestamp: локальное время, дробная часть без хвостовых нулей (минимум .0)
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        fraction = f"{value.microsecond:06d}".rstrip('0') or '0'
+        return f"{value:%Y-%m-%d %H:%M:%S}.{fraction}"
+    if isinstance(value, (dict, list)):
+        # json/jsonb: JDBC возвращает текст JSON
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class PsycopgConnection:
+    """Соединение psycopg в пуле (тот же протокол, что у PooledConnection)"""
+
+    def __init__(self, connection, statement_timeout: Optional[int] = None):
+        self.connection = connection
+        self.last_used = time.monotonic()
+        # Текущий statement_timeout сессии, сек (None - неизвестен после отката)
+        self.statement_timeout = statement_timeout
+
+    def is_usable(self, validation_interval: int) -> bool:
+        if self.connection.closed or self.connection.broken:
+            return False
+        if time.monotonic() - self.last_used > validation_interval:
+            try:
+                self.connection.execute("SELECT 1")
+            except Exception:
+                return False
+        return True
+
+    def reset(self):
+        if self.connection.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            self.connection.rollback()
+            self.statement_timeout = None
+        self.connection.autocommit = True
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class PsycopgListener:
+    """LISTEN на отдельном соединении вне пула; уведомления читаются через libpq"""
+
+    def __init__(self, connection, channel: str):
+        self.connection = connection
+        connection.execute(f"LISTEN {channel}")
+
+    def poll(self, timeout: float) -> List[str]:
+        pgconn = self.connection.pgconn
+        ready, _, _ = select.select([pgconn.socket], [], [], timeout)
+        if ready:
+            # Обрыв соединения - исключение psycopg
+            pgconn.consume_input()
+        payloads = []
+        notification = pgconn.notifies()
+        while notification is not None:
+            payloads.append(notification.extra.decode('utf-8'))
+            notification = pgconn.notifies()
+        return payloads
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class PsycopgBackend:
+    """
+    Выполнение запросов через psycopg
+    Подготовленные запросы кэшируются самим psycopg (prepare_threshold)
+    """
+
+    name = 'psycopg'
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._local = threading.local()
+        self._running: Dict[int, psycopg.Connection] = {}  # Соединение с выполняющимся запросом по потокам
+
+    @property
+    def pool(self) -> ConnectionPool:
+        key = (self.name, self.db_config.host, self.db_config.port,
+               self.db_config.database, self.db_config.username)
+        return get_pool(key, self._open_connection)
+
+    @property
+    def connection(self):
+        pooled = getattr(self._local, 'pooled', None)
+        return pooled.connection if pooled else None
+
+    def connect(self):
+        self._local.pooled = self.pool.acquire()
+
+    def disconnect(self):
+        pooled = getattr(self._local, 'pooled', None)
+        if pooled:
+            self._local.pooled = None
+            self.pool.release(pooled)
+
+    def discard(self):
+        pooled = getattr(self._local, 'pooled', None)
+        if pooled:
+            self._local.pooled = None
+            self.pool.discard(pooled)
+
+    def is_connection_error(self, error: Exception) -> bool:
+        # QueryCanceled - подкласс OperationalError, но соединение после него исправно
+        if query_budget.is_cancellation(error):
+            return False
+        connection = self.connection
+        return isinstance(error, psycopg.OperationalError) or (connection is not None and connection.broken)
+
+    def cancel(self, thread_id: int) -> bool:
+        """Отмена запроса, выполняющегося в потоке thread_id (вызывается из другого потока)"""
+        connection = self._running.get(thread_id)
+        if connection is None:
+            return False
+        connection.cancel()
+        return True
+
+    @contextmanager
+    def _executing(self):
+        """
+        Запрос выполняется в текущем потоке: statement_timeout сессии по бюджету
+        (SET только при изменении) и регистрация соединения для cancel()
+        """
+        pooled = self._local.pooled
+        timeout = query_budget.statement_timeout(self.db_config.query_timeout)
+        if pooled.statement_timeout != timeout:
+            pooled.connection.execute(f"SET statement_timeout = {int(timeout) * 1000}")
+            pooled.statement_timeout = timeout
+        thread_id = threading.get_ident()
+        self._running[thread_id] = pooled.connection
+        try:
+            yield
+        finally:
+            self._running.pop(thread_id, None)
+
+    def query(self, query: str, params: Optional[List]) -> List[List]:
+        with self._executing(), self.connection.cursor() as cursor:
+            started = time.perf_counter()
+            self._execute(cursor, query, params)
+            executed = time.perf_counter()
+            add_phase('execute', executed - started)
+            if cursor.description is None:
+                return []
+            rows = cursor.fetchall()
+            fetched = time.perf_counter()
+            add_phase('fetch', fetched - executed)
+            result = [[to_jdbc_text(value) for value in row] for row in rows]
+            add_phase('convert', time.perf_counter() - fetched)
+            return result
+
+    def update(self, query: str, params: Optional[List]) -> int:
+        with self._executing(), self.connection.cursor() as cursor:
+            self._execute(cursor, query, params)
+            return max(cursor.rowcount, 0)
+
+    def batch(self, query: str, rows: List[List], batch_size: int) -> int:
+        """Пакетное выполнение; psycopg отправляет executemany одним конвейером (pipeline)"""
+        total = 0
+        converted = convert_placeholders(query)
+        with self._executing(), self.connection.cursor() as cursor:
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(converted, rows[i:i + batch_size])
+                total += max(cursor.rowcount, 0)
+        return total
+
+    def begin(self):
+        self.connection.autocommit = False
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+        # SET statement_timeout внутри отмененной транзакции тоже откатывается
+        self._local.pooled.statement_timeout = None
+
+    def end_transaction(self):
+        self.connection.autocommit = True
+
+    @staticmethod
+    def _execute(cursor, query: str, params: Optional[List]):
+        if params is None:
+            # Без параметров psycopg не разбирает плейсхолдеры, текст передается как есть
+            cursor.execute(query)
+        else:
+            cursor.execute(convert_placeholders(query), params)
+
+    def open_listener(self, channel: str) -> PsycopgListener:
+        return PsycopgListener(self._open_connection().connection, channel)
+
+    def _open_connection(self) -> PsycopgConnection:
+        self.logger.info(f"psycopg: {self.db_config.host}:{self.db_config.port}/{self.db_config.database}")
+        connection = psycopg.connect(
+            host=self.db_config.host,
+            port=self.db_config.port,
+            dbname=self.db_config.database,
+            user=self.db_config.username,
+            password=self.db_config.password,
+            connect_timeout=self.db_config.connection_timeout,
+            # Аналог setQueryTimeout/socketTimeout JDBC
+            options=f"-c statement_timeout={self.db_config.query_timeout * 1000}",
+            autocommit=True
+        )
+        connection.prepare_threshold = self.db_config.prepare_threshold
+        self.logger.info("✅ psycopg соединение установлено успешно!")
+        return PsycopgConnection(connection, self.db_config.query_timeout)
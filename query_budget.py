@@ -0,0 +1,263 @@
+"""
+Бюджет времени HTTP запроса и отмена его SQL запросов
+
+Каждый HTTP запрос получает бюджет по классу маршрута: REQUEST_BUDGET для
+обычных страниц и API, ANALYSIS_BUDGET, EXPORT_BUDGET, SCRIPTS_BUDGET для
+тяжелых (классы admission.py). Бюджет меньше proxy_read_timeout nginx: после
+него ответ все равно никто не получит. Бюджет действует так:
+- таймаут каждого SQL запроса - бюджет класса, но не больше DB_QUERY_TIMEOUT
+  (setQueryTimeout JDBC, statement_timeout psycopg, передается брокеру);
+- после истечения бюджета или отмены следующие SQL запросы сразу завершаются
+  QueryCancelled, не занимая соединение и БД;
+- сторожевой поток раз в WATCHDOG_INTERVAL проверяет запросы и отменяет
+  выполняющийся SQL через backend.cancel() (Statement.cancel() JDBC, cancel
+  psycopg, операция cancel брокера), если бюджет истек или клиент закрыл
+  соединение (CANCEL_ON_DISCONNECT; nginx закрывает соединение с приложением,
+  когда уходит браузер или истекает proxy_read_timeout)
+
+Вне HTTP запроса (manage.py, загрузка данных, брокер без override_timeout)
+действует только DB_QUERY_TIMEOUT
+"""
+import contextvars
+import logging
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Set
+
+from config import config
+import instrumentation
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WATCHDOG_INTERVAL = 1.0  # Период проверки бюджетов и соединений клиентов, сек
+QUERY_CANCELED = '57014'  # SQLSTATE отмены запроса (cancel или statement_timeout)
+
+_current: contextvars.ContextVar = contextvars.ContextVar('query_budget', default=None)
+_timeout_override: contextvars.ContextVar = contextvars.ContextVar('statement_timeout', default=None)
+_PEEK_FLAGS = socket.MSG_PEEK | getattr(socket, 'MSG_DONTWAIT', 0)
+
+
+class QueryCancelled(Exception):
+    """SQL запрос отменен: истек бюджет времени (budget) или клиент закрыл соединение (disconnect)"""
+
+    MESSAGES = {
+        'budget': "превышено время выполнения запроса",
+        'disconnect': "клиент закрыл соединение",
+    }
+
+    def __init__(self, reason: str):
+        super().__init__(f"Запрос отменен: {self.MESSAGES.get(reason, reason)}")
+        self.reason = reason
+
+
+def budget_seconds(route_class: str) -> int:
+    """Бюджет класса маршрута (interactive, analysis, export, scripts), сек; 0 - без бюджета"""
+    settings = config.performance
+    return {
+        'analysis': settings.analysis_budget,
+        'export': settings.export_budget,
+        'scripts': settings.scripts_budget,
+    }.get(route_class, settings.request_budget)
+
+
+class Budget:
+    """Бюджет одного HTTP запроса и его выполняющийся SQL запрос"""
+
+    def __init__(self, route_class: str, seconds: int, path: str = '', client=None, elapsed: float = 0.0):
+        self.route_class = route_class
+        self.seconds = seconds
+        self.path = path
+        self.client = client  # Сокет клиента (WSGI environ) для проверки ухода клиента
+        self.deadline = time.monotonic() + seconds - elapsed if seconds else None
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._running = None  # (backend, thread_id) выполняющегося SQL запроса
+
+    @property
+    def running(self) -> bool:
+        return self._running is not None
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def enter(self, backend):
+        """Начало SQL запроса в текущем потоке; QueryCancelled - бюджет уже исчерпан"""
+        if self.reason is None and self.expired():
+            self.cancel('budget')
+        with self._lock:
+            if self.reason is None:
+                previous, self._running = self._running, (backend, threading.get_ident())
+                return previous
+        instrumentation.record_error()
+        raise QueryCancelled(self.reason)
+
+    def leave(self, previous):
+        with self._lock:
+            self._running = previous
+
+    def cancel(self, reason: str):
+        """
+        Отмена запроса (из любого потока): выполняющийся SQL прерывается, следующие
+        не начинаются. Повторный вызов повторяет отмену выполняющегося SQL
+        """
+        with self._lock:
+            first = self.reason is None
+            if first:
+                self.reason = reason
+            running = self._running
+        if first:
+            metrics.CANCELLED_REQUESTS.inc(self.route_class, self.reason)
+            logger.warning("⏹️ Отмена SQL запросов (%s, %s): %s", self.reason, self.route_class, self.path)
+        if running is not None:
+            backend, thread_id = running
+            try:
+                backend.cancel(thread_id)
+            except Exception as e:
+                logger.warning("⚠️ Не удалось отменить SQL запрос: %s", e)
+
+
+def _client_gone(client) -> bool:
+    """Закрыл ли клиент соединение: сокет читается, но данных нет (EOF)"""
+    try:
+        readable, _, _ = select.select([client], [], [], 0)
+        if not readable:
+            return False
+        return client.recv(1, _PEEK_FLAGS) == b''
+    except (BlockingIOError, ValueError):
+        # ValueError - сокет уже закрыт сервером или не поддерживает MSG_PEEK (SSL)
+        return False
+    except OSError:
+        return True
+
+
+class _Watchdog:
+    """Фоновый поток: отмена SQL запросов с истекшим бюджетом и ушедших клиентов"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budgets: Set[Budget] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, budget: Budget):
+        with self._lock:
+            self._budgets.add(budget)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-budget-watchdog', daemon=True)
+                self._thread.start()
+
+    def discard(self, budget: Budget):
+        with self._lock:
+            self._budgets.discard(budget)
+
+    def _run(self):
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            with self._lock:
+                budgets = list(self._budgets)
+            for budget in budgets:
+                if budget.reason is None and budget.client is not None \
+                        and config.performance.cancel_on_disconnect and _client_gone(budget.client):
+                    budget.cancel('disconnect')
+                elif budget.running and (budget.reason is not None or budget.expired()):
+                    # Отмена могла прийти до того, как backend зарегистрировал statement
+                    budget.cancel('budget')
+
+
+_watchdog = _Watchdog()
+
+
+def client_socket(environ):
+    """Сокет клиента из WSGI environ (gunicorn или сервер werkzeug), None - недоступен"""
+    return environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+
+
+def start(route_class: str, path: str = '', client=None, elapsed: float = 0.0) -> Budget:
+    """Бюджет текущего HTTP запроса; elapsed - уже прошедшее время запроса (ожидание допуска)"""
+    budget = Budget(route_class, budget_seconds(route_class), path, client, elapsed)
+    _current.set(budget)
+    if budget.deadline is not None or client is not None:
+        _watchdog.add(budget)
+    return budget
+
+
+def finish():
+    budget = _current.get()
+    if budget is not None:
+        _current.set(None)
+        _watchdog.discard(budget)
+
+
+def current() -> Optional[Budget]:
+    return _current.get()
+
+
+def cancelled() -> bool:
+    """Отменен ли текущий HTTP запрос"""
+    budget = _current.get()
+    return budget is not None and budget.reason is not None
+
+
+def statement_timeout(default: int) -> int:
+    """Таймаут SQL запроса в текущем контексте, сек: бюджет класса, но не больше default"""
+    override = _timeout_override.get()
+    if override:
+        return override
+    budget = _current.get()
+    if budget is not None and budget.seconds:
+        return max(1, min(default, budget.seconds))
+    return default
+
+
+@contextmanager
+def override_timeout(seconds: Optional[int]):
+    """Таймаут SQL запросов, переданный клиентом (брокер выполняет запросы воркера)"""
+    token = _timeout_override.set(seconds)
+    try:
+        yield
+    finally:
+        _timeout_override.reset(token)
+
+
+@contextmanager
+def running(backend):
+    """SQL запрос текущего HTTP запроса выполняется через backend: его можно отменить"""
+    budget = _current.get()
+    if budget is None:
+        yield
+        return
+    previous = budget.enter(backend)
+    try:
+        yield
+    finally:
+        budget.leave(previous)
+
+
+def is_cancellation(error: Exception) -> bool:
+    """Ошибка - отмена SQL запроса (cancel, statement_timeout или QueryCancelled)"""
+    if isinstance(error, QueryCancelled) or getattr(error, 'cancelled', False):
+        return True
+    sqlstate = getattr(error, 'sqlstate', None)
+    if sqlstate is None and hasattr(error, 'getSQLState'):
+        try:
+            sqlstate = error.getSQLState()
+        except Exception:
+            sqlstate = None
+    return sqlstate == QUERY_CANCELED or 'canceling statement' in str(error).lower()
+
+
+def cancellation_error(error: Exception) -> Exception:
+    """
+    Исключение для отмененного SQL запроса: в HTTP запросе - QueryCancelled с
+    причиной (таймаут запроса = бюджет класса, значит бюджет исчерпан), вне его - исходное
+    """
+    if isinstance(error, QueryCancelled):
+        return error
+    budget = _current.get()
+    if budget is None:
+        return error
+    budget.cancel('budget')
+    return QueryCancelled(budget.reason)
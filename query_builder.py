@@ -0,0 +1,93 @@
+"""
+Построитель параметризованных SQL условий для DataService
+Значения фильтров передаются как параметры PreparedStatement,
+а не подставляются в текст запроса через f-строки
+"""
+from typing import Any, List, Optional, Sequence
+
+# Колонки, по которым выполняется поиск для каждого типа сущности
+CLASS_SEARCH_COLUMNS = ('name', 'description')
+GROUP_SEARCH_COLUMNS = ('name', 'title')
+ATTRIBUTE_SEARCH_COLUMNS = ('name', 'title', 'description')
+
+# Триграммные GIN индексы для поиска: таблица -> индекс и колонки в выражении
+SEARCH_INDEXES = {
+    'sxclass_source': ('idx_sxclass_source_search_trgm', CLASS_SEARCH_COLUMNS),
+    'sxattr_grp_source': ('idx_sxattr_grp_source_search_trgm', GROUP_SEARCH_COLUMNS),
+    'sxattr_source': ('idx_sxattr_source_search_trgm', ATTRIBUTE_SEARCH_COLUMNS),
+}
+
+
+def search_expression(columns: Sequence[str]) -> str:
+    """
+    Склейка колонок поиска в одно выражение
+    Должно в точности совпадать с выражением индекса, иначе планировщик его не использует;
+    колонки разделены переводом строки, чтобы строка поиска не совпадала на стыке полей
+    """
+    return " || E'\\n' || ".join(f"coalesce({column}, '')" for column in columns)
+
+
+class QueryBuilder:
+    """Накопитель условий WHERE и параметров к ним (плейсхолдеры ?)"""
+
+    def __init__(self):
+        self.conditions: List[str] = []
+        self.params: List[Any] = []
+
+    def add(self, condition: str, *params) -> 'QueryBuilder':
+        """Добавление произвольного условия с плейсхолдерами ?"""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def add_equals(self, column: str, value: Any) -> 'QueryBuilder':
+        """Условие равенства; пропускается если значение не задано"""
+        if value is not None:
+            self.add(f"{column} = ?", value)
+        return self
+
+    def add_search(self, columns: Sequence[str], search: Optional[str],
+                   trigram: bool = False) -> 'QueryBuilder':
+        """
+        Поиск подстроки (ILIKE '%...%') по нескольким колонкам
+        
+        trigram=True - одно условие по склеенному выражению колонок,
+        которое обслуживается триграммным GIN индексом; иначе OR по колонкам
+        """
+        if search:
+            pattern = f"%{search}%"
+            if trigram:
+                self.add(f"({search_expression(columns)}) ILIKE ?", pattern)
+            else:
+                condition = " OR ".join(f"{column} ILIKE ?" for column in columns)
+                self.add(f"({condition})", *([pattern] * len(columns)))
+        return self
+
+    def where_clause(self) -> str:
+        """Готовое выражение для WHERE"""
+        return " AND ".join(self.conditions) if self.conditions else "1=1"
+
+
+def build_filters(alias: Optional[str], search_columns: Sequence[str],
+                  search: str = None, status_variance: int = None,
+                  event: int = None, a_priznak: int = None,
+                  class_column: str = None, class_ouid: int = None,
+                  trigram: bool = False) -> QueryBuilder:
+    """
+    Общий набор фильтров страниц: класс, поиск, статус, событие, признак
+
+    alias - псевдоним таблицы в запросе (c, g, a, s) или None
+    trigram - искать по выражению триграммного индекса (см. SEARCH_INDEXES)
+    """
+    prefix = f"{alias}." if alias else ""
+    builder = QueryBuilder()
+
+    if class_column and class_ouid is not None:
+        builder.add_equals(f"{prefix}{class_column}", int(class_ouid))
+
+    builder.add_search([f"{prefix}{column}" for column in search_columns], search, trigram)
+    builder.add_equals(f"{prefix}a_status_variance", status_variance)
+    builder.add_equals(f"{prefix}a_event", event)
+    builder.add_equals(f"{prefix}a_priznak", a_priznak)
+
+    return builder
@@ -0,0 +1,125 @@
+"""
+Рекомендуемые индексы для таблиц источника, назначения и __meta_statistic
+Используется командой manage.py indexes
+"""
+from dataclasses import dataclass
+from typing import Dict, List
+
+from query_builder import SEARCH_INDEXES, search_expression
+
+
+@dataclass
+class IndexSpec:
+    """Описание рекомендуемого индекса"""
+    name: str
+    table: str
+    definition: str  # Всё после ON <table>, например "(cls, name)" или "USING gin (...)"
+    reason: str
+
+    def create_sql(self, concurrently: bool = True) -> str:
+        mode = "CONCURRENTLY " if concurrently else ""
+        return f"CREATE INDEX {mode}IF NOT EXISTS {self.name} ON {self.table} {self.definition}"
+
+
+RECOMMENDED_INDEXES: List[IndexSpec] = [
+    # Классы источника
+    IndexSpec('idx_sxclass_source_name', 'sxclass_source', '(name)',
+              'сортировка списка классов, поиск по имени'),
+    IndexSpec('idx_sxclass_source_variance_event', 'sxclass_source', '(a_status_variance, a_event)',
+              'фильтры статуса и события, анализ различий'),
+    IndexSpec('idx_sxclass_source_priznak', 'sxclass_source', '(a_priznak)',
+              'фильтр по признаку'),
+
+    # Группы атрибутов источника
+    IndexSpec('idx_sxattr_grp_source_cls', 'sxattr_grp_source', '(cls)',
+              'группы класса на странице деталей'),
+    IndexSpec('idx_sxattr_grp_source_cls_variance_event', 'sxattr_grp_source',
+              '(cls, a_status_variance, a_event)', 'различия групп класса'),
+    IndexSpec('idx_sxattr_grp_source_priznak', 'sxattr_grp_source', '(a_priznak)',
+              'фильтр по признаку'),
+
+    # Атрибуты источника
+    IndexSpec('idx_sxattr_source_class', 'sxattr_source', '(ouidsxclass)',
+              'атрибуты класса, join с sxclass_source'),
+    IndexSpec('idx_sxattr_source_class_variance_event', 'sxattr_source',
+              '(ouidsxclass, a_status_variance, a_event)', 'различия атрибутов класса'),
+    IndexSpec('idx_sxattr_source_variance_event', 'sxattr_source', '(a_status_variance, a_event)',
+              'фильтры статуса и события на странице атрибутов'),
+    IndexSpec('idx_sxattr_source_priznak', 'sxattr_source', '(a_priznak)',
+              'фильтр по признаку'),
+
+    # Таблицы назначения (поиск OUID для ссылок в админку)
+    IndexSpec('idx_sxclass_name', 'sxclass', '(name)',
+              'поиск класса назначения по имени'),
+    IndexSpec('idx_sxattr_class_name', 'sxattr', '(ouidsxclass, name)',
+              'поиск атрибута назначения по классу и имени'),
+    IndexSpec('idx_sxattr_name', 'sxattr', '(name)',
+              'маппинг поля по имени свойства'),
+    IndexSpec('idx_sxattr_grp_cls_name', 'sxattr_grp', '(cls, name)',
+              'поиск группы назначения по классу и имени'),
+
+    # Исключения: (entity_type, entity_name) покрывается UNIQUE ограничением таблицы
+    IndexSpec('idx_meta_statistic_type_property', '__meta_statistic', '(entity_type, property_name)',
+              'поиск исключения по описанию свойства'),
+]
+
+# Триграммные индексы поиска (см. query_builder.SEARCH_INDEXES)
+RECOMMENDED_INDEXES += [
+    IndexSpec(index_name, table, f"USING gin (({search_expression(columns)}) gin_trgm_ops)",
+              'поиск подстроки по name/title/description')
+    for table, (index_name, columns) in SEARCH_INDEXES.items()
+]
+
+
+def get_index_status(db_manager) -> Dict[str, bool]:
+    """Существующие рекомендуемые индексы: имя -> валиден ли индекс"""
+    names = [spec.name for spec in RECOMMENDED_INDEXES]
+    query = f"""
+        SELECT c.relname, i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname IN ({', '.join('?' for _ in names)})
+    """
+    result = db_manager.execute_query(query, names)
+    return {row[0]: row[1] in ('t', 'true') for row in result}
+
+
+def ensure_indexes(db_manager, create: bool = True, concurrently: bool = True) -> List[Dict[str, str]]:
+    """
+    Проверка (и создание) рекомендуемых индексов
+
+    Возвращает отчёт по каждому индексу: status = ok | created | missing | invalid | failed
+    Невалидный индекс (остаток прерванного CREATE INDEX CONCURRENTLY) не пересоздаётся
+    автоматически - его нужно удалить вручную
+    """
+    status = get_index_status(db_manager)
+    report = []
+    created_tables = set()
+
+    for spec in RECOMMENDED_INDEXES:
+        entry = {'name': spec.name, 'table': spec.table, 'reason': spec.reason}
+        if spec.name in status:
+            entry['status'] = 'ok' if status[spec.name] else 'invalid'
+        elif not create:
+            entry['status'] = 'missing'
+        else:
+            try:
+                if spec.definition.startswith('USING gin') and 'gin_trgm_ops' in spec.definition:
+                    db_manager.execute_update("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                # CONCURRENTLY не блокирует запись, но работает только вне транзакции (autocommit)
+                db_manager.execute_update(spec.create_sql(concurrently))
+                entry['status'] = 'created'
+                created_tables.add(spec.table)
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+        report.append(entry)
+
+    # Обновляем статистику планировщика для таблиц с новыми индексами
+    for table in sorted(created_tables):
+        try:
+            db_manager.execute_update(f"ANALYZE {table}")
+        except Exception:
+            pass
+
+    return report
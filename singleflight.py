@@ -0,0 +1,139 @@
+"""
+Объединение одинаковых одновременных вызовов DataService (single-flight, COALESCE_CALLS)
+
+    @coalesce
+    def get_attributes(self, page=1, per_page=20, ...): ...
+
+Ключ вызова - имя метода, экземпляр сервиса и значения всех аргументов с учетом
+значений по умолчанию (get_attributes(1, 20) и get_attributes(page=1) совпадают).
+Пока вызов с таким ключом выполняется, остальные потоки не идут в БД, а ждут
+его и получают тот же результат (или то же исключение). Результат вызова хранится
+нетронутым, а каждый получатель, включая выполнивший вызов поток, получает
+свою глубокую копию - вызывающий код может свободно менять результат. Без
+ожидавших копия не делается.
+Если HTTP запрос, выполнявший вызов, отменен (query_budget.py), ожидавшие
+выполняют вызов сами
+"""
+import copy
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+from config import config
+import instrumentation
+import metrics
+import query_budget
+
+
+class _Flight:
+    """Выполняющийся вызов: результат ждут присоединившиеся потоки"""
+
+    __slots__ = ('thread', 'done', 'result', 'error', 'joiners')
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.joiners = 0
+
+
+class SingleFlight:
+    """Группа вызовов: do(key, func) выполняет func один раз на все одновременные вызовы с key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any]):
+        """
+        Возвращает (результат, выполнен ли вызов в этом потоке); если результат
+        получили несколько потоков, каждому достается своя глубокая копия
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            # Повторный вызов с тем же ключом внутри выполняемого - без объединения
+            reentrant = flight is not None and flight.thread == threading.get_ident()
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            elif not reentrant:
+                flight.joiners += 1
+
+        if reentrant:
+            return func(), True
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result), False
+
+        try:
+            flight.result = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                # После удаления из словаря новых ожидающих быть не может
+                shared = flight.joiners > 0
+            flight.done.set()
+        if shared:
+            # Ожидавшие копируют хранимый результат уже после возврата: он не должен меняться
+            return copy.deepcopy(flight.result), True
+        return flight.result, True
+
+
+_group = SingleFlight()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Значение аргумента в хэшируемый вид: списки и множества - кортежи, словари - пары"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_freeze(item) for item in value), key=repr))
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def coalesce(method: Callable) -> Callable:
+    """Декоратор метода DataService: одинаковые одновременные вызовы выполняются один раз"""
+    signature = inspect.signature(method)
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not config.performance.coalesce_calls:
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = tuple((key, _freeze(value)) for key, value in bound.arguments.items() if key != 'self')
+        key = (name, id(self), arguments)
+
+        def call():
+            result = method(self, *args, **kwargs)
+            return result, query_budget.cancelled()
+
+        started = time.perf_counter()
+        try:
+            (result, cancelled), executed = _group.do(key, call)
+        except query_budget.QueryCancelled:
+            if query_budget.cancelled():
+                raise
+            # Отменен чужой HTTP запрос, чей вызов ожидали
+            return method(self, *args, **kwargs)
+        if not executed and cancelled:
+            return method(self, *args, **kwargs)
+        if executed:
+            metrics.COALESCED_CALLS.inc(name, 'executed')
+            return result
+        metrics.COALESCED_CALLS.inc(name, 'joined')
+        instrumentation.add_coalesced_wait(time.perf_counter() - started)
+        return result
+
+    return wrapper
@@ -0,0 +1,233 @@
+/*
+ * Виртуальная таблица для больших списков (страницы ?view=virtual)
+ *
+ * Данные хранятся колонками, как их отдает API с format=columnar (decodeColumnar).
+ * В DOM находятся только видимые строки и запас overscan сверху и снизу; место
+ * остальных занимают две строки-распорки. Высота строки фиксирована, поэтому
+ * диапазон видимых строк вычисляется по scrollTop без измерений DOM.
+ */
+(function (global) {
+    'use strict';
+
+    function escapeHtml(value) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        return String(value)
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#39;');
+    }
+
+    function compareValues(a, b) {
+        if (a === b) return 0;
+        if (a === null || a === undefined || a === '') return 1;
+        if (b === null || b === undefined || b === '') return -1;
+        const x = Number(a), y = Number(b);
+        if (Number.isFinite(x) && Number.isFinite(y)) {
+            return x - y;
+        }
+        return String(a).localeCompare(String(b), 'ru');
+    }
+
+    class VirtualTable {
+        /*
+         * options.viewport  - элемент с фиксированной высотой и overflow: auto
+         * options.fields    - [{key, title, width, sortable, search, render(value, get)}],
+         *                     get(key) возвращает значение другой колонки той же строки
+         * options.rowHeight - высота строки в px (совпадает с CSS .virtual-table td)
+         * options.onNearEnd - вызывается, когда до конца загруженных строк осталось мало
+         */
+        constructor(options) {
+            this.viewport = options.viewport;
+            this.fields = options.fields;
+            this.rowHeight = options.rowHeight || 36;
+            this.overscan = options.overscan || 10;
+            this.onNearEnd = options.onNearEnd || null;
+
+            this.columns = {};
+            this.length = 0;
+            this.order = [];
+            this.sortKey = null;
+            this.sortDesc = false;
+            this.filterText = '';
+            this.range = [-1, -1];
+            this.frame = null;
+
+            this._build();
+            this.viewport.addEventListener('scroll', () => this._schedule(), { passive: true });
+            window.addEventListener('resize', () => this._schedule(true));
+        }
+
+        _build() {
+            const table = document.createElement('table');
+            table.className = 'table table-sm mb-0 virtual-table';
+
+            const colgroup = document.createElement('colgroup');
+            const headerRow = document.createElement('tr');
+            this.fields.forEach((field) => {
+                const col = document.createElement('col');
+                if (field.width) col.style.width = field.width;
+                colgroup.appendChild(col);
+
+                const th = document.createElement('th');
+                th.textContent = field.title;
+                if (field.sortable !== false) {
+                    th.classList.add('sortable');
+                    th.title = 'Сортировать';
+                    th.addEventListener('click', () => this.sortBy(field.key));
+                }
+                field.header = th;
+                headerRow.appendChild(th);
+            });
+
+            const thead = document.createElement('thead');
+            thead.className = 'table-light';
+            thead.appendChild(headerRow);
+            this.thead = thead;
+            this.tbody = document.createElement('tbody');
+
+            table.appendChild(colgroup);
+            table.appendChild(thead);
+            table.appendChild(this.tbody);
+            this.viewport.appendChild(table);
+        }
+
+        /* Добавление части строк из ответа API (columns, values) */
+        append(columns, values) {
+            const added = values.length ? values[0].length : 0;
+            columns.forEach((key, index) => {
+                const existing = this.columns[key] || new Array(this.length).fill(null);
+                this.columns[key] = existing.concat(values[index]);
+            });
+            // Колонки, которых не было в ответе, дополняются пустыми значениями
+            Object.keys(this.columns).forEach((key) => {
+                if (this.columns[key].length < this.length + added) {
+                    this.columns[key] = this.columns[key].concat(new Array(added).fill(null));
+                }
+            });
+            this.length += added;
+            this._reindex();
+            this._schedule(true);
+        }
+
+        get visibleCount() {
+            return this.order.length;
+        }
+
+        filter(text) {
+            this.filterText = (text || '').trim().toLowerCase();
+            this._reindex();
+            this.viewport.scrollTop = 0;
+            this._schedule(true);
+        }
+
+        sortBy(key) {
+            if (this.sortKey === key) {
+                this.sortDesc = !this.sortDesc;
+            } else {
+                this.sortKey = key;
+                this.sortDesc = false;
+            }
+            this.fields.forEach((field) => {
+                field.header.classList.toggle('sorted-asc', field.key === key && !this.sortDesc);
+                field.header.classList.toggle('sorted-desc', field.key === key && this.sortDesc);
+            });
+            this._reindex();
+            this._schedule(true);
+        }
+
+        /* Порядок строк после фильтра и сортировки - массив индексов, данные не копируются */
+        _reindex() {
+            let order = [];
+            const searchKeys = this.fields.filter((field) => field.search).map((field) => field.key);
+            for (let i = 0; i < this.length; i++) {
+                if (this.filterText && !searchKeys.some((key) => {
+                    const value = this.columns[key] ? this.columns[key][i] : null;
+                    return value !== null && value !== undefined && String(value).toLowerCase().includes(this.filterText);
+                })) {
+                    continue;
+                }
+                order.push(i);
+            }
+            if (this.sortKey && this.columns[this.sortKey]) {
+                const values = this.columns[this.sortKey];
+                const direction = this.sortDesc ? -1 : 1;
+                order.sort((a, b) => direction * compareValues(values[a], values[b]) || a - b);
+            }
+            this.order = order;
+        }
+
+        _schedule(force) {
+            if (force) this.range = [-1, -1];
+            if (this.frame !== null) return;
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this._render();
+            });
+        }
+
+        _render() {
+            const total = this.order.length;
+            const top = Math.max(0, this.viewport.scrollTop - this.thead.offsetHeight);
+            const start = Math.max(0, Math.floor(top / this.rowHeight) - this.overscan);
+            const end = Math.min(total, Math.ceil((top + this.viewport.clientHeight) / this.rowHeight) + this.overscan);
+            if (start === this.range[0] && end === this.range[1]) {
+                return;
+            }
+            this.range = [start, end];
+
+            const span = this.fields.length;
+            const parts = [`<tr class="virtual-spacer" style="height:${start * this.rowHeight}px"><td colspan="${span}"></td></tr>`];
+            for (let position = start; position < end; position++) {
+                const index = this.order[position];
+                const get = (key) => (this.columns[key] ? this.columns[key][index] : null);
+                parts.push(`<tr class="${position % 2 ? '' : 'virtual-odd'}">`);
+                this.fields.forEach((field) => {
+                    const value = get(field.key);
+                    const html = field.render ? field.render(value, get) : escapeHtml(value);
+                    parts.push(`<td title="${field.render ? '' : escapeHtml(value)}">${html}</td>`);
+                });
+                parts.push('</tr>');
+            }
+            parts.push(`<tr class="virtual-spacer" style="height:${(total - end) * this.rowHeight}px"><td colspan="${span}"></td></tr>`);
+            this.tbody.innerHTML = parts.join('');
+
+            // При активном фильтре подгрузка не запускается: фильтр работает по загруженным строкам
+            if (this.onNearEnd && !this.filterText && end >= total - this.overscan * 2) {
+                this.onNearEnd();
+            }
+        }
+    }
+
+    /*
+     * Ответ API format=columnar (columnar.py) -> {columns, values}: номера словарных
+     * колонок заменяются строками, колонки-ссылки собираются из шаблона и OUID
+     */
+    function decodeColumnar(data) {
+        const columns = data.columns.slice();
+        const values = data.values.map((column, index) => {
+            const dictionary = (data.dictionaries || {})[columns[index]];
+            return dictionary ? column.map((code) => (code === null ? null : dictionary[code])) : column;
+        });
+        const byName = {};
+        columns.forEach((key, index) => { byName[key] = values[index]; });
+        Object.entries(data.url_templates || {}).forEach(([key, spec]) => {
+            const sources = spec.columns.map((name) => byName[name] || []);
+            const urls = new Array(data.rows);
+            for (let i = 0; i < data.rows; i++) {
+                const source = sources.find((column) => column[i] !== null && column[i] !== undefined && column[i] !== '');
+                urls[i] = source ? spec.template.replace('{}', encodeURIComponent(source[i])) : null;
+            }
+            columns.push(key);
+            values.push(urls);
+        });
+        return { columns: columns, values: values };
+    }
+
+    VirtualTable.decodeColumnar = decodeColumnar;
+    VirtualTable.escapeHtml = escapeHtml;
+    global.VirtualTable = VirtualTable;
+})(window);
@@ -0,0 +1,99 @@
+"""Пределы одновременных тяжелых запросов (admission.py) и ответ 503 с Retry-After"""
+import threading
+import time
+
+import pytest
+
+import admission
+from config import config
+
+
+def _deadline(seconds):
+    return time.monotonic() + seconds
+
+
+def test_unlimited_gate_never_blocks():
+    gate = admission.Gate('export', 0, 0)
+    for _ in range(5):
+        gate.acquire(_deadline(0))
+    gate.release()
+    assert gate.active == 0 and gate.waiting == 0
+
+
+def test_queue_full_rejects_immediately():
+    gate = admission.Gate('export', 1, 0)
+    gate.acquire(_deadline(1))
+    started = time.monotonic()
+    with pytest.raises(admission.Rejected) as error:
+        gate.acquire(_deadline(5))
+    assert error.value.reason == 'queue_full'
+    assert time.monotonic() - started < 1
+    assert gate.active == 1 and gate.waiting == 0
+
+
+def test_waiting_times_out():
+    gate = admission.Gate('scripts', 1, 1)
+    gate.acquire(_deadline(1))
+    started = time.monotonic()
+    with pytest.raises(admission.Rejected) as error:
+        gate.acquire(_deadline(0.1))
+    assert error.value.reason == 'timeout'
+    assert 0.05 < time.monotonic() - started < 2
+    assert gate.active == 1 and gate.waiting == 0
+
+
+def test_waiter_admitted_after_release_from_other_thread():
+    gate = admission.Gate('analysis', 1, 1)
+    gate.acquire(_deadline(1))
+    admitted = threading.Event()
+
+    def waiter():
+        gate.acquire(_deadline(5))
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while gate.waiting == 0:
+        time.sleep(0.01)
+    # Пока место занято, второй запрос ждет; очередь заполнена для третьего
+    with pytest.raises(admission.Rejected):
+        gate.acquire(_deadline(5))
+    assert not admitted.is_set()
+    gate.release()
+    thread.join(5)
+    assert admitted.is_set()
+    assert gate.active == 1 and gate.waiting == 0
+
+
+def test_admit_releases_class_gate_when_heavy_gate_is_full(monkeypatch):
+    gates = {
+        'export': admission.Gate('export', 1, 1),
+        'scripts': admission.Gate('scripts', 1, 1),
+        'analysis': admission.Gate('analysis', 2, 1),
+        'heavy': admission.Gate('heavy', 1, 0),
+    }
+    monkeypatch.setattr(admission, 'GATES', gates)
+    acquired = admission.admit('export')
+    with pytest.raises(admission.Rejected) as error:
+        admission.admit('scripts')
+    assert error.value.gate == 'heavy'
+    assert gates['scripts'].active == 0
+    admission.release(acquired)
+    assert gates['export'].active == 0 and gates['heavy'].active == 0
+
+
+def test_rejected_request_gets_503_with_retry_after(monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(config.performance, 'admission_retry_after', 7)
+    monkeypatch.setattr(config.performance, 'http_cache', False)
+    monkeypatch.setattr(app_module.data_service, 'ensure_bootstrapped', lambda: None)
+    full = admission.Gate('scripts', 1, 0)
+    full.active = 1
+    monkeypatch.setitem(admission.GATES, 'scripts', full)
+
+    response = app_module.app.test_client().get('/api/generate_sql_scripts')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
+    assert 'error' in response.get_json()
+    assert full.active == 1
@@ -0,0 +1,26 @@
+"""Нормализация результатов при сравнении backend'ов"""
+import backend_parity
+
+
+def _analysis_result(query_time, processing_time):
+    return {
+        'classes': {'Doc': {'attributes': {'update_list': [{'ouid': 1, 'name': 'title'}]}}},
+        'total_count': 1,
+        'optimization_info': {
+            'query_time': query_time,
+            'processing_time': processing_time,
+            'total_time': processing_time,
+        },
+    }
+
+
+def test_results_differing_only_in_timings_are_equal():
+    jdbc = backend_parity._normalize(_analysis_result(0.412, 0.031))
+    native = backend_parity._normalize(_analysis_result(0.187, 0.029))
+    assert jdbc == native
+
+
+def test_data_differences_are_reported():
+    changed = _analysis_result(0.1, 0.1)
+    changed['total_count'] = 2
+    assert backend_parity._normalize(_analysis_result(0.1, 0.1)) != backend_parity._normalize(changed)
@@ -0,0 +1,37 @@
+"""Двоичный формат строк и кадры обмена с брокером БД (db_broker.py)"""
+import socket
+
+import pytest
+
+from db_broker import FRAME_ROWS, decode_rows, encode_rows, recv_frame, send_frame
+
+
+@pytest.mark.parametrize('rows', [
+    [],
+    [[]],
+    [['1', 'Документ', None]],
+    [[None, None], ['', '']],
+    [['Класс «Документ» — 文档 🚀', 'a\nb\tc', '\x00']],
+    [[str(index), 'x' * index] for index in range(300)],
+])
+def test_rows_round_trip(rows):
+    assert decode_rows(encode_rows(rows)) == rows
+
+
+def test_none_and_empty_string_are_distinct():
+    decoded = decode_rows(encode_rows([[None, '']]))
+    assert decoded[0][0] is None
+    assert decoded[0][1] == ''
+
+
+def test_frames_over_socket():
+    rows = [['1', None, 'значение'], ['2', '', '']]
+    left, right = socket.socketpair()
+    try:
+        send_frame(left, FRAME_ROWS, encode_rows(rows))
+        frame_type, payload = recv_frame(right)
+        assert frame_type == FRAME_ROWS
+        assert decode_rows(payload) == rows
+    finally:
+        left.close()
+        right.close()
@@ -0,0 +1,35 @@
+"""Перевод плейсхолдеров ? в формат psycopg (psycopg_backend.convert_placeholders)"""
+import pytest
+
+pytest.importorskip('psycopg')
+from psycopg_backend import convert_placeholders
+
+
+@pytest.mark.parametrize('query, expected', [
+    ("SELECT * FROM t WHERE a = ? AND b = ?", "SELECT * FROM t WHERE a = %s AND b = %s"),
+    # Строки: ? внутри не трогается, '' - кавычка внутри строки
+    ("SELECT '?' , ?", "SELECT '?' , %s"),
+    ("SELECT 'it''s ?', ?", "SELECT 'it''s ?', %s"),
+    # E-строка с экранированной кавычкой
+    ("SELECT E'\\'?', ?", "SELECT E'\\'?', %s"),
+    ("SELECT E'a\\nb?' || ?", "SELECT E'a\\nb?' || %s"),
+    # Идентификатор в двойных кавычках
+    ('SELECT "col?" FROM t WHERE x = ?', 'SELECT "col?" FROM t WHERE x = %s'),
+    # Долларовые кавычки: $$...$$ и $tag$...$tag$ (внутри может быть $$)
+    ("SELECT $$?$$, ?", "SELECT $$?$$, %s"),
+    ("SELECT $fn$ a ? $$ b $fn$, ?", "SELECT $fn$ a ? $$ b $fn$, %s"),
+    # $1 - не долларовая кавычка
+    ("SELECT $1, ?", "SELECT $1, %s"),
+    # Комментарии
+    ("SELECT ? -- где ?\n, ?", "SELECT %s -- где ?\n, %s"),
+    ("SELECT /* ? */ ?", "SELECT /* ? */ %s"),
+    ("SELECT ? -- ?", "SELECT %s -- ?"),
+    # Знак % удваивается везде: в тексте, строках и комментариях
+    ("SELECT 5 % 2, ?", "SELECT 5 %% 2, %s"),
+    ("SELECT * FROM t WHERE name ILIKE '%doc%' AND a = ?", "SELECT * FROM t WHERE name ILIKE '%%doc%%' AND a = %s"),
+    ("SELECT $$100%$$ /* 50% */", "SELECT $$100%%$$ /* 50%% */"),
+    # Незакрытая строка не теряет текст
+    ("SELECT 'abc", "SELECT 'abc"),
+])
+def test_convert_placeholders(query, expected):
+    assert convert_placeholders(query) == expected
@@ -0,0 +1,75 @@
+"""Объединение одновременных вызовов: каждый получатель получает свою копию результата"""
+import threading
+import time
+
+from config import config
+import singleflight
+
+
+class _Service:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    @singleflight.coalesce
+    def get_rows(self, page=1):
+        self.calls += 1
+        self.release.wait(5)
+        return {'attributes': [{'ouid': 1, 'tags': ['a']}], 'total_count': 1}
+
+
+def _wait_for_joiners(count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with singleflight._group._lock:
+            flights = list(singleflight._group._flights.values())
+        if flights and flights[0].joiners >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError('ожидающие вызовы не присоединились')
+
+
+def test_leader_mutation_does_not_leak_to_joiners(monkeypatch):
+    monkeypatch.setattr(config.performance, 'coalesce_calls', True)
+    service = _Service()
+    results = {}
+
+    def leader():
+        result = service.get_rows(page=1)
+        # Обработчик запроса меняет результат сразу, пока ожидавшие могут еще копировать
+        rows = result.pop('attributes')
+        rows[0]['tags'].append('leader')
+        result['current_filters'] = {'search': 'leader'}
+        results['leader'] = result
+
+    def joiner(index):
+        results[index] = service.get_rows(page=1)
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    _wait_for_joiners(0)
+    threads += [threading.Thread(target=joiner, args=(index,)) for index in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for_joiners(3)
+    service.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert service.calls == 1
+    assert 'attributes' not in results['leader']
+    for index in range(3):
+        result = results[index]
+        assert result['attributes'] == [{'ouid': 1, 'tags': ['a']}]
+        assert 'current_filters' not in result
+    assert results[0]['attributes'] is not results[1]['attributes']
+
+
+def test_single_caller_gets_result_without_copy(monkeypatch):
+    monkeypatch.setattr(config.performance, 'coalesce_calls', True)
+    service = _Service()
+    service.release.set()
+    first = service.get_rows(page=2)
+    second = service.get_rows(page=2)
+    assert service.calls == 2
+    assert first == second and first is not second